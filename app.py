@@ -5,33 +5,139 @@ This module provides the application factory pattern for creating Flask app inst
 Routes are organized in separate blueprint modules in the routes package.
 """
 
-from flask import Flask
-from database import init_database, add_sample_data
+from flask import Flask, abort, g, request
+from cli import register_commands
+from database import (
+    init_database, add_sample_data, sync_external_writes,
+    configure_branches, get_branches, select_branch, reset_branch, use_branch
+)
 from routes import register_blueprints
+from routes.compression import register_compression
+from routes.json_provider import LibraryJSONProvider
+from routes.rate_limit import register_rate_limits
+from services.catalog_replica import catalog_replica
+from services.library_service import init_search_indexes
+from services.async_service import configure_db_executor
+from services.scheduler import DueDateScheduler
+from services.write_queue import start_group_commit
 
 
-def create_app():
+def create_app(config=None):
     """
     Application factory function to create and configure Flask app.
     
+    Args:
+        config: Optional mapping of settings applied over the defaults
+    
     Returns:
         Flask: Configured Flask application instance
     """
     app = Flask(__name__)
     app.secret_key = "super secret key"
+    app.json = LibraryJSONProvider(app)
+    
+    # Only one process should run the due-date scheduler, so it is opt-in
+    app.config.update(DUE_DATE_SCHEDULER=False, REMINDER_DAYS=2)
+    
+    # Group commit batches circulation writes on one writer thread
+    app.config.update(GROUP_COMMIT=False, GROUP_COMMIT_BATCH_SIZE=64, GROUP_COMMIT_LINGER_MS=2)
+    
+    # Async /api views run SQLite work on a bounded executor
+    app.config.update(ASYNC_API=False, ASYNC_DB_WORKERS=8)
+    
+    # Branch name -> database file; requests pick one with ?branch= or X-Branch
+    app.config.update(LIBRARY_BRANCHES={}, DEFAULT_BRANCH=None)
+    
+    # Search and list the default catalog from an in-memory replica (read-mostly nodes)
+    app.config.update(CATALOG_REPLICA=False)
+    
+    # Encode JSON with orjson when it is installed
+    app.config.update(FAST_JSON=True)
+    
+    # gzip catalog, search and API responses of at least GZIP_MIN_SIZE bytes
+    app.config.update(GZIP_RESPONSES=True, GZIP_MIN_SIZE=1024, GZIP_LEVEL=6)
+    
+    # Token buckets (per second, burst) for circulation endpoints, per client IP and per patron
+    app.config.update(RATE_LIMITS=True, RATE_LIMIT_IP_PER_SECOND=10.0, RATE_LIMIT_IP_BURST=100,
+                      RATE_LIMIT_PATRON_PER_SECOND=1.0, RATE_LIMIT_PATRON_BURST=20,
+                      RATE_LIMIT_MAX_BUCKETS=100000)
+    
+    # Write requests holding the single SQLite writer at once; 0 disables the cap
+    app.config.update(MAX_CONCURRENT_WRITES=8, WRITE_QUEUE_SIZE=64, WRITE_QUEUE_TIMEOUT_MS=5000)
+    if config:
+        app.config.update(config)
     
-    # Initialize the database
-    init_database()
+    if not app.config['FAST_JSON']:
+        app.json.use_orjson = False
     
-    # Add sample data for testing and demonstration
-    add_sample_data()
+    if app.config['LIBRARY_BRANCHES']:
+        configure_branches(app.config['LIBRARY_BRANCHES'], app.config['DEFAULT_BRANCH'])
+    
+    # Initialize the default database and each branch's, with sample data
+    # for testing and demonstration, and note the shared catalog state
+    for branch in [None] + get_branches():
+        with use_branch(branch):
+            init_database()
+            add_sample_data()
+            sync_external_writes()
+    
+    # Build in-memory search indexes from the default catalog; later changes
+    # by other processes are picked up per request
+    init_search_indexes()
+    if app.config['CATALOG_REPLICA']:
+        catalog_replica.load()
+        app.extensions['catalog_replica'] = catalog_replica
+    
+    # Turn away over-limit clients before any other request work
+    register_rate_limits(app)
+    
+    @app.before_request
+    def select_request_branch():
+        branch = request.args.get('branch') or request.headers.get('X-Branch')
+        if branch:
+            if branch not in get_branches():
+                abort(400, description=f"Unknown branch: {branch}")
+            g.branch_token = select_branch(branch)
+    
+    @app.teardown_request
+    def restore_branch(exc):
+        token = g.get('branch_token')
+        if token is None:
+            return
+        try:
+            reset_branch(token)
+        except ValueError:
+            # An offloaded async view's copy of the request context ends
+            # first, in another context; the request's own teardown resets it
+            return
+        g.pop('branch_token')
+    
+    @app.before_request
+    def pick_up_external_writes():
+        sync_external_writes()
     
     # Register all route blueprints
+    if app.config['ASYNC_API']:
+        configure_db_executor(app.config['ASYNC_DB_WORKERS'])
     register_blueprints(app)
+    register_compression(app)
+    
+    # Register staff command line tools
+    register_commands(app)
+    
+    if app.config['GROUP_COMMIT']:
+        app.extensions['group_commit_writer'] = start_group_commit(
+            app.config['GROUP_COMMIT_BATCH_SIZE'], app.config['GROUP_COMMIT_LINGER_MS'] / 1000
+        )
+    
+    # Fire due-date reminders and overdue notices in the background
+    if app.config['DUE_DATE_SCHEDULER']:
+        app.extensions['due_date_scheduler'] = DueDateScheduler(reminder_days=app.config['REMINDER_DAYS'])
+        app.extensions['due_date_scheduler'].start()
     
     return app
 
 
 if __name__ == '__main__':
-    app = create_app()
+    app = create_app({'DUE_DATE_SCHEDULER': True})
     app.run(debug=True, host='0.0.0.0', port=5000)
@@ -0,0 +1,106 @@
+"""
+Load test: sync versus async /api blueprint under slow payment requests.
+
+Serves the app from a WSGI server with a fixed pool of worker threads (like
+a gthread worker) and drives it with more concurrent clients than threads.
+Each client repeatedly pays late fees on one or several books; the
+simulated gateway takes 0.5 s per charge. The fee lookup is stubbed to a
+fixed overdue fee so every request reaches the gateway.
+
+Usage:
+    python benchmarks/bench_async_api.py [--threads 8] [--clients 32] [--seconds 10]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from werkzeug.serving import BaseWSGIServer
+
+import database
+from app import create_app
+from services import library_service
+
+
+class PooledWSGIServer(BaseWSGIServer):
+    """WSGI server handling requests on a fixed number of threads."""
+
+    def __init__(self, host, port, app, threads):
+        super().__init__(host, port, app)
+        self.pool = ThreadPoolExecutor(max_workers=threads)
+
+    def process_request(self, request, client_address):
+        self.pool.submit(self._handle, request, client_address)
+
+    def _handle(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+
+def client(url, book_ids, stop, latencies):
+    body = json.dumps({'patron_id': '123456', 'book_ids': book_ids}).encode()
+    while not stop.is_set():
+        started = time.perf_counter()
+        request = urllib.request.Request(url, data=body, headers={'Content-Type': 'application/json'})
+        with urllib.request.urlopen(request, timeout=120) as response:
+            response.read()
+        if not stop.is_set():
+            latencies.append(time.perf_counter() - started)
+
+
+def run(async_api, books_per_request, args):
+    with tempfile.TemporaryDirectory() as directory:
+        database.DATABASE = os.path.join(directory, 'library.db')
+        # All clients come from one address; admission control is not what is measured here
+        app = create_app({'ASYNC_API': async_api, 'RATE_LIMITS': False, 'MAX_CONCURRENT_WRITES': 0})
+        server = PooledWSGIServer('127.0.0.1', 0, app, args.threads)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = f'http://127.0.0.1:{server.server_port}/api/late_fees/pay'
+
+        stop = threading.Event()
+        latencies = []
+        clients = [threading.Thread(target=client, args=(url, list(range(1, books_per_request + 1)),
+                                                         stop, latencies))
+                   for _ in range(args.clients)]
+        for thread in clients:
+            thread.start()
+        time.sleep(args.seconds)
+        stop.set()
+        for thread in clients:
+            thread.join()
+        server.shutdown()
+
+    return len(latencies) / args.seconds, statistics.median(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--threads', type=int, default=8, help='server worker threads')
+    parser.add_argument('--clients', type=int, default=32)
+    parser.add_argument('--seconds', type=float, default=10)
+    args = parser.parse_args()
+
+    fee = {'fee_amount': 2.5, 'days_overdue': 5, 'status': 'Overdue'}
+    library_service.calculate_late_fee_for_book = lambda patron_id, book_id: fee
+
+    print(f"{'api':>6} {'books/req':>10} {'req/s':>8} {'charges/s':>10} {'p50 s':>7}")
+    for books in (1, 3):
+        for async_api in (False, True):
+            rate, median = run(async_api, books, args)
+            name = 'async' if async_api else 'sync'
+            print(f'{name:>6} {books:>10} {rate:>8.1f} {rate * books:>10.1f} {median:>7.2f}')
+
+
+if __name__ == '__main__':
+    main()
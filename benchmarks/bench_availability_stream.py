@@ -0,0 +1,121 @@
+"""
+Benchmark: kiosks polling /catalog versus subscribing to availability events.
+
+Polling: each kiosk fetches /catalog (a full render of the catalog) every
+--poll seconds; reported is the CPU time one render costs and what that
+adds up to per second for the given number of kiosks.
+
+Streaming: that many subscriber threads wait on an AvailabilityBroadcaster
+while borrows and returns commit at --rate per second. Reported is the
+process CPU time per second and the delay from commit to each
+subscriber receiving the change.
+
+Usage:
+    python benchmarks/bench_availability_stream.py [--books 5000] [--seconds 5]
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+from app import create_app
+from services.availability_stream import AvailabilityBroadcaster
+from services.library_service import borrow_book_by_patron, return_book_by_patron
+
+
+def build_catalog(path, books):
+    database.DATABASE = path
+    database.init_database()
+    conn = database.get_db_connection()
+    conn.executemany(
+        'INSERT INTO books (title, author, isbn, total_copies, available_copies) VALUES (?, ?, ?, ?, ?)',
+        ((f'Book {n}', f'Author {n % 500}', f'{n:013d}', 5, 5) for n in range(books))
+    )
+    conn.commit()
+    conn.close()
+
+
+def poll_cost(client, repeat=20):
+    """CPU seconds for one uncached /catalog fetch."""
+    started = time.process_time()
+    for _ in range(repeat):
+        assert client.get('/catalog').status_code == 200
+    return (time.process_time() - started) / repeat
+
+
+def stream(kiosks, seconds, rate):
+    broadcaster = AvailabilityBroadcaster(max_subscribers=kiosks)
+    committed = {}
+    delays = []
+    delays_lock = threading.Lock()
+    stop = threading.Event()
+
+    def kiosk(subscription):
+        while not stop.is_set():
+            batch = subscription.get(timeout=0.2)
+            if batch is None:
+                continue
+            received = time.perf_counter()
+            with delays_lock:
+                delays.extend(received - committed[book_id] for book_id, _ in batch[1] if book_id in committed)
+
+    threads = [threading.Thread(target=kiosk, args=(broadcaster.subscribe(),)) for _ in range(kiosks)]
+    for thread in threads:
+        thread.start()
+
+    started_cpu = time.process_time()
+    started = time.perf_counter()
+    loan = 0
+    while time.perf_counter() - started < seconds:
+        book_id = loan // 2 % 1000 + 1
+        patron = f'{loan // 2 % 999999 + 1:06d}'
+        if loan % 2 == 0:
+            assert borrow_book_by_patron(patron, book_id)[0]
+        else:
+            assert return_book_by_patron(patron, book_id)[0]
+        committed[book_id] = time.perf_counter()
+        loan += 1
+        time.sleep(1 / rate)
+    time.sleep(0.5)
+    cpu_per_second = (time.process_time() - started_cpu) / (time.perf_counter() - started)
+
+    stop.set()
+    for thread in threads:
+        thread.join()
+    stats = broadcaster.stats()
+    delays.sort()
+    return cpu_per_second, delays, stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--books', type=int, default=5000)
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--rate', type=float, default=20, help='commits per second')
+    parser.add_argument('--poll', type=float, default=5, help='seconds between kiosk polls')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        build_catalog(os.path.join(directory, 'library.db'), args.books)
+        client = create_app().test_client()
+        render = poll_cost(client)
+        print(f'/catalog render: {render * 1000:.1f} ms CPU for {args.books} books')
+
+        print(f"{'kiosks':>7} {'polling CPU/s':>14} {'stream CPU/s':>13} {'p50 ms':>7} {'p99 ms':>7} {'dropped':>8}")
+        for kiosks in (10, 100, 500):
+            polling = kiosks / args.poll * render
+            cpu, delays, stats = stream(kiosks, args.seconds, args.rate)
+            p50 = statistics.median(delays) * 1000
+            p99 = delays[int(len(delays) * 0.99)] * 1000
+            print(f'{kiosks:>7} {polling:>13.2f}s {cpu:>12.2f}s {p50:>7.1f} {p99:>7.1f} {stats["dropped"]:>8}')
+
+
+if __name__ == '__main__':
+    main()
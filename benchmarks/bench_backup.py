@@ -0,0 +1,97 @@
+"""
+Benchmark: borrow latency while an online backup runs.
+
+A client thread borrows and returns books through the service layer in a
+loop and times every call, first with no backup running and then while
+backup_database copies the database with different step sizes and sleeps.
+"All at once" copies every page in a single step.
+
+Usage:
+    python benchmarks/bench_backup.py [--books 500000] [--seconds 3]
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+from services.backup import backup_database
+from services.library_service import borrow_book_by_patron, return_book_by_patron
+
+CONFIGURATIONS = [
+    ('no backup', None, None),
+    ('all at once', -1, 0),
+    ('1024 pages / 5 ms', 1024, 0.005),
+    ('256 pages / 5 ms', 256, 0.005),
+    ('64 pages / 5 ms', 64, 0.005),
+]
+
+
+def build_catalog(path, books):
+    database.DATABASE = path
+    database.init_database()
+    conn = database.get_db_connection()
+    conn.executemany(
+        'INSERT INTO books (title, author, isbn, total_copies, available_copies) VALUES (?, ?, ?, ?, ?)',
+        ((f'Title {n} ' + 'x' * 120, f'Author {n % 997}', f'{n:013d}', 3, 3) for n in range(books))
+    )
+    conn.commit()
+    conn.close()
+
+
+def circulate(stop, latencies):
+    n = 0
+    while not stop.is_set():
+        book_id = n % 1000 + 1
+        for operation in (borrow_book_by_patron, return_book_by_patron):
+            started = time.perf_counter()
+            operation('123456', book_id)
+            latencies.append((time.perf_counter() - started) * 1000)
+        n += 1
+
+
+def run(pages, sleep, destination, seconds):
+    stop = threading.Event()
+    latencies = []
+    client = threading.Thread(target=circulate, args=(stop, latencies))
+    client.start()
+    backup_seconds = None
+    if pages is None:
+        time.sleep(seconds)
+    else:
+        _, _, result = backup_database(destination, pages, sleep)
+        backup_seconds = result['seconds']
+        os.remove(destination)
+    stop.set()
+    client.join()
+    latencies.sort()
+    p99 = latencies[int(len(latencies) * 0.99)]
+    return backup_seconds, statistics.median(latencies), p99, latencies[-1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--books', type=int, default=500000)
+    parser.add_argument('--seconds', type=float, default=3, help='length of the no-backup run')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'library.db')
+        build_catalog(path, args.books)
+        print(f'database: {os.path.getsize(path) / 2**20:.0f} MiB')
+        print(f"{'mode':>18} {'backup s':>9} {'p50 ms':>7} {'p99 ms':>7} {'max ms':>7}")
+        for name, pages, sleep in CONFIGURATIONS:
+            backup_seconds, p50, p99, worst = run(pages, sleep, os.path.join(directory, 'snapshot.db'),
+                                                  args.seconds)
+            shown = '-' if backup_seconds is None else f'{backup_seconds:.2f}'
+            print(f'{name:>18} {shown:>9} {p50:>7.2f} {p99:>7.2f} {worst:>7.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+"""
+Benchmark: catalog search from the columnar replica versus SQLite.
+
+Builds a synthetic catalog, measures the replica's load time and memory
+against the catalog held as a list of book dicts, and times searches
+through _scan_catalog with and without the replica (the search cache is
+bypassed). "SQL LIKE" is the unindexed LIKE filter query_books runs
+(first 100 matches), for reference. Also times an incremental refresh after a borrow.
+
+Usage:
+    python benchmarks/bench_catalog_replica.py [--books 1000000]
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+from services.catalog_replica import catalog_replica
+from services.library_service import _scan_catalog, borrow_book_by_patron
+
+WORDS = ('river', 'night', 'garden', 'shadow', 'winter', 'empire', 'silent', 'glass', 'north',
+         'stone', 'letters', 'harbor', 'crown', 'orchard', 'ember', 'tide', 'paper', 'wolf')
+
+
+def build_catalog(path, books):
+    database.DATABASE = path
+    database.init_database()
+    rng = random.Random(1)
+    conn = database.get_db_connection()
+    conn.executemany(
+        'INSERT INTO books (title, author, isbn, total_copies, available_copies) VALUES (?, ?, ?, ?, ?)',
+        ((' '.join(rng.choice(WORDS).title() for _ in range(rng.randint(2, 5))) + f' {n}',
+          f'Author {rng.randrange(200000)}', f'{n:013d}', 3, 3) for n in range(books))
+    )
+    conn.commit()
+    conn.close()
+
+
+def median_ms(function, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--books', type=int, default=1000000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        build_catalog(os.path.join(directory, 'library.db'), args.books)
+
+        tracemalloc.start()
+        books = database.get_all_books()
+        dicts_bytes = tracemalloc.get_traced_memory()[0]
+        del books
+        tracemalloc.stop()
+
+        tracemalloc.start()
+        started = time.perf_counter()
+        catalog_replica.load()
+        load_seconds = time.perf_counter() - started
+        replica_bytes, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        print(f'list of dicts (get_all_books): {dicts_bytes / 2**20:.0f} MiB')
+        print(f'replica: {replica_bytes / 2**20:.0f} MiB ({replica_bytes / args.books:.0f} B/book), '
+              f'peak while loading {peak / 2**20:.0f} MiB, load {load_seconds:.1f} s')
+
+        searches = [
+            ('title, rare', 'title', f'{args.books // 2}'),
+            ('title, common', 'title', 'winter ember'),
+            ('author', 'author', 'author 12345'),
+            ('isbn', 'isbn', f'{args.books - 7:013d}'),
+        ]
+        print(f"{'search':>14} {'matches':>8} {'replica ms':>11} {'sqlite scan ms':>15} {'SQL LIKE ms':>12}")
+        for name, search_type, term in searches:
+            matches = len(_scan_catalog(term, search_type))
+            replica_ms = median_ms(lambda: _scan_catalog(term, search_type), 20)
+            path, catalog_replica.path = catalog_replica.path, None
+            scan_ms = median_ms(lambda: _scan_catalog(term, search_type), 3)
+            catalog_replica.path = path
+            like_ms = median_ms(lambda: database.query_books(**{search_type: term}, limit=100), 5)
+            print(f'{name:>14} {matches:>8} {replica_ms:>11.2f} {scan_ms:>15.1f} {like_ms:>12.1f}')
+
+        listing_ms = median_ms(catalog_replica.all_books, 3)
+        sqlite_listing_ms = median_ms(database.get_all_books, 3)
+        print(f'list all books: replica {listing_ms:.0f} ms, sqlite {sqlite_listing_ms:.0f} ms')
+
+        borrow_book_by_patron('123456', 1)
+        refresh_ms = median_ms(catalog_replica.refresh, 1)
+        idle_ms = median_ms(catalog_replica.refresh, 100)
+        print(f'refresh after one borrow: {refresh_ms:.2f} ms; with nothing new: {idle_ms * 1000:.0f} us')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+"""
+Benchmark: circulation statistics from rollups versus scanning the history.
+
+Builds a borrow history spread over several years, backfills the rollups
+from it, then times get_circulation_stats (reading the rollups) against
+computing the same daily figures and top books with GROUP BY queries over
+borrow_records. Also times borrow + return pairs with and without the
+rollup triggers, to show what the incremental maintenance costs a write.
+
+Usage:
+    python benchmarks/bench_circulation_stats.py [--loans 1000000] [--books 10000] [--days 1500]
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+from services.circulation_stats import get_circulation_stats
+from services.library_service import borrow_book_by_patron, return_book_by_patron
+
+ROLLUP_TRIGGERS = ('borrow_records_insert_rollup', 'borrow_records_return_rollup')
+
+
+def build_history(path, loans, books, days):
+    database.DATABASE = path
+    database.init_database()
+    conn = database.get_db_connection()
+    conn.executemany(
+        'INSERT INTO books (title, author, isbn, total_copies, available_copies) VALUES (?, ?, ?, ?, ?)',
+        ((f'Title {n}', 'Author', f'{n:013d}', 5, 5) for n in range(books))
+    )
+    trigger_sql = [conn.execute("SELECT sql FROM sqlite_master WHERE name = ?", (name,)).fetchone()[0]
+                   for name in ROLLUP_TRIGGERS]
+    for name in ROLLUP_TRIGGERS:
+        conn.execute(f'DROP TRIGGER {name}')
+
+    rng = random.Random(1)
+    start = datetime.now() - timedelta(days=days)
+
+    def records():
+        for _ in range(loans):
+            borrowed = start + timedelta(seconds=rng.randrange(days * 86400))
+            due = borrowed + timedelta(days=14)
+            returned = borrowed + timedelta(days=rng.randint(1, 24))
+            yield ('123456', rng.randint(1, books), borrowed.isoformat(), due.isoformat(), returned.isoformat())
+
+    conn.executemany(
+        'INSERT INTO borrow_records (patron_id, book_id, borrow_date, due_date, return_date) VALUES (?, ?, ?, ?, ?)',
+        records()
+    )
+    for sql in trigger_sql:
+        conn.execute(sql)
+    conn.commit()
+    conn.close()
+
+
+def scan_stats(days):
+    """The same figures, computed on demand from borrow_records."""
+    since = (datetime.now() - timedelta(days=days - 1)).strftime('%Y-%m-%d')
+    conn = database.get_read_connection()
+    conn.execute('''
+        SELECT substr(borrow_date, 1, 10) AS day, COUNT(*) FROM borrow_records
+        WHERE borrow_date >= ? GROUP BY day
+    ''', (since,)).fetchall()
+    conn.execute('''
+        SELECT substr(return_date, 1, 10) AS day, COUNT(*), SUM(return_date > due_date)
+        FROM borrow_records WHERE return_date >= ? GROUP BY day
+    ''', (since,)).fetchall()
+    conn.execute('SELECT COUNT(*), COUNT(return_date), SUM(return_date > due_date) FROM borrow_records').fetchall()
+    conn.execute('''
+        SELECT book_id, COUNT(*) AS loans FROM borrow_records
+        GROUP BY book_id ORDER BY loans DESC LIMIT 10
+    ''').fetchall()
+    conn.close()
+
+
+def median_ms(function, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+def write_rate(pairs):
+    started = time.perf_counter()
+    for n in range(pairs):
+        borrow_book_by_patron('654321', n % 100 + 1)
+        return_book_by_patron('654321', n % 100 + 1)
+    return pairs * 2 / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--loans', type=int, default=1000000)
+    parser.add_argument('--books', type=int, default=10000)
+    parser.add_argument('--days', type=int, default=1500, help='days of history')
+    parser.add_argument('--pairs', type=int, default=2000, help='borrow/return pairs for the write timing')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        build_history(os.path.join(directory, 'library.db'), args.loans, args.books, args.days)
+
+        started = time.perf_counter()
+        days, books = database.rebuild_circulation_rollups()
+        print(f'backfill: {time.perf_counter() - started:.2f} s ({days} days, {books} books)')
+
+        print(f'stats from rollups: {median_ms(lambda: get_circulation_stats(30, 10), 20):.2f} ms')
+        print(f'stats from scan:    {median_ms(lambda: scan_stats(30), 5):.2f} ms')
+
+        with_triggers = write_rate(args.pairs)
+        conn = database.get_db_connection()
+        trigger_sql = [conn.execute("SELECT sql FROM sqlite_master WHERE name = ?", (name,)).fetchone()[0]
+                       for name in ROLLUP_TRIGGERS]
+        for name in ROLLUP_TRIGGERS:
+            conn.execute(f'DROP TRIGGER {name}')
+        conn.commit()
+        without_triggers = write_rate(args.pairs)
+        for sql in trigger_sql:
+            conn.execute(sql)
+        conn.commit()
+        conn.close()
+        print(f'writes/s with rollup triggers: {with_triggers:.0f}, without: {without_triggers:.0f}')
+
+
+if __name__ == '__main__':
+    main()
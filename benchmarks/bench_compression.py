@@ -0,0 +1,86 @@
+"""
+Benchmark: bytes on the wire and CPU cost of gzip response compression.
+
+Requests /catalog, an unpaged /api/search (streamed) and a 100-book
+structured query with and without Accept-Encoding: gzip at several
+compression levels, reporting body sizes, the CPU time compression adds
+per request, and what a repeat request costs when the compressed body is
+served from the cache. Transfer times assume a --link Mbit/s branch link.
+
+Usage:
+    python benchmarks/bench_compression.py [--books 20000] [--link 2]
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+from app import create_app
+from routes.compression import compressed_cache
+
+GZIP = {'Accept-Encoding': 'gzip'}
+
+ENDPOINTS = (
+    ('/catalog', '/catalog'),
+    ('/api/search (unpaged)', '/api/search?q=book&type=title'),
+    ('/api/search (limit 100)', '/api/search?title=book&limit=100'),
+)
+
+
+def build_catalog(path, books):
+    database.DATABASE = path
+    database.init_database()
+    conn = database.get_db_connection()
+    conn.executemany(
+        'INSERT INTO books (title, author, isbn, total_copies, available_copies) VALUES (?, ?, ?, ?, ?)',
+        ((f'Book {n} of the Library', f'Author {n % 500}', f'{n:013d}', 3, n % 4) for n in range(books))
+    )
+    conn.commit()
+    conn.close()
+
+
+def cpu_ms(client, url, headers, repeat=5, fresh=True):
+    """Median CPU ms and body size for fetching url; fresh bypasses the compressed cache."""
+    timings = []
+    size = 0
+    for _ in range(repeat):
+        if fresh:
+            compressed_cache.clear()
+        started = time.process_time()
+        size = len(client.get(url, headers=headers).get_data())
+        timings.append((time.process_time() - started) * 1000)
+    return statistics.median(timings), size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--books', type=int, default=20000)
+    parser.add_argument('--link', type=float, default=2.0, help='branch link speed in Mbit/s')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        build_catalog(os.path.join(directory, 'library.db'), args.books)
+        print(f"{'endpoint':<24} {'level':>5} {'bytes':>10} {'ratio':>6} {'CPU ms':>7} {'+CPU ms':>8} "
+              f"{'cached ms':>10} {'on link s':>10}")
+        for level in (1, 6, 9):
+            client = create_app({'GZIP_LEVEL': level}).test_client()
+            for name, url in ENDPOINTS:
+                client.get(url)
+                plain_ms, plain_size = cpu_ms(client, url, {})
+                gzip_ms, gzip_size = cpu_ms(client, url, GZIP)
+                cached_ms, _ = cpu_ms(client, url, GZIP, fresh=False)
+                if level == 1:
+                    print(f'{name:<24} {"-":>5} {plain_size:>10} {"":>6} {plain_ms:>7.1f} {"":>8} {"":>10} '
+                          f'{plain_size * 8 / args.link / 1e6:>10.2f}')
+                print(f'{name:<24} {level:>5} {gzip_size:>10} {plain_size / gzip_size:>6.1f} {gzip_ms:>7.1f} '
+                      f'{gzip_ms - plain_ms:>8.1f} {cached_ms:>10.1f} {gzip_size * 8 / args.link / 1e6:>10.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""
+Benchmark: federated catalog search, branch by branch versus in parallel.
+
+Builds one database per branch and times a title search across all of
+them, searching the branches one after another ("sequential") and through
+federated_search's thread pool ("parallel"). Runs with no added latency,
+then with a fixed delay on every branch search, standing in for branch
+databases on network or otherwise slow storage, and then with one branch
+slower than the rest.
+
+Usage:
+    python benchmarks/bench_federated_search.py [--branches 6] [--books 20000] [--queries 20]
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+from services import federated_search
+
+
+def build_branches(directory, branches, books):
+    paths = {f'branch{n}': os.path.join(directory, f'branch{n}.db') for n in range(branches)}
+    database.configure_branches(paths, 'branch0')
+    for branch in paths:
+        with database.use_branch(branch):
+            database.init_database()
+            conn = database.get_db_connection()
+            conn.executemany(
+                'INSERT INTO books (title, author, isbn, total_copies, available_copies) VALUES (?, ?, ?, ?, ?)',
+                ((f'Title {n}', f'Author {n % 997}', f'{n:013d}', 3, 3) for n in range(books))
+            )
+            conn.commit()
+            conn.close()
+    return list(paths)
+
+
+def add_latency(latency, slow_latency):
+    search = federated_search.search_branch_catalog
+
+    def delayed_search(search_term, search_type):
+        slow = database.get_current_branch() == 'branch0'
+        time.sleep(slow_latency if slow and slow_latency else latency)
+        return search(search_term, search_type)
+
+    federated_search.search_branch_catalog = delayed_search
+    return search
+
+
+def sequential(branches, term):
+    for branch in branches:
+        federated_search._search_branch(branch, term, 'title')
+
+
+def parallel(branches, term):
+    federated_search.federated_search(term, 'title', branches)
+
+
+def time_queries(search, branches, queries):
+    latencies = []
+    for n in range(queries):
+        started = time.perf_counter()
+        search(branches, f'title {n}1')
+        latencies.append((time.perf_counter() - started) * 1000)
+    return statistics.median(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--branches', type=int, default=6)
+    parser.add_argument('--books', type=int, default=20000, help='books per branch')
+    parser.add_argument('--queries', type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        branches = build_branches(directory, args.branches, args.books)
+        print(f"{'latency':>16} {'sequential ms':>14} {'parallel ms':>12}")
+        for latency, slow in ((0, 0), (0.025, 0), (0.025, 0.1)):
+            real_search = add_latency(latency, slow)
+            seq = time_queries(sequential, branches, args.queries)
+            par = time_queries(parallel, branches, args.queries)
+            federated_search.search_branch_catalog = real_search
+            name = f'{latency * 1000:.0f} ms' + (f', one {slow * 1000:.0f} ms' if slow else '')
+            print(f'{name:>16} {seq:>14.1f} {par:>12.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+"""
+Benchmark: late fee balances from the ledger versus recomputing them.
+
+Builds a loan history across many patrons, some of it returned late and
+some still out and overdue, posts it to the fee ledger (the nightly job for
+open loans, one accrual per late return), then compares a balance lookup
+with recomputing what a patron owes from every loan they ever had, and
+times the nightly accrual job itself.
+
+Usage:
+    python benchmarks/bench_fee_ledger.py [--patrons 50000] [--loans 1000000]
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+from services.fee_ledger import accrue_overdue_fees
+from services.library_service import late_fee_for_days, to_cents
+
+
+def build_history(path, patrons, loans):
+    database.DATABASE = path
+    database.init_database()
+    rng = random.Random(1)
+    now = datetime.now()
+    conn = database.get_db_connection()
+    conn.executemany(
+        'INSERT INTO books (title, author, isbn, total_copies, available_copies) VALUES (?, ?, ?, ?, ?)',
+        ((f'Book {n}', 'Author', f'{n:013d}', 1000, 1000) for n in range(1000))
+    )
+
+    def rows():
+        for n in range(loans):
+            borrowed = now - timedelta(days=rng.randrange(1, 1000), seconds=n)
+            due = borrowed + timedelta(days=14)
+            returned = None
+            if rng.random() > 0.02:
+                returned = min(borrowed + timedelta(days=rng.randrange(1, 25)), now)
+            yield (f'{rng.randrange(patrons) + 100000:06d}', rng.randrange(1000) + 1, borrowed.isoformat(),
+                   due.isoformat(), returned.isoformat() if returned else None)
+
+    conn.executemany('INSERT INTO borrow_records (patron_id, book_id, borrow_date, due_date, return_date) '
+                     'VALUES (?, ?, ?, ?, ?)', rows())
+    # What the returns would have posted
+    late = conn.execute('SELECT id, patron_id, due_date, return_date FROM borrow_records '
+                        'WHERE return_date > due_date').fetchall()
+    conn.executemany(
+        'INSERT INTO fee_ledger (patron_id, loan_id, entry_type, amount_cents, posted_date) VALUES (?, ?, ?, ?, ?)',
+        ((row['patron_id'], row['id'], 'accrual',
+          to_cents(late_fee_for_days((datetime.fromisoformat(row['return_date'])
+                                      - datetime.fromisoformat(row['due_date'])).days)), row['return_date'])
+         for row in late)
+    )
+    conn.commit()
+    conn.close()
+    return len(late)
+
+
+def recompute_balance(patron_id, now):
+    """What a patron owes without a ledger: every loan's fee, minus nothing we could know was paid."""
+    conn = database.get_read_connection()
+    loans = conn.execute('SELECT due_date, return_date FROM borrow_records WHERE patron_id = ?',
+                         (patron_id,)).fetchall()
+    conn.close()
+    return sum(to_cents(late_fee_for_days(((datetime.fromisoformat(r['return_date']) if r['return_date'] else now)
+                                           - datetime.fromisoformat(r['due_date'])).days)) for r in loans)
+
+
+def median_us(function, patrons, repeat=2000):
+    rng = random.Random(2)
+    timings = []
+    for _ in range(repeat):
+        patron_id = f'{rng.randrange(patrons) + 100000:06d}'
+        started = time.perf_counter()
+        function(patron_id)
+        timings.append((time.perf_counter() - started) * 1e6)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--patrons', type=int, default=50000)
+    parser.add_argument('--loans', type=int, default=1000000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        late = build_history(os.path.join(directory, 'library.db'), args.patrons, args.loans)
+        print(f'{args.loans} loans, {args.patrons} patrons, {late} late returns posted')
+
+        now = datetime.now()
+        started = time.perf_counter()
+        _, _, first = accrue_overdue_fees(now)
+        first_seconds = time.perf_counter() - started
+        started = time.perf_counter()
+        _, _, again = accrue_overdue_fees(now)
+        again_seconds = time.perf_counter() - started
+        tomorrow = time.perf_counter()
+        _, _, next_day = accrue_overdue_fees(now + timedelta(days=1))
+        next_day_seconds = time.perf_counter() - tomorrow
+        print(f"nightly job, first run: {first['loans']} loans, {first['entries']} accruals, {first_seconds:.2f} s")
+        print(f"same night again: {again['entries']} accruals, {again_seconds:.2f} s")
+        print(f"next night: {next_day['entries']} accruals, {next_day_seconds:.2f} s")
+
+        lookup = median_us(database.get_patron_balance, args.patrons)
+        recompute = median_us(lambda patron_id: recompute_balance(patron_id, now), args.patrons)
+        print(f'balance lookup: {lookup:.0f} us; recomputing from loans: {recompute:.0f} us')
+
+        conn = database.get_read_connection()
+        started = time.perf_counter()
+        blocked = conn.execute('SELECT COUNT(*) FROM patron_balances WHERE balance_cents > 1000').fetchone()[0]
+        ledger_scan = time.perf_counter() - started
+        conn.close()
+        started = time.perf_counter()
+        recomputed = sum(recompute_balance(f'{p + 100000:06d}', now) > 1000 for p in range(0, args.patrons, 10)) * 10
+        full_recompute = (time.perf_counter() - started) * 10
+        print(f'patrons over $10: {blocked} from balances in {ledger_scan * 1000:.0f} ms; '
+              f'~{recomputed} by recomputing, ~{full_recompute:.0f} s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+"""
+Benchmark: trigram fuzzy search latency versus catalog size.
+
+Builds a TrigramIndex over synthetic catalogs of increasing size and times
+misspelled queries, alongside a brute-force scan that compares the
+query with every word of every book, to show how each grows with the catalog.
+
+Usage:
+    python benchmarks/bench_fuzzy_search.py [--sizes 10000 100000 1000000]
+"""
+
+import argparse
+import itertools
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.suggest_index import normalize_text
+from services.trigram_index import TrigramIndex, edit_similarity
+
+# English letter frequencies, so trigram selectivity resembles real titles
+LETTERS = 'etaoinshrdlcumwfgypbvkjxqz'
+WEIGHTS = [12.7, 9.1, 8.2, 7.5, 7.0, 6.7, 6.3, 6.1, 6.0, 4.3, 4.0, 2.8, 2.8,
+           2.4, 2.4, 2.2, 2.0, 2.0, 1.9, 1.5, 1.0, 0.8, 0.2, 0.2, 0.1, 0.1]
+
+
+def make_vocabulary(rng, size):
+    words = set()
+    while len(words) < size:
+        words.add(''.join(rng.choices(LETTERS, WEIGHTS, k=rng.randint(4, 9))))
+    return sorted(words)
+
+
+def synthetic_books(n, vocabulary, rng):
+    # Zipf-like word popularity: a few words are very common, most are rare
+    cumulative = list(itertools.accumulate(1 / (rank + 1) for rank in range(len(vocabulary))))
+    for book_id in range(1, n + 1):
+        title = ' '.join(rng.choices(vocabulary, cum_weights=cumulative, k=rng.randint(2, 5)))
+        author = ' '.join(rng.choices(vocabulary, cum_weights=cumulative, k=2))
+        yield {'id': book_id, 'title': title.title(), 'author': author.title()}
+
+
+def misspell(word, rng):
+    """Swap two adjacent letters, like a typing slip."""
+    i = rng.randrange(len(word) - 1)
+    return word[:i] + word[i + 1] + word[i] + word[i + 2:]
+
+
+def brute_force(docs, query, threshold):
+    """Score the query word against every word of every book."""
+    matches = []
+    for book_id, words in docs:
+        best = max((edit_similarity(query, word) for word in words
+                    if abs(len(word) - len(query)) <= 2), default=0.0)
+        if best >= threshold:
+            matches.append((book_id, best))
+    return matches
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--brute-force-max', type=int, default=100_000,
+                        help="skip the brute-force scan above this catalog size")
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    vocabulary = make_vocabulary(rng, 200_000)
+
+    print(f"{'books':>10} {'build s':>8} {'index us/q':>11} {'scan us/q':>10}")
+    for size in args.sizes:
+        books = list(synthetic_books(size, vocabulary, random.Random(size)))
+        started = time.perf_counter()
+        index = TrigramIndex()
+        index.build(books)
+        build_seconds = time.perf_counter() - started
+
+        qrng = random.Random(7)
+        queries = [misspell(qrng.choice(books)['title'].split()[0].lower(), qrng)
+                   for _ in range(args.queries)]
+
+        started = time.perf_counter()
+        for query in queries:
+            index.search(query)
+        index_us = (time.perf_counter() - started) / len(queries) * 1e6
+
+        scan = '-'
+        if size <= args.brute_force_max:
+            docs = [(book['id'], normalize_text(f"{book['title']} {book['author']}").split())
+                    for book in books]
+            started = time.perf_counter()
+            for query in queries[:5]:
+                brute_force(docs, query, index.word_threshold)
+            scan = f"{(time.perf_counter() - started) / 5 * 1e6:,.0f}"
+
+        print(f"{size:>10,} {build_seconds:>8.1f} {index_us:>11,.0f} {scan:>10}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""
+Benchmark: circulation write throughput with and without group commit.
+
+Client threads borrow and return books through the service layer in a
+tight loop. "per-call" runs each operation in its own transaction, as the
+service layer does by default; the group commit runs use the single
+writer thread with several batch sizes and linger times.
+
+Usage:
+    python benchmarks/bench_group_commit.py [--clients 32] [--seconds 5]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+from services import write_queue
+from services.library_service import borrow_book_by_patron, return_book_by_patron
+
+CONFIGURATIONS = [
+    ('per-call', None, None),
+    ('group 8 / 1 ms', 8, 0.001),
+    ('group 32 / 2 ms', 32, 0.002),
+    ('group 128 / 5 ms', 128, 0.005),
+]
+
+
+def build_catalog(path, clients):
+    database.DATABASE = path
+    database.init_database()
+    conn = database.get_db_connection()
+    conn.executemany(
+        'INSERT INTO books (title, author, isbn, total_copies, available_copies) VALUES (?, ?, ?, ?, ?)',
+        ((f'Title {n}', 'Author', f'{n:013d}', 1, 1) for n in range(clients))
+    )
+    conn.commit()
+    conn.close()
+
+
+def client(patron_id, book_id, stop, counts, errors):
+    done = failed = 0
+    while not stop.is_set():
+        for operation in (borrow_book_by_patron, return_book_by_patron):
+            try:
+                success, _ = operation(patron_id, book_id)
+            except Exception:
+                success = False
+            done += success
+            failed += not success
+    counts.append(done)
+    errors.append(failed)
+
+
+def run(batch_size, linger, args):
+    with tempfile.TemporaryDirectory() as directory:
+        build_catalog(os.path.join(directory, 'library.db'), args.clients)
+        writer = write_queue.start_group_commit(batch_size, linger) if batch_size else None
+
+        stop = threading.Event()
+        counts, errors = [], []
+        threads = [threading.Thread(target=client, args=(f'{100000 + n}', n + 1, stop, counts, errors))
+                   for n in range(args.clients)]
+        for thread in threads:
+            thread.start()
+        time.sleep(args.seconds)
+        stop.set()
+        for thread in threads:
+            thread.join()
+        write_queue.stop_group_commit()
+
+    mean_batch = writer.operations / writer.batches if writer and writer.batches else 1.0
+    return sum(counts) / args.seconds, mean_batch, sum(errors)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--clients', type=int, default=32)
+    parser.add_argument('--seconds', type=float, default=5)
+    args = parser.parse_args()
+
+    print(f"{'mode':>18} {'writes/s':>10} {'ops/commit':>11} {'failures':>9}")
+    for name, batch_size, linger in CONFIGURATIONS:
+        writes, mean_batch, failures = run(batch_size, linger, args)
+        print(f'{name:>18} {writes:>10.0f} {mean_batch:>11.1f} {failures:>9}')
+
+
+if __name__ == '__main__':
+    main()
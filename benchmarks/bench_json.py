@@ -0,0 +1,114 @@
+"""
+Benchmark: encoding large API responses with Flask's default JSON provider
+versus LibraryJSONProvider, on the standard library and on orjson.
+
+Encodes a 100k-book search response (as one body and as a stream) and
+100k loans carrying datetimes, reporting the median time and the peak
+memory allocated while encoding. Then times /api/search over a catalog
+of that size end to end.
+
+Usage:
+    python benchmarks/bench_json.py [--books 100000]
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask.json.provider import DefaultJSONProvider
+
+import database
+from app import create_app
+from routes.json_provider import LibraryJSONProvider, orjson
+
+
+def search_response(books):
+    results = [{'id': n + 1, 'title': f'Book {n}', 'author': f'Author {n % 500}', 'isbn': f'{n:013d}',
+                'total_copies': 3, 'available_copies': n % 4} for n in range(books)]
+    return {'search_term': 'book', 'search_type': 'title', 'results': results, 'count': len(results)}
+
+
+def loans(count):
+    now = datetime.now()
+    return {'loans': [{'id': n, 'book_id': n % 1000, 'title': f'Book {n}', 'author': 'Author',
+                       'borrow_date': now - timedelta(days=n % 30), 'due_date': now + timedelta(days=14 - n % 30),
+                       'is_overdue': n % 30 > 14} for n in range(count)]}
+
+
+def measure(encode, repeat=5):
+    """Median seconds and peak MiB allocated for encode()."""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        encode()
+        timings.append(time.perf_counter() - started)
+    tracemalloc.start()
+    encode()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return statistics.median(timings), peak / 2 ** 20
+
+
+def body(response):
+    return sum(len(chunk) for chunk in response.response)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--books', type=int, default=100000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        database.DATABASE = os.path.join(directory, 'library.db')
+        app = create_app()
+        providers = [('Flask default', DefaultJSONProvider(app))]
+        stdlib = LibraryJSONProvider(app)
+        stdlib.use_orjson = False
+        providers.append(('Library, stdlib', stdlib))
+        if orjson is not None:
+            providers.append(('Library, orjson', LibraryJSONProvider(app)))
+
+        search = search_response(args.books)
+        borrowed = loans(args.books)
+        print(f"{'provider':<18} {'search ms':>10} {'peak MiB':>9} {'streamed ms':>12} {'peak MiB':>9} "
+              f"{'loans ms':>9} {'peak MiB':>9}")
+        with app.app_context():
+            for name, provider in providers:
+                whole = measure(lambda: body(provider.response(search)))
+                streamed = (measure(lambda: body(provider.stream_response(search, 'results')))
+                            if isinstance(provider, LibraryJSONProvider) else None)
+                dated = measure(lambda: body(provider.response(borrowed)))
+                streamed_text = f'{streamed[0] * 1000:>12.0f} {streamed[1]:>9.1f}' if streamed else f"{'-':>12} {'-':>9}"
+                print(f'{name:<18} {whole[0] * 1000:>10.0f} {whole[1]:>9.1f} {streamed_text} '
+                      f'{dated[0] * 1000:>9.0f} {dated[1]:>9.1f}')
+
+        conn = database.get_db_connection()
+        conn.executemany(
+            'INSERT INTO books (title, author, isbn, total_copies, available_copies) VALUES (?, ?, ?, ?, ?)',
+            ((f'Book {n}', f'Author {n % 500}', f'{n:013d}', 3, 3) for n in range(args.books))
+        )
+        conn.commit()
+        conn.close()
+        for fast in ([False, True] if orjson is not None else [False]):
+            client = create_app({'FAST_JSON': fast}).test_client()
+            client.get('/api/search?q=book')
+            timings = []
+            for n in range(5):
+                started = time.perf_counter()
+                # A distinct query string each time, past the search cache and ETags
+                response = client.get(f'/api/search?q=book&type=title&_={n}')
+                size = len(response.get_data())
+                timings.append(time.perf_counter() - started)
+            print(f"/api/search, {'orjson' if fast else 'stdlib'}: {statistics.median(timings) * 1000:.0f} ms "
+                  f'for {size / 2 ** 20:.1f} MiB')
+
+
+if __name__ == '__main__':
+    main()
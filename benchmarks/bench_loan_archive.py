@@ -0,0 +1,118 @@
+"""
+Benchmark: circulation hot-path latency before and after loan archival.
+
+Builds a borrow history of returned loans spread over several years plus a
+set of open loans, times the circulation hot paths, archives every loan
+returned more than a year ago, and times them again.
+
+Usage:
+    python benchmarks/bench_loan_archive.py [--loans 1000000] [--open 2000] [--years 3]
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+from services.library_service import (
+    borrow_book_by_patron, get_patron_status_report, return_book_by_patron
+)
+from services.loan_archive import archive_old_loans
+
+BOOKS = 10000
+PATRONS = 20000
+
+
+def build_history(path, loans, open_loans, years):
+    database.DATABASE = path
+    database.init_database()
+    conn = database.get_db_connection()
+    conn.executemany(
+        'INSERT INTO books (title, author, isbn, total_copies, available_copies) VALUES (?, ?, ?, ?, ?)',
+        ((f'Title {n}', 'Author', f'{n:013d}', 5, 5) for n in range(BOOKS))
+    )
+    rng = random.Random(1)
+    now = datetime.now()
+    days = years * 365
+
+    def returned():
+        for _ in range(loans):
+            borrowed = now - timedelta(days=20) - timedelta(seconds=rng.randrange(days * 86400))
+            yield (f'{rng.randrange(PATRONS):06d}', rng.randint(1, BOOKS), borrowed.isoformat(),
+                   (borrowed + timedelta(days=14)).isoformat(),
+                   (borrowed + timedelta(days=rng.randint(1, 20))).isoformat())
+
+    def still_open():
+        for _ in range(open_loans):
+            borrowed = now - timedelta(days=rng.randint(0, 30))
+            yield (f'{rng.randrange(PATRONS):06d}', rng.randint(1, BOOKS), borrowed.isoformat(),
+                   (borrowed + timedelta(days=14)).isoformat(), None)
+
+    insert = '''INSERT INTO borrow_records (patron_id, book_id, borrow_date, due_date, return_date)
+                VALUES (?, ?, ?, ?, ?)'''
+    conn.executemany(insert, returned())
+    conn.executemany(insert, still_open())
+    conn.commit()
+    conn.close()
+
+
+def median_ms(function, repeat=200):
+    rng = random.Random(2)
+    timings = []
+    for _ in range(repeat):
+        patron_id = f'{rng.randrange(PATRONS):06d}'
+        book_id = rng.randint(1, BOOKS)
+        started = time.perf_counter()
+        function(patron_id, book_id)
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+def borrow_and_return(patron_id, book_id):
+    borrow_book_by_patron('999999', book_id)
+    return_book_by_patron('999999', book_id)
+
+
+HOT_PATHS = [
+    ('borrow + return', borrow_and_return),
+    ('patron borrow count', lambda patron_id, book_id: database.get_patron_borrow_count(patron_id)),
+    ('patron status report', lambda patron_id, book_id: get_patron_status_report(patron_id)),
+    ('overdue loans count', lambda patron_id, book_id: database.count_overdue_loans(datetime.now().isoformat())),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--loans', type=int, default=1000000, help='returned loans')
+    parser.add_argument('--open', type=int, default=2000, help='open loans')
+    parser.add_argument('--years', type=int, default=3, help='years of history')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'library.db')
+        build_history(path, args.loans, args.open, args.years)
+        before = {name: median_ms(function) for name, function in HOT_PATHS}
+        size_before = os.path.getsize(path)
+
+        started = time.perf_counter()
+        result = archive_old_loans(older_than_days=365, batch_size=1000)
+        elapsed = time.perf_counter() - started
+        print(f"archived {result['archived']} loans in {result['batches']} batches, {elapsed:.1f} s; "
+              f"{result['live']} live rows left")
+
+        after = {name: median_ms(function) for name, function in HOT_PATHS}
+        print(f'database file: {size_before / 2**20:.0f} MiB before, {os.path.getsize(path) / 2**20:.0f} MiB after')
+        print(f"{'hot path':>22} {'before ms':>10} {'after ms':>10}")
+        for name, _ in HOT_PATHS:
+            print(f'{name:>22} {before[name]:>10.3f} {after[name]:>10.3f}')
+
+
+if __name__ == '__main__':
+    main()
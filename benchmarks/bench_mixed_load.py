@@ -0,0 +1,129 @@
+"""
+Benchmark: read latency under heavy borrow/return traffic.
+
+Writer threads borrow and return books through the service layer as fast
+as they can while reader threads issue catalog reads (book lookups and
+structured catalog queries) at a fixed rate and time each one. Readers are
+paced so that on a small machine they measure waiting on the database
+rather than competing with the writers for the CPU. Runs twice:
+
+    shared  - every operation opens its own read-write connection on a
+              rollback-journal database (the original data layer)
+    routed  - reads use the read-only pool and writes the dedicated
+              writer connection, on a WAL database
+
+Usage:
+    python benchmarks/bench_mixed_load.py [--books 10000] [--writers 4] [--readers 4] [--read-rate 50] [--seconds 10]
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+from services.library_service import borrow_book_by_patron, return_book_by_patron
+
+
+def build_catalog(path, books):
+    database.DATABASE = path
+    database.init_database()
+    conn = database.get_db_connection()
+    conn.executemany(
+        'INSERT INTO books (title, author, isbn, total_copies, available_copies) VALUES (?, ?, ?, ?, ?)',
+        ((f'Title {n}', f'Author {n % 997}', f'{n:013d}', 3, 3) for n in range(books))
+    )
+    conn.commit()
+    conn.close()
+
+
+def use_shared_connections():
+    """Route everything through fresh read-write connections, like the original code."""
+    database.get_read_connection = database.get_db_connection
+    database.get_write_connection = database.get_db_connection
+    conn = database.get_db_connection()
+    conn.execute('PRAGMA journal_mode = DELETE')
+    conn.close()
+
+
+def writer(patron_id, books, stop, counts):
+    rng = random.Random(patron_id)
+    done = 0
+    while not stop.is_set():
+        book_id = rng.randint(1, books)
+        if borrow_book_by_patron(patron_id, book_id)[0]:
+            return_book_by_patron(patron_id, book_id)
+            done += 2
+    counts.append(done)
+
+
+def reader(seed, books, rate, stop, latencies, errors):
+    rng = random.Random(seed)
+    while not stop.wait(rng.expovariate(rate)):
+        started = time.perf_counter()
+        try:
+            if rng.random() < 0.5:
+                database.get_book_by_id(rng.randint(1, books))
+            else:
+                database.query_books(author=f'Author {rng.randint(0, 996)}', available_only=True, limit=20)
+        except Exception:
+            errors.append(1)
+            continue
+        latencies.append(time.perf_counter() - started)
+
+
+def run(mode, args):
+    with tempfile.TemporaryDirectory() as directory:
+        build_catalog(os.path.join(directory, 'library.db'), args.books)
+        if mode == 'shared':
+            use_shared_connections()
+
+        stop = threading.Event()
+        latencies, errors, counts = [], [], []
+        threads = [threading.Thread(target=writer, args=(f'{100000 + n}', args.books, stop, counts))
+                   for n in range(args.writers)]
+        threads += [threading.Thread(target=reader, args=(n, args.books, args.read_rate, stop, latencies, errors))
+                    for n in range(args.readers)]
+        for thread in threads:
+            thread.start()
+        time.sleep(args.seconds)
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+    latencies.sort()
+    return {
+        'reads/s': len(latencies) / args.seconds,
+        'p50 ms': statistics.median(latencies) * 1000,
+        'p99 ms': latencies[int(len(latencies) * 0.99)] * 1000,
+        'max ms': latencies[-1] * 1000,
+        'read errors': len(errors),
+        'writes/s': sum(counts) / args.seconds
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--books', type=int, default=10_000)
+    parser.add_argument('--writers', type=int, default=4)
+    parser.add_argument('--readers', type=int, default=4)
+    parser.add_argument('--read-rate', type=float, default=50, help='reads per second per reader')
+    parser.add_argument('--seconds', type=float, default=10)
+    args = parser.parse_args()
+
+    # Routed first: the shared mode replaces the connection functions for good
+    results = {mode: run(mode, args) for mode in ('routed', 'shared')}
+    columns = list(results['routed'])
+    print(f"{'mode':>8} " + ' '.join(f'{column:>11}' for column in columns))
+    for mode in ('shared', 'routed'):
+        print(f'{mode:>8} ' + ' '.join(f'{results[mode][column]:>11.1f}' for column in columns))
+
+
+if __name__ == '__main__':
+    main()
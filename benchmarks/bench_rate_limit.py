@@ -0,0 +1,127 @@
+"""
+Benchmark: what admission control costs and what it protects.
+
+Bookkeeping: the time TokenBucketLimiter.take takes over many distinct
+keys, and the buckets and memory it holds at its cap.
+
+Abuse: --abusers threads from one address post /borrow as fast as they
+can while --kiosks threads, each from its own address, check out and
+return a book for a different patron every 250 ms. Reported for limits
+off and on: the kiosks' request latency and status codes, and how many of
+the script's requests got through.
+
+Usage:
+    python benchmarks/bench_rate_limit.py [--abusers 8] [--kiosks 4] [--seconds 5]
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+from app import create_app
+from routes.rate_limit import TokenBucketLimiter
+
+
+def bookkeeping(keys=100000, calls=1000000):
+    limiter = TokenBucketLimiter(rate=1.0, burst=20, max_buckets=keys)
+    started = time.perf_counter()
+    for n in range(calls):
+        limiter.take(f'{n % (keys * 2):06d}')
+    per_call = (time.perf_counter() - started) / calls * 1e6
+
+    tracemalloc.start()
+    held = TokenBucketLimiter(rate=1.0, burst=20, max_buckets=keys)
+    for n in range(keys * 2):
+        held.take(f'{n:06d}')
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return per_call, len(held), memory
+
+
+def abuse(limits, abusers, kiosks, seconds):
+    with tempfile.TemporaryDirectory() as directory:
+        database.DATABASE = os.path.join(directory, 'library.db')
+        app = create_app({'RATE_LIMITS': limits, 'MAX_CONCURRENT_WRITES': 4 if limits else 0,
+                          'WRITE_QUEUE_SIZE': 16, 'WRITE_QUEUE_TIMEOUT_MS': 200})
+        conn = database.get_db_connection()
+        conn.executemany(
+            'INSERT INTO books (title, author, isbn, total_copies, available_copies) VALUES (?, ?, ?, ?, ?)',
+            ((f'Book {n}', 'Author', f'{n:013d}', 1000000, 1000000) for n in range(100))
+        )
+        conn.commit()
+        conn.close()
+
+        stop = threading.Event()
+        statuses = {}
+        kiosk_statuses = {}
+        latencies = []
+        lock = threading.Lock()
+
+        def script(number):
+            client = app.test_client()
+            n = 0
+            while not stop.is_set():
+                n += 1
+                patron = f'{number * 100000 + n:06d}'
+                status = client.post('/borrow', data={'patron_id': patron, 'book_id': '4'},
+                                     environ_base={'REMOTE_ADDR': '10.9.9.9'}).status_code
+                with lock:
+                    statuses[status] = statuses.get(status, 0) + 1
+
+        def kiosk(number):
+            client = app.test_client()
+            address = {'REMOTE_ADDR': f'10.0.0.{number + 1}'}
+            n = 0
+            while not stop.is_set():
+                n += 1
+                patron = f'{500000 + number * 10000 + n:06d}'
+                for path in ('/borrow', '/return'):
+                    started = time.perf_counter()
+                    status = client.post(path, data={'patron_id': patron, 'book_id': str(number + 5)},
+                                         environ_base=address).status_code
+                    with lock:
+                        latencies.append(time.perf_counter() - started)
+                        kiosk_statuses[status] = kiosk_statuses.get(status, 0) + 1
+                time.sleep(0.25)
+
+        threads = ([threading.Thread(target=script, args=(n,)) for n in range(abusers)]
+                   + [threading.Thread(target=kiosk, args=(n,)) for n in range(kiosks)])
+        for thread in threads:
+            thread.start()
+        time.sleep(seconds)
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+        latencies.sort()
+        return (statistics.median(latencies) * 1000, latencies[int(len(latencies) * 0.99)] * 1000,
+                kiosk_statuses, statuses)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--abusers', type=int, default=8)
+    parser.add_argument('--kiosks', type=int, default=4)
+    parser.add_argument('--seconds', type=float, default=5)
+    args = parser.parse_args()
+
+    per_call, buckets, memory = bookkeeping()
+    print(f'take(): {per_call:.2f} us per call; {buckets} buckets at the cap, {memory / 2 ** 20:.1f} MiB')
+
+    print(f"{'limits':<7} {'kiosk p50 ms':>13} {'kiosk p99 ms':>13}  kiosk responses / script responses")
+    for limits in (False, True):
+        p50, p99, kiosk_statuses, statuses = abuse(limits, args.abusers, args.kiosks, args.seconds)
+        print(f"{'on' if limits else 'off':<7} {p50:>13.1f} {p99:>13.1f}  "
+              f"{dict(sorted(kiosk_statuses.items()))} / {dict(sorted(statuses.items()))}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""
+Benchmark: typeahead prefix index memory footprint and lookup latency.
+
+Builds a PrefixIndex over a synthetic catalog and reports the memory held
+by the index and per-keystroke suggestion latency.
+
+Usage:
+    python benchmarks/bench_suggest.py [--books 1000000]
+"""
+
+import argparse
+import os
+import random
+import resource
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.suggest_index import PrefixIndex
+
+WORDS = (
+    "river night garden shadow winter silver empire journey secret house "
+    "stone storm city island fire ocean crown letter memory mountain voice "
+    "light forest dream iron glass king queen war peace road song"
+).split()
+FIRST = "anna james maria john olga li chen sara david omar lucia peter".split()
+LAST = "smith garcia ivanova brown khan nakamura rossi muller dubois silva".split()
+
+
+def synthetic_books(n, seed=42):
+    rng = random.Random(seed)
+    for book_id in range(1, n + 1):
+        title = ' '.join(rng.choice(WORDS) for _ in range(rng.randint(2, 5)))
+        author = f"{rng.choice(FIRST)} {rng.choice(LAST)} {book_id % 5000}"
+        yield {'id': book_id, 'title': f"The {title} {book_id}", 'author': author}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--books', type=int, default=1_000_000)
+    parser.add_argument('--queries', type=int, default=10_000)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    index = PrefixIndex()
+    index.build(synthetic_books(args.books))
+    build_seconds = time.perf_counter() - started
+    index_bytes = index.memory_bytes()
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+    rng = random.Random(7)
+    prefixes = [rng.choice(WORDS)[:rng.randint(1, 4)] for _ in range(args.queries)]
+    started = time.perf_counter()
+    for prefix in prefixes:
+        index.suggest(prefix)
+    per_query_us = (time.perf_counter() - started) / args.queries * 1e6
+
+    started = time.perf_counter()
+    for n in range(100):
+        index.add({'id': args.books + n + 1, 'title': f"Late addition {n}", 'author': "New Author"})
+    per_insert_us = (time.perf_counter() - started) / 100 * 1e6
+
+    print(f"books:            {args.books:,}")
+    print(f"index entries:    {len(index):,}")
+    print(f"index memory:     {index_bytes / 2**20:,.1f} MiB ({index_bytes / args.books:,.0f} B/book)")
+    print(f"peak RSS (build): {peak_rss / 2**20:,.1f} MiB")
+    print(f"build time:       {build_seconds:,.1f} s")
+    print(f"suggest latency:  {per_query_us:,.1f} us/query (max 10 results)")
+    print(f"incremental add:  {per_insert_us:,.1f} us/book")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+"""
+Command line tools for library staff, run through the Flask CLI:
+
+    flask --app app overdue-report --format csv --min-days 7 > overdue.csv
+    flask --app app backfill-circulation-stats
+    flask --app app archive-loans --older-than-days 365
+    flask --app app backup --gzip --dir backups/
+    flask --app app prune-change-log --older-than-days 30
+    flask --app app backfill-copies
+    flask --app app accrue-late-fees
+"""
+
+import os
+from datetime import datetime, timedelta
+
+import click
+
+from database import backfill_copies, prune_change_log, rebuild_circulation_rollups
+from services.backup import BACKUP_PAGES, BACKUP_SLEEP, backup_database
+from services.fee_ledger import accrue_overdue_fees
+from services.loan_archive import ARCHIVE_AFTER_DAYS, ARCHIVE_BATCH_SIZE, archive_old_loans
+from services.overdue_report import REPORT_FORMATS, format_report, generate_overdue_report
+
+
+@click.command('overdue-report')
+@click.option('--format', 'report_format', type=click.Choice(REPORT_FORMATS), default='ndjson',
+              help='Output format.')
+@click.option('--min-days', type=int, default=1, help='Only loans at least this many days overdue.')
+@click.option('--min-fee', type=float, default=0.0, help='Only loans with at least this late fee.')
+@click.option('--output', type=click.File('w'), default='-', help='File to write; stdout by default.')
+def overdue_report_command(report_format, min_days, min_fee, output):
+    """Write every overdue loan with its late fee, longest overdue first."""
+    for chunk in format_report(generate_overdue_report(min_days, min_fee), report_format):
+        output.write(chunk)
+
+
+@click.command('backfill-circulation-stats')
+def backfill_circulation_stats_command():
+    """Rebuild the circulation rollups behind /api/stats from the full borrow history."""
+    days, books = rebuild_circulation_rollups()
+    click.echo(f'Rebuilt circulation stats: {days} days, {books} books.')
+
+
+@click.command('archive-loans')
+@click.option('--older-than-days', type=click.IntRange(min=0), default=ARCHIVE_AFTER_DAYS,
+              help='Archive loans returned more than this many days ago.')
+@click.option('--batch-size', type=click.IntRange(min=1), default=ARCHIVE_BATCH_SIZE,
+              help='Loans moved per transaction.')
+def archive_loans_command(older_than_days, batch_size):
+    """Move old returned loans from borrow_records to the loan archive."""
+    result = archive_old_loans(older_than_days, batch_size)
+    click.echo(f"Archived {result['archived']} loans in {result['batches']} batches; "
+               f"{result['live']} live, {result['archive']} archived.")
+
+
+@click.command('backup')
+@click.option('--output', type=click.Path(dir_okay=False), default=None,
+              help='Snapshot file; a timestamped name in --dir by default.')
+@click.option('--dir', 'directory', type=click.Path(file_okay=False), default='.',
+              help='Directory for the timestamped snapshot.')
+@click.option('--gzip', 'compress', is_flag=True, help='Compress the snapshot with gzip.')
+@click.option('--pages', type=int, default=BACKUP_PAGES, help='Pages copied per step.')
+@click.option('--sleep-ms', type=click.FloatRange(min=0), default=BACKUP_SLEEP * 1000,
+              help='Pause between steps, in milliseconds.')
+@click.option('--verify/--no-verify', default=True, help='Run an integrity check on the snapshot.')
+def backup_command(output, directory, compress, pages, sleep_ms, verify):
+    """Take a consistent snapshot of the database while the app keeps running."""
+    if output is None:
+        os.makedirs(directory, exist_ok=True)
+        name = f"library-{datetime.now().strftime('%Y%m%d-%H%M%S')}.db" + ('.gz' if compress else '')
+        output = os.path.join(directory, name)
+
+    success, message, result = backup_database(output, pages, sleep_ms / 1000, compress, verify)
+    if not success:
+        raise click.ClickException(message)
+    click.echo(f"{message} {result['pages']} pages, {result['bytes']} bytes in {result['seconds']} s "
+               f"-> {result['path']}")
+
+
+@click.command('prune-change-log')
+@click.option('--older-than-days', type=click.IntRange(min=1), default=30,
+              help='Delete changes recorded more than this many days ago.')
+def prune_change_log_command(older_than_days):
+    """Delete old /api/changes entries; consumers behind them must resync."""
+    deleted = prune_change_log((datetime.now() - timedelta(days=older_than_days)).isoformat())
+    click.echo(f'Pruned {deleted} changes.')
+
+
+@click.command('backfill-copies')
+def backfill_copies_command():
+    """Create barcoded copies for books loaded without them and attach them to open loans."""
+    created = backfill_copies()
+    click.echo(f'Created {created} copies.')
+
+
+@click.command('accrue-late-fees')
+def accrue_late_fees_command():
+    """Post the late fees overdue loans have run up to the fee ledger; run nightly."""
+    success, message, result = accrue_overdue_fees()
+    if not success:
+        raise click.ClickException(message)
+    click.echo(f"Checked {result['loans']} overdue loans, posted {result['entries']} accruals "
+               f"totalling ${result['amount']:.2f}.")
+
+
+def register_commands(app):
+    """Register the staff CLI commands on the Flask app."""
+    app.cli.add_command(overdue_report_command)
+    app.cli.add_command(backfill_circulation_stats_command)
+    app.cli.add_command(archive_loans_command)
+    app.cli.add_command(backup_command)
+    app.cli.add_command(prune_change_log_command)
+    app.cli.add_command(backfill_copies_command)
+    app.cli.add_command(accrue_late_fees_command)
@@ -3,23 +3,405 @@ Database module for Library Management System
 Handles all database operations and connections
 """
 
+import contextvars
+import json
+import os
+import queue
 import sqlite3
+import threading
+import urllib.parse
+import uuid
+from contextlib import contextmanager
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, Iterator, List, Optional, Tuple
 
 # Database configuration
 DATABASE = 'library.db'
 
+# Branch name -> database file, for deployments with one database per
+# branch. The default branch's file is DATABASE; requests and workers pick
+# another branch with use_branch().
+BRANCH_DATABASES: Dict[str, str] = {}
+_current_branch: contextvars.ContextVar = contextvars.ContextVar('branch', default=None)
+
+# Most read-only connections kept open for concurrent readers, and seconds
+# a reader waits for one when all are busy
+READ_POOL_SIZE = 8
+READ_POOL_TIMEOUT = 5.0
+
+# Catalog generation counter, bumped on every catalog write. The epoch is
+# unique per process so generations from a previous run never collide.
+CATALOG_EPOCH = uuid.uuid4().hex[:8]
+_catalog_generation = 0
+_catalog_generation_lock = threading.Lock()
+
+# Callbacks notified with the new book dict after insert_book commits
+_book_insert_listeners = []
+
+# Callbacks to rebuild in-memory catalog data when another process changed the books
+_catalog_reload_listeners = []
+
+# Sortable columns for query_books, mapped to their ORDER BY expression
+BOOK_SORT_COLUMNS = {
+    'title': 'title COLLATE NOCASE',
+    'author': 'author COLLATE NOCASE',
+    'id': 'id',
+    'available_copies': 'available_copies'
+}
+
+def configure_branches(branches: Dict[str, str], default: Optional[str] = None):
+    """
+    Set the branch databases, one file per branch name.
+
+    Args:
+        branches: Branch name -> database file path
+        default: Branch whose file becomes DATABASE, used when no branch is selected
+    """
+    global BRANCH_DATABASES, DATABASE
+    if default is not None and default not in branches:
+        raise ValueError(f"Unknown default branch: {default}")
+    BRANCH_DATABASES = dict(branches)
+    if default is not None:
+        DATABASE = BRANCH_DATABASES[default]
+
+def get_branches() -> List[str]:
+    """Get the configured branch names."""
+    return list(BRANCH_DATABASES)
+
+def get_current_branch() -> Optional[str]:
+    """Get the branch selected in this context, or None for the default database."""
+    return _current_branch.get()
+
+def get_database_path() -> str:
+    """Get the database file for the branch selected in this context."""
+    branch = _current_branch.get()
+    return DATABASE if branch is None else BRANCH_DATABASES[branch]
+
+def is_default_database() -> bool:
+    """Check whether this context uses the default database."""
+    return get_database_path() == DATABASE
+
+def select_branch(branch: Optional[str]) -> contextvars.Token:
+    """
+    Select a branch database for the rest of this context; None selects the
+    default database. Returns a token for reset_branch().
+    """
+    if branch is not None and branch not in BRANCH_DATABASES:
+        raise KeyError(branch)
+    return _current_branch.set(branch)
+
+def reset_branch(token: contextvars.Token):
+    """Restore the branch selected before select_branch()."""
+    _current_branch.reset(token)
+
+@contextmanager
+def use_branch(branch: Optional[str]):
+    """Run a block against one branch database."""
+    token = select_branch(branch)
+    try:
+        yield
+    finally:
+        reset_branch(token)
+
 def get_db_connection():
     """Get a database connection."""
-    conn = sqlite3.connect(DATABASE)
+    conn = sqlite3.connect(get_database_path())
     conn.row_factory = sqlite3.Row  # This enables column access by name
     return conn
 
+class _ReadConnection(sqlite3.Connection):
+    """Read-only pooled connection; close() hands it back to its pool."""
+
+    pool = None
+
+    def close(self):
+        if self.in_transaction:
+            self.rollback()
+        self.pool.release(self)
+
+
+class ReadConnectionPool:
+    """
+    Pool of read-only connections to one database file.
+
+    Connections are opened with mode=ro and PRAGMA query_only, so a read
+    path can never take the write lock. In WAL mode they read the last
+    committed state without waiting on, or blocking, the writer.
+    """
+
+    def __init__(self, path: str, size: int = READ_POOL_SIZE, timeout: float = READ_POOL_TIMEOUT):
+        self.path = path
+        self.size = size
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._opened = 0
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        uri = f"file:{urllib.parse.quote(os.path.abspath(self.path))}?mode=ro"
+        conn = sqlite3.connect(uri, uri=True, check_same_thread=False, factory=_ReadConnection)
+        conn.row_factory = sqlite3.Row
+        conn.execute('PRAGMA query_only = ON')
+        conn.pool = self
+        return conn
+
+    def acquire(self) -> sqlite3.Connection:
+        """
+        Take an idle connection, opening one if under size, else wait up to
+        timeout seconds for one. Raises sqlite3.OperationalError on timeout.
+        """
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            can_open = self._opened < self.size
+            if can_open:
+                self._opened += 1
+        if can_open:
+            try:
+                return self._connect()
+            except Exception:
+                with self._lock:
+                    self._opened -= 1
+                raise
+        try:
+            return self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise sqlite3.OperationalError(f'No read connection free after {self.timeout}s') from None
+
+    def release(self, conn: sqlite3.Connection):
+        self._idle.put(conn)
+
+    def close(self):
+        """Close the idle connections; busy ones are closed by the old pool's users."""
+        while True:
+            try:
+                sqlite3.Connection.close(self._idle.get_nowait())
+            except queue.Empty:
+                return
+
+
+class _WriteConnection(sqlite3.Connection):
+    """
+    The dedicated writer. It is handed out inside a BEGIN IMMEDIATE
+    transaction; commit() records the catalog state it leaves behind, and
+    close() rolls back anything uncommitted and frees the write lock.
+    """
+
+    handles = None
+
+    def commit(self):
+        if not self.in_transaction:
+            return
+        state = _read_catalog_state(self)
+        previous = self.handles.set_seen_catalog_state(state)
+        try:
+            super().commit()
+        except BaseException:
+            self.handles.set_seen_catalog_state(previous)
+            raise
+
+    def close(self):
+        if self.in_transaction:
+            self.rollback()
+        self.handles.writer_lock.release()
+
+
+class _DatabaseHandles:
+    """
+    What this process keeps open for one database file: its read pool, its
+    dedicated writer, the connection watching for commits from elsewhere,
+    and the catalog_state it last accounted for.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.read_pool = ReadConnectionPool(path)
+        self.writer = None
+        self.writer_lock = threading.RLock()
+        self.watch_conn = None
+        self.watch_data_version = None
+        self.watch_lock = threading.Lock()
+        self.seen_catalog_state = None
+        self.state_lock = threading.Lock()
+
+    def set_seen_catalog_state(self, state: Optional[Tuple[int, int]]) -> Optional[Tuple[int, int]]:
+        """Record the catalog state this process has accounted for; returns the previous one."""
+        with self.state_lock:
+            previous, self.seen_catalog_state = self.seen_catalog_state, state
+            return previous
+
+    def close(self) -> bool:
+        """Close the idle connections; returns False if the writer is in use."""
+        if not self.writer_lock.acquire(blocking=False):
+            return False
+        try:
+            if self.writer is not None:
+                sqlite3.Connection.close(self.writer)
+                self.writer = None
+        finally:
+            self.writer_lock.release()
+        self.read_pool.close()
+        with self.watch_lock:
+            if self.watch_conn is not None:
+                self.watch_conn.close()
+                self.watch_conn = None
+        return True
+
+
+_handles: Dict[str, _DatabaseHandles] = {}
+_handles_lock = threading.Lock()
+
+def _get_handles() -> _DatabaseHandles:
+    """Get the handles for this context's database, opening them on first use."""
+    path = get_database_path()
+    with _handles_lock:
+        handles = _handles.get(path)
+        if handles is None:
+            # Let go of files that are no longer configured (DATABASE was repointed)
+            in_use = set(BRANCH_DATABASES.values()) | {DATABASE}
+            for stale in [p for p in _handles if p not in in_use]:
+                if _handles[stale].close():
+                    del _handles[stale]
+            handles = _handles[path] = _DatabaseHandles(path)
+        return handles
+
+def get_read_connection() -> sqlite3.Connection:
+    """
+    Get a read-only connection from the pool. Call close() to return it,
+    in a finally block so a failed read does not keep it.
+    """
+    return _get_handles().read_pool.acquire()
+
+def get_write_connection() -> sqlite3.Connection:
+    """
+    Get the process's dedicated writer connection, holding it exclusively
+    until close() is called. In-process writers queue on a lock instead
+    of contending for SQLite's write lock. Each branch database has its
+    own writer.
+    """
+    handles = _get_handles()
+    handles.writer_lock.acquire()
+    try:
+        if handles.writer is None:
+            handles.writer = sqlite3.connect(handles.path, check_same_thread=False, isolation_level=None,
+                                             factory=_WriteConnection)
+            handles.writer.row_factory = sqlite3.Row
+            handles.writer.handles = handles
+        handles.writer.execute('BEGIN IMMEDIATE')
+    except BaseException:
+        handles.writer_lock.release()
+        raise
+    # Holding the write lock, so any change since our last commit was made elsewhere
+    _absorb_catalog_state(handles, _read_catalog_state(handles.writer))
+    return handles.writer
+
+@contextmanager
+def transaction():
+    """
+    Open a connection holding the write lock for a multi-statement change.
+
+    Commits when the block exits normally (unless the caller already rolled
+    back) and rolls back if it raises. Pass the yielded connection as conn
+    to the data-access functions so they join the transaction.
+    """
+    conn = get_write_connection()
+    changes_before = conn.total_changes
+    try:
+        yield conn
+        if conn.in_transaction:
+            conn.commit()
+            if conn.total_changes != changes_before:
+                bump_catalog_generation()
+    except BaseException:
+        if conn.in_transaction:
+            conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+def get_catalog_generation() -> int:
+    """Get the current catalog generation (no database access)."""
+    return _catalog_generation
+
+def bump_catalog_generation() -> int:
+    """Advance the catalog generation after a committed catalog write."""
+    global _catalog_generation
+    with _catalog_generation_lock:
+        _catalog_generation += 1
+        return _catalog_generation
+
+def _read_catalog_state(conn: sqlite3.Connection) -> Optional[Tuple[int, int]]:
+    """Read (generation, books_version) from catalog_state, or None before init_database."""
+    try:
+        row = conn.execute('SELECT generation, books_version FROM catalog_state WHERE id = 1').fetchone()
+    except sqlite3.OperationalError:
+        return None
+    return (row[0], row[1]) if row else None
+
+def _absorb_catalog_state(handles: _DatabaseHandles, state: Optional[Tuple[int, int]]) -> bool:
+    """
+    Compare the shared catalog state with the last one this process
+    accounted for. A difference means another process committed: the local
+    generation is bumped, and if books were added, removed or renamed in
+    the default database the catalog reload listeners rebuild what they
+    hold in memory.
+
+    Returns:
+        bool: True if another process had changed the catalog
+    """
+    previous = handles.set_seen_catalog_state(state)
+    if previous is None or state is None or previous == state:
+        return False
+    bump_catalog_generation()
+    if previous[1] != state[1] and handles.path == DATABASE:
+        for listener in _catalog_reload_listeners:
+            listener()
+    return True
+
+def sync_external_writes() -> bool:
+    """
+    Pick up catalog writes committed by other processes (or by connections
+    outside the data layer), for example at the start of each request.
+
+    Costs one PRAGMA data_version on a dedicated connection while nothing
+    has been committed anywhere; catalog_state is only read after some
+    connection did commit, and only a change that this process did not make
+    invalidates anything.
+
+    Returns:
+        bool: True if another process had changed the catalog
+    """
+    handles = _get_handles()
+    with handles.watch_lock:
+        if handles.watch_conn is None:
+            handles.watch_conn = sqlite3.connect(handles.path, check_same_thread=False)
+            handles.watch_data_version = None
+        data_version = handles.watch_conn.execute('PRAGMA data_version').fetchone()[0]
+        if data_version == handles.watch_data_version:
+            return False
+        handles.watch_data_version = data_version
+        state = _read_catalog_state(handles.watch_conn)
+    return _absorb_catalog_state(handles, state)
+
+def add_catalog_reload_listener(listener):
+    """Register a callback to rebuild in-memory catalog data after another process changed the default database's books."""
+    if listener not in _catalog_reload_listeners:
+        _catalog_reload_listeners.append(listener)
+
+def add_book_insert_listener(listener):
+    """Register a callback to be notified with each book newly inserted into the default database."""
+    if listener not in _book_insert_listeners:
+        _book_insert_listeners.append(listener)
+
 def init_database():
     """Initialize the database with required tables."""
     conn = get_db_connection()
     
+    # Let readers work from the last commit while a write is in progress
+    conn.execute('PRAGMA journal_mode = WAL')
+    
     # Create books table
     conn.execute('''
         CREATE TABLE IF NOT EXISTS books (
@@ -41,10 +423,293 @@ def init_database():
             borrow_date TEXT NOT NULL,
             due_date TEXT NOT NULL,
             return_date TEXT,
+            copy_id INTEGER,
+            FOREIGN KEY (book_id) REFERENCES books (id),
+            FOREIGN KEY (copy_id) REFERENCES copies (id)
+        )
+    ''')
+    
+    # Create copies table: one row per physical copy, identified by the
+    # barcode on its label. A copy is on loan while an open borrow record
+    # points at it.
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS copies (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            book_id INTEGER NOT NULL,
+            barcode TEXT UNIQUE NOT NULL,
+            FOREIGN KEY (book_id) REFERENCES books (id)
+        )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_copies_book ON copies (book_id, id)')
+    
+    # Databases created before copies existed get the column and their copies
+    columns = [row['name'] for row in conn.execute('PRAGMA table_info(borrow_records)')]
+    if 'copy_id' not in columns:
+        conn.execute('ALTER TABLE borrow_records ADD COLUMN copy_id INTEGER REFERENCES copies (id)')
+        backfill_copies(conn)
+    
+    # The open loan of each copy, for scan-to-return; one at most
+    conn.execute('''
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_borrow_records_open_copy
+        ON borrow_records (copy_id) WHERE return_date IS NULL
+    ''')
+    
+    # Create holds table; position orders each book's queue (FIFO)
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS holds (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            patron_id TEXT NOT NULL,
+            book_id INTEGER NOT NULL,
+            position INTEGER NOT NULL,
+            status TEXT NOT NULL DEFAULT 'active',
+            placed_date TEXT NOT NULL,
+            closed_date TEXT,
             FOREIGN KEY (book_id) REFERENCES books (id)
         )
     ''')
     
+    # Queue order per book, and the active part of each queue
+    conn.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_holds_book_position ON holds (book_id, position)')
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_holds_active_queue
+        ON holds (book_id, position) WHERE status = 'active'
+    ''')
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_holds_active_patron
+        ON holds (patron_id, book_id) WHERE status = 'active'
+    ''')
+    
+    # Open loans per patron, for borrow limits and hold allocation
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_borrow_records_open_patron
+        ON borrow_records (patron_id, book_id) WHERE return_date IS NULL
+    ''')
+    
+    # Open loans in due-date order, walked incrementally by the due-date scheduler
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_borrow_records_open_due
+        ON borrow_records (due_date, id) WHERE return_date IS NULL
+    ''')
+    
+    # Returned loans, for archiving, and each patron's recent returns
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_borrow_records_returned
+        ON borrow_records (return_date) WHERE return_date IS NOT NULL
+    ''')
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_borrow_records_returned_patron
+        ON borrow_records (patron_id, return_date) WHERE return_date IS NOT NULL
+    ''')
+    
+    # Create borrow_records_archive table: returned loans moved out of
+    # borrow_records by the archive job, keeping their original ids
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS borrow_records_archive (
+            id INTEGER PRIMARY KEY,
+            patron_id TEXT NOT NULL,
+            book_id INTEGER NOT NULL,
+            borrow_date TEXT NOT NULL,
+            due_date TEXT NOT NULL,
+            return_date TEXT NOT NULL,
+            archived_date TEXT NOT NULL
+        )
+    ''')
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_borrow_records_archive_patron
+        ON borrow_records_archive (patron_id, return_date)
+    ''')
+    
+    # Create scheduler_state table: last loan each scheduled event fired for
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS scheduler_state (
+            event TEXT PRIMARY KEY,
+            due_date TEXT NOT NULL,
+            record_id INTEGER NOT NULL
+        )
+    ''')
+    
+    # Indexes backing sorted and filtered catalog queries
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_books_title ON books (title COLLATE NOCASE)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_books_author ON books (author COLLATE NOCASE)')
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_books_available_title
+        ON books (title COLLATE NOCASE) WHERE available_copies > 0
+    ''')
+    
+    # Shared catalog state, advanced by triggers in the same transaction as
+    # every books change, so each process can tell when another one wrote
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS catalog_state (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            generation INTEGER NOT NULL,
+            books_version INTEGER NOT NULL
+        )
+    ''')
+    conn.execute('INSERT OR IGNORE INTO catalog_state (id, generation, books_version) VALUES (1, 0, 0)')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS books_insert_catalog_state AFTER INSERT ON books
+        BEGIN
+            UPDATE catalog_state SET generation = generation + 1, books_version = books_version + 1;
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS books_update_catalog_state AFTER UPDATE ON books
+        BEGIN
+            UPDATE catalog_state SET generation = generation + 1,
+                books_version = books_version + (OLD.title IS NOT NEW.title OR OLD.author IS NOT NEW.author);
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS books_delete_catalog_state AFTER DELETE ON books
+        BEGIN
+            UPDATE catalog_state SET generation = generation + 1, books_version = books_version + 1;
+        END
+    ''')
+    
+    # Append-only change log for downstream consumers, written by triggers in
+    # the same transaction as each change; ids are never reused
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS change_log (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            table_name TEXT NOT NULL,
+            row_id INTEGER NOT NULL,
+            operation TEXT NOT NULL,
+            changed_at TEXT NOT NULL,
+            data TEXT NOT NULL
+        )
+    ''')
+    for operation, row in (('insert', 'NEW'), ('update', 'NEW'), ('delete', 'OLD')):
+        conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS books_{operation}_change_log AFTER {operation.upper()} ON books
+            BEGIN
+                INSERT INTO change_log (table_name, row_id, operation, changed_at, data)
+                VALUES ('books', {row}.id, '{operation}', strftime('%Y-%m-%dT%H:%M:%f', 'now', 'localtime'),
+                        json_object('id', {row}.id, 'title', {row}.title, 'author', {row}.author,
+                                    'isbn', {row}.isbn, 'total_copies', {row}.total_copies,
+                                    'available_copies', {row}.available_copies));
+            END
+        ''')
+    for operation in ('insert', 'update'):
+        conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS borrow_records_{operation}_change_log AFTER {operation.upper()} ON borrow_records
+            BEGIN
+                INSERT INTO change_log (table_name, row_id, operation, changed_at, data)
+                VALUES ('borrow_records', NEW.id, '{operation}', strftime('%Y-%m-%dT%H:%M:%f', 'now', 'localtime'),
+                        json_object('id', NEW.id, 'patron_id', NEW.patron_id, 'book_id', NEW.book_id,
+                                    'borrow_date', NEW.borrow_date, 'due_date', NEW.due_date,
+                                    'return_date', NEW.return_date));
+            END
+        ''')
+    
+    # Circulation rollups per day and per book, kept up to date by triggers in
+    # the same transaction as each borrow and return
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS daily_circulation (
+            day TEXT PRIMARY KEY,
+            loans INTEGER NOT NULL DEFAULT 0,
+            returns INTEGER NOT NULL DEFAULT 0,
+            late_returns INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS book_circulation (
+            book_id INTEGER PRIMARY KEY,
+            loans INTEGER NOT NULL DEFAULT 0,
+            returns INTEGER NOT NULL DEFAULT 0,
+            late_returns INTEGER NOT NULL DEFAULT 0,
+            FOREIGN KEY (book_id) REFERENCES books (id)
+        )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_book_circulation_loans ON book_circulation (loans DESC, book_id)')
+    # All-time totals in a single row, so reading them does not sum every day
+    has_totals = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'circulation_totals'"
+    ).fetchone() is not None
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS circulation_totals (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            loans INTEGER NOT NULL DEFAULT 0,
+            returns INTEGER NOT NULL DEFAULT 0,
+            late_returns INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    if not has_totals:
+        # Seed the row from the daily rollups, and replace triggers from
+        # before it existed with ones that keep it up to date
+        conn.execute('''
+            INSERT INTO circulation_totals (id, loans, returns, late_returns)
+            SELECT 1, COALESCE(SUM(loans), 0), COALESCE(SUM(returns), 0), COALESCE(SUM(late_returns), 0)
+            FROM daily_circulation
+        ''')
+        conn.execute('DROP TRIGGER IF EXISTS borrow_records_insert_rollup')
+        conn.execute('DROP TRIGGER IF EXISTS borrow_records_return_rollup')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS borrow_records_insert_rollup AFTER INSERT ON borrow_records
+        BEGIN
+            INSERT INTO daily_circulation (day, loans) VALUES (substr(NEW.borrow_date, 1, 10), 1)
+                ON CONFLICT (day) DO UPDATE SET loans = loans + 1;
+            INSERT INTO book_circulation (book_id, loans) VALUES (NEW.book_id, 1)
+                ON CONFLICT (book_id) DO UPDATE SET loans = loans + 1;
+            UPDATE circulation_totals SET loans = loans + 1 WHERE id = 1;
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS borrow_records_return_rollup AFTER UPDATE OF return_date ON borrow_records
+        WHEN OLD.return_date IS NULL AND NEW.return_date IS NOT NULL
+        BEGIN
+            INSERT INTO daily_circulation (day, returns, late_returns)
+                VALUES (substr(NEW.return_date, 1, 10), 1, NEW.return_date > NEW.due_date)
+                ON CONFLICT (day) DO UPDATE SET returns = returns + 1,
+                    late_returns = late_returns + excluded.late_returns;
+            INSERT INTO book_circulation (book_id, returns, late_returns)
+                VALUES (NEW.book_id, 1, NEW.return_date > NEW.due_date)
+                ON CONFLICT (book_id) DO UPDATE SET returns = returns + 1,
+                    late_returns = late_returns + excluded.late_returns;
+            UPDATE circulation_totals SET returns = returns + 1,
+                late_returns = late_returns + (NEW.return_date > NEW.due_date)
+                WHERE id = 1;
+        END
+    ''')
+    
+    # Late fee ledger: accruals (positive), payments (negative) and refunds
+    # of payments (positive), in cents; entries are never changed
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS fee_ledger (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            patron_id TEXT NOT NULL,
+            loan_id INTEGER,
+            entry_type TEXT NOT NULL,
+            amount_cents INTEGER NOT NULL,
+            posted_date TEXT NOT NULL,
+            reference TEXT
+        )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_fee_ledger_patron ON fee_ledger (patron_id, id)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_fee_ledger_loan ON fee_ledger (loan_id, entry_type)')
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_fee_ledger_reference
+        ON fee_ledger (reference) WHERE reference IS NOT NULL
+    ''')
+    
+    # What each patron owes, kept up to date by a trigger in the same
+    # transaction as each ledger entry
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS patron_balances (
+            patron_id TEXT PRIMARY KEY,
+            balance_cents INTEGER NOT NULL DEFAULT 0,
+            updated_date TEXT NOT NULL
+        )
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS fee_ledger_insert_balance AFTER INSERT ON fee_ledger
+        BEGIN
+            INSERT INTO patron_balances (patron_id, balance_cents, updated_date)
+                VALUES (NEW.patron_id, NEW.amount_cents, NEW.posted_date)
+                ON CONFLICT (patron_id) DO UPDATE SET balance_cents = balance_cents + excluded.balance_cents,
+                    updated_date = excluded.updated_date;
+        END
+    ''')
+    
     conn.commit()
     conn.close()
 
@@ -66,14 +731,15 @@ def add_sample_data():
                 INSERT INTO books (title, author, isbn, total_copies, available_copies)
                 VALUES (?, ?, ?, ?, ?)
             ''', (title, author, isbn, copies, copies))
+        backfill_copies(conn)
         
         # Make 1984 unavailable by adding a borrow record
-        conn.execute('''
-            INSERT INTO borrow_records (patron_id, book_id, borrow_date, due_date)
-            VALUES (?, ?, ?, ?)
+        conn.execute(f'''
+            INSERT INTO borrow_records (patron_id, book_id, borrow_date, due_date, copy_id)
+            VALUES (?, ?, ?, ?, ({FREE_COPY_SQL}))
         ''', ('123456', 3, 
               (datetime.now() - timedelta(days=5)).isoformat(),
-              (datetime.now() + timedelta(days=9)).isoformat()))
+              (datetime.now() + timedelta(days=9)).isoformat(), 3))
         
         # Update available copies for 1984
         conn.execute('UPDATE books SET available_copies = 0 WHERE id = 3')
@@ -86,40 +752,126 @@ def add_sample_data():
 
 def get_all_books() -> List[Dict]:
     """Get all books from the database."""
-    conn = get_db_connection()
-    books = conn.execute('SELECT * FROM books ORDER BY title').fetchall()
-    conn.close()
+    conn = get_read_connection()
+    try:
+        books = conn.execute('SELECT * FROM books ORDER BY title').fetchall()
+    finally:
+        conn.close()
     return [dict(book) for book in books]
 
-def get_book_by_id(book_id: int) -> Optional[Dict]:
+def get_book_by_id(book_id: int, conn: Optional[sqlite3.Connection] = None) -> Optional[Dict]:
     """Get a specific book by ID."""
-    conn = get_db_connection()
-    book = conn.execute('SELECT * FROM books WHERE id = ?', (book_id,)).fetchone()
-    conn.close()
+    own_conn = conn is None
+    if own_conn:
+        conn = get_read_connection()
+    try:
+        book = conn.execute('SELECT * FROM books WHERE id = ?', (book_id,)).fetchone()
+    finally:
+        if own_conn:
+            conn.close()
     return dict(book) if book else None
 
+def get_books_by_ids(book_ids: List[int]) -> List[Dict]:
+    """Get books by ID, in the order the IDs were given."""
+    if not book_ids:
+        return []
+    conn = get_read_connection()
+    try:
+        placeholders = ', '.join('?' for _ in book_ids)
+        books = conn.execute(f'SELECT * FROM books WHERE id IN ({placeholders})', list(book_ids)).fetchall()
+    finally:
+        conn.close()
+    by_id = {book['id']: dict(book) for book in books}
+    return [by_id[book_id] for book_id in book_ids if book_id in by_id]
+
 def get_book_by_isbn(isbn: str) -> Optional[Dict]:
     """Get a specific book by ISBN."""
-    conn = get_db_connection()
-    book = conn.execute('SELECT * FROM books WHERE isbn = ?', (isbn,)).fetchone()
-    conn.close()
+    conn = get_read_connection()
+    try:
+        book = conn.execute('SELECT * FROM books WHERE isbn = ?', (isbn,)).fetchone()
+    finally:
+        conn.close()
     return dict(book) if book else None
 
+def _like_pattern(term: str) -> str:
+    """Build a LIKE pattern matching term anywhere, with wildcards escaped."""
+    escaped = term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return f'%{escaped}%'
+
+def query_books(title: Optional[str] = None, author: Optional[str] = None, isbn: Optional[str] = None,
+                available_only: bool = False, sort: str = 'title', order: str = 'asc',
+                limit: int = 20, offset: int = 0) -> Tuple[List[Dict], int]:
+    """
+    Get one page of books matching all given predicates, plus the total
+    number of matches, in a single parameterized query.
+
+    Title and author match case-insensitively anywhere in the field; ISBN
+    must match exactly.
+    """
+    if sort not in BOOK_SORT_COLUMNS:
+        raise ValueError(f'Unsupported sort column: {sort}')
+    if order not in ('asc', 'desc'):
+        raise ValueError(f'Unsupported sort order: {order}')
+
+    clauses, params = [], []
+    if title:
+        clauses.append("title LIKE ? ESCAPE '\\'")
+        params.append(_like_pattern(title))
+    if author:
+        clauses.append("author LIKE ? ESCAPE '\\'")
+        params.append(_like_pattern(author))
+    if isbn:
+        clauses.append('isbn = ?')
+        params.append(isbn)
+    if available_only:
+        clauses.append('available_copies > 0')
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+
+    conn = get_read_connection()
+    try:
+        rows = conn.execute(f'''
+            SELECT *, COUNT(*) OVER () AS total_matches
+            FROM books
+            {where}
+            ORDER BY {BOOK_SORT_COLUMNS[sort]} {order.upper()}, id {order.upper()}
+            LIMIT ? OFFSET ?
+        ''', params + [limit, offset]).fetchall()
+
+        if rows:
+            total = rows[0]['total_matches']
+        elif offset > 0:
+            # Paged past the end; count separately since no row carries the total
+            total = conn.execute(f'SELECT COUNT(*) FROM books {where}', params).fetchone()[0]
+        else:
+            total = 0
+    finally:
+        conn.close()
+
+    books = []
+    for row in rows:
+        book = dict(row)
+        del book['total_matches']
+        books.append(book)
+    return books, total
+
 def get_patron_borrowed_books(patron_id: str) -> List[Dict]:
     """Get currently borrowed books for a patron."""
-    conn = get_db_connection()
-    records = conn.execute('''
-        SELECT br.*, b.title, b.author 
-        FROM borrow_records br 
-        JOIN books b ON br.book_id = b.id 
-        WHERE br.patron_id = ? AND br.return_date IS NULL
-        ORDER BY br.borrow_date
-    ''', (patron_id,)).fetchall()
-    conn.close()
+    conn = get_read_connection()
+    try:
+        records = conn.execute('''
+            SELECT br.*, b.title, b.author 
+            FROM borrow_records br 
+            JOIN books b ON br.book_id = b.id 
+            WHERE br.patron_id = ? AND br.return_date IS NULL
+            ORDER BY br.borrow_date
+        ''', (patron_id,)).fetchall()
+    finally:
+        conn.close()
     
     borrowed_books = []
     for record in records:
         borrowed_books.append({
+            'id': record['id'],
             'book_id': record['book_id'],
             'title': record['title'],
             'author': record['author'],
@@ -130,72 +882,801 @@ def get_patron_borrowed_books(patron_id: str) -> List[Dict]:
     
     return borrowed_books
 
-def get_patron_borrow_count(patron_id: str) -> int:
+def get_patron_borrow_count(patron_id: str, conn: Optional[sqlite3.Connection] = None) -> int:
     """Get the number of books currently borrowed by a patron."""
-    conn = get_db_connection()
-    count = conn.execute('''
-        SELECT COUNT(*) as count FROM borrow_records 
-        WHERE patron_id = ? AND return_date IS NULL
-    ''', (patron_id,)).fetchone()['count']
-    conn.close()
+    own_conn = conn is None
+    if own_conn:
+        conn = get_read_connection()
+    try:
+        count = conn.execute('''
+            SELECT COUNT(*) as count FROM borrow_records 
+            WHERE patron_id = ? AND return_date IS NULL
+        ''', (patron_id,)).fetchone()['count']
+    finally:
+        if own_conn:
+            conn.close()
     return count
 
 def insert_book(title: str, author: str, isbn: str, total_copies: int, available_copies: int) -> bool:
     """Insert a new book into the database."""
-    conn = get_db_connection()
+    conn = get_write_connection()
     try:
-        conn.execute('''
+        cursor = conn.execute('''
             INSERT INTO books (title, author, isbn, total_copies, available_copies)
             VALUES (?, ?, ?, ?, ?)
         ''', (title, author, isbn, total_copies, available_copies))
+        conn.executemany('INSERT INTO copies (book_id, barcode) VALUES (?, ?)',
+                         ((cursor.lastrowid, copy_barcode(isbn, number)) for number in range(1, total_copies + 1)))
         conn.commit()
         conn.close()
-        return True
+        bump_catalog_generation()
     except Exception as e:
         conn.close()
         return False
 
-def insert_borrow_record(patron_id: str, book_id: int, borrow_date: datetime, due_date: datetime) -> bool:
-    """Insert a new borrow record into the database."""
-    conn = get_db_connection()
+    book = {
+        'id': cursor.lastrowid,
+        'title': title,
+        'author': author,
+        'isbn': isbn,
+        'total_copies': total_copies,
+        'available_copies': available_copies
+    }
+    if is_default_database():
+        for listener in _book_insert_listeners:
+            listener(book)
+    return True
+
+def insert_borrow_record(patron_id: str, book_id: int, borrow_date: datetime, due_date: datetime,
+                         conn: Optional[sqlite3.Connection] = None) -> bool:
+    """
+    Insert a new borrow record into the database (within conn's transaction
+    if given), lending the book's lowest-numbered free copy if it has copies.
+    """
+    own_conn = conn is None
+    if own_conn:
+        conn = get_write_connection()
     try:
-        conn.execute('''
-            INSERT INTO borrow_records (patron_id, book_id, borrow_date, due_date)
-            VALUES (?, ?, ?, ?)
-        ''', (patron_id, book_id, borrow_date.isoformat(), due_date.isoformat()))
-        conn.commit()
-        conn.close()
+        conn.execute(f'''
+            INSERT INTO borrow_records (patron_id, book_id, borrow_date, due_date, copy_id)
+            VALUES (?, ?, ?, ?, ({FREE_COPY_SQL}))
+        ''', (patron_id, book_id, borrow_date.isoformat(), due_date.isoformat(), book_id))
+        if own_conn:
+            conn.commit()
         return True
     except Exception as e:
-        conn.close()
         return False
+    finally:
+        if own_conn:
+            conn.close()
 
-def update_book_availability(book_id: int, change: int) -> bool:
+def update_book_availability(book_id: int, change: int, conn: Optional[sqlite3.Connection] = None) -> bool:
     """Update the available copies of a book by a given amount (+1 for return, -1 for borrow)."""
-    conn = get_db_connection()
+    own_conn = conn is None
+    if own_conn:
+        conn = get_write_connection()
     try:
         conn.execute('''
             UPDATE books SET available_copies = available_copies + ? WHERE id = ?
         ''', (change, book_id))
-        conn.commit()
-        conn.close()
+        if own_conn:
+            conn.commit()
+            bump_catalog_generation()
         return True
     except Exception as e:
-        conn.close()
         return False
+    finally:
+        if own_conn:
+            conn.close()
 
-def update_borrow_record_return_date(patron_id: str, book_id: int, return_date: datetime) -> bool:
-    """Update the return date for a borrow record."""
-    conn = get_db_connection()
+def update_borrow_record_return_date(patron_id: str, book_id: int, return_date: datetime,
+                                     conn: Optional[sqlite3.Connection] = None) -> bool:
+    """Update the return date for a borrow record (within conn's transaction if given)."""
+    own_conn = conn is None
+    if own_conn:
+        conn = get_write_connection()
     try:
         conn.execute('''
             UPDATE borrow_records 
             SET return_date = ? 
             WHERE patron_id = ? AND book_id = ? AND return_date IS NULL
         ''', (return_date.isoformat(), patron_id, book_id))
-        conn.commit()
+        if own_conn:
+            conn.commit()
+            bump_catalog_generation()
+        return True
+    except Exception as e:
+        return False
+    finally:
+        if own_conn:
+            conn.close()
+
+# Copy Operations
+
+# The lowest-numbered copy of a book (the ? parameter) that is not on loan
+FREE_COPY_SQL = '''
+    SELECT c.id FROM copies c
+    WHERE c.book_id = ? AND NOT EXISTS (
+        SELECT 1 FROM borrow_records br WHERE br.copy_id = c.id AND br.return_date IS NULL
+    )
+    ORDER BY c.id LIMIT 1
+'''
+
+def copy_barcode(isbn: str, number: int) -> str:
+    """Barcode printed on the label of a book's number-th copy."""
+    return f'{isbn}-{number}'
+
+def backfill_copies(conn: Optional[sqlite3.Connection] = None) -> int:
+    """
+    Create the copies missing from each book's total_copies, and lend a
+    free copy to every open loan that has none (within conn's transaction
+    if given). For databases from before copies, and books loaded in bulk.
+
+    Returns:
+        int: Number of copies created
+    """
+    own_conn = conn is None
+    if own_conn:
+        conn = get_write_connection()
+    try:
+        created = conn.execute('''
+            INSERT INTO copies (book_id, barcode)
+            WITH RECURSIVE missing (book_id, isbn, number, total_copies) AS (
+                SELECT b.id, b.isbn, (SELECT COUNT(*) FROM copies c WHERE c.book_id = b.id) + 1, b.total_copies
+                FROM books b
+                UNION ALL
+                SELECT book_id, isbn, number + 1, total_copies FROM missing WHERE number < total_copies
+            )
+            -- Barcodes as copy_barcode() makes them
+            SELECT book_id, isbn || '-' || number FROM missing WHERE number <= total_copies
+        ''').rowcount
+        loans = conn.execute('''
+            SELECT id, book_id FROM borrow_records WHERE return_date IS NULL AND copy_id IS NULL
+        ''').fetchall()
+        for loan_id, book_id in loans:
+            conn.execute(f'UPDATE borrow_records SET copy_id = ({FREE_COPY_SQL}) WHERE id = ?', (book_id, loan_id))
+        if own_conn:
+            conn.commit()
+        return created
+    finally:
+        if own_conn:
+            conn.close()
+
+def get_book_copies(book_id: int) -> List[Dict]:
+    """Get a book's copies with their barcodes and the open loan of each, if any."""
+    conn = get_read_connection()
+    try:
+        copies = conn.execute('''
+            SELECT c.id, c.barcode, br.patron_id, br.due_date
+            FROM copies c
+            LEFT JOIN borrow_records br ON br.copy_id = c.id AND br.return_date IS NULL
+            WHERE c.book_id = ?
+            ORDER BY c.id
+        ''', (book_id,)).fetchall()
+    finally:
+        conn.close()
+    return [{**dict(copy), 'on_loan': copy['patron_id'] is not None} for copy in copies]
+
+def get_open_loan_by_barcode(barcode: str, conn: Optional[sqlite3.Connection] = None) -> Optional[Dict]:
+    """Get the open loan of the copy with this barcode, with the book's title."""
+    own_conn = conn is None
+    if own_conn:
+        conn = get_read_connection()
+    try:
+        loan = conn.execute('''
+            SELECT br.*, c.barcode, b.title
+            FROM copies c
+            JOIN borrow_records br ON br.copy_id = c.id AND br.return_date IS NULL
+            JOIN books b ON b.id = br.book_id
+            WHERE c.barcode = ?
+        ''', (barcode,)).fetchone()
+    finally:
+        if own_conn:
+            conn.close()
+    return dict(loan) if loan else None
+
+def close_borrow_record(record_id: int, return_date: datetime, conn: Optional[sqlite3.Connection] = None) -> bool:
+    """Set the return date of one open borrow record (within conn's transaction if given)."""
+    own_conn = conn is None
+    if own_conn:
+        conn = get_write_connection()
+    try:
+        closed = conn.execute('''
+            UPDATE borrow_records SET return_date = ? WHERE id = ? AND return_date IS NULL
+        ''', (return_date.isoformat(), record_id)).rowcount == 1
+        if own_conn:
+            conn.commit()
+        return closed
+    finally:
+        if own_conn:
+            conn.close()
+
+# Hold Queue Operations
+
+# Active holds on the books selected by {books}, with the book's title and
+# each hold's 1-based place in its queue, numbered in one pass over each
+# queue's index range rather than counted per hold
+HOLD_QUEUE_SQL = '''
+    SELECT q.*, b.title FROM (
+        SELECT h.*, ROW_NUMBER() OVER (PARTITION BY h.book_id ORDER BY h.position) AS queue_position
+        FROM holds h WHERE h.status = 'active' AND h.book_id IN ({books})
+    ) q JOIN books b ON q.book_id = b.id
+'''
+
+def insert_hold(patron_id: str, book_id: int, placed_date: datetime,
+                conn: Optional[sqlite3.Connection] = None) -> Optional[Dict]:
+    """Append a hold to the end of a book's queue and return it."""
+    own_conn = conn is None
+    if own_conn:
+        conn = get_write_connection()
+    try:
+        cursor = conn.execute('''
+            INSERT INTO holds (patron_id, book_id, position, placed_date)
+            VALUES (?, ?, (SELECT COALESCE(MAX(position), 0) + 1 FROM holds WHERE book_id = ?), ?)
+        ''', (patron_id, book_id, book_id, placed_date.isoformat()))
+        hold = conn.execute(HOLD_QUEUE_SQL.format(books='?') + ' WHERE q.id = ?',
+                            (book_id, cursor.lastrowid)).fetchone()
+        if own_conn:
+            conn.commit()
+        return dict(hold)
+    except Exception as e:
+        return None
+    finally:
+        if own_conn:
+            conn.close()
+
+def get_active_hold(patron_id: str, book_id: int, conn: Optional[sqlite3.Connection] = None) -> Optional[Dict]:
+    """Get a patron's active hold on a book, if any."""
+    own_conn = conn is None
+    if own_conn:
+        conn = get_read_connection()
+    try:
+        hold = conn.execute('''
+            SELECT * FROM holds WHERE patron_id = ? AND book_id = ? AND status = 'active'
+        ''', (patron_id, book_id)).fetchone()
+    finally:
+        if own_conn:
+            conn.close()
+    return dict(hold) if hold else None
+
+def get_next_hold(book_id: int, max_loans: int, conn: Optional[sqlite3.Connection] = None) -> Optional[Dict]:
+    """
+    Get the first active hold in a book's queue whose patron has fewer
+    than max_loans open loans.
+    """
+    own_conn = conn is None
+    if own_conn:
+        conn = get_read_connection()
+    try:
+        hold = conn.execute('''
+            SELECT h.* FROM holds h
+            WHERE h.book_id = ? AND h.status = 'active'
+              AND (SELECT COUNT(*) FROM borrow_records br
+                   WHERE br.patron_id = h.patron_id AND br.return_date IS NULL) < ?
+            ORDER BY h.position
+            LIMIT 1
+        ''', (book_id, max_loans)).fetchone()
+    finally:
+        if own_conn:
+            conn.close()
+    return dict(hold) if hold else None
+
+def close_hold(hold_id: int, status: str, closed_date: datetime, patron_id: Optional[str] = None,
+               conn: Optional[sqlite3.Connection] = None) -> bool:
+    """
+    Close an active hold as 'fulfilled' or 'cancelled'.
+
+    Returns False if no matching active hold exists (or it belongs to a
+    different patron when patron_id is given).
+    """
+    own_conn = conn is None
+    if own_conn:
+        conn = get_write_connection()
+    try:
+        query = "UPDATE holds SET status = ?, closed_date = ? WHERE id = ? AND status = 'active'"
+        params = [status, closed_date.isoformat(), hold_id]
+        if patron_id is not None:
+            query += ' AND patron_id = ?'
+            params.append(patron_id)
+        updated = conn.execute(query, params).rowcount > 0
+        if own_conn:
+            conn.commit()
+        return updated
+    except Exception as e:
+        return False
+    finally:
+        if own_conn:
+            conn.close()
+
+def get_hold_queue(book_id: int) -> List[Dict]:
+    """Get the active holds on a book in queue order."""
+    conn = get_read_connection()
+    try:
+        holds = conn.execute(HOLD_QUEUE_SQL.format(books='?') + ' ORDER BY q.position', (book_id,)).fetchall()
+    finally:
+        conn.close()
+    return [dict(hold) for hold in holds]
+
+def get_patron_holds(patron_id: str) -> List[Dict]:
+    """Get a patron's active holds with their place in each queue."""
+    conn = get_read_connection()
+    try:
+        patron_books = "SELECT book_id FROM holds WHERE patron_id = ? AND status = 'active'"
+        holds = conn.execute(HOLD_QUEUE_SQL.format(books=patron_books) + ' WHERE q.patron_id = ? ORDER BY q.placed_date',
+                             (patron_id, patron_id)).fetchall()
+    finally:
+        conn.close()
+    return [dict(hold) for hold in holds]
+
+# Due-Date Scheduler Support
+
+def get_open_loans_due_after(due_date: str, record_id: int, limit: int) -> List[Dict]:
+    """
+    Get the next open loans in (due_date, id) order after the given key,
+    walking the open-loan due-date index.
+    """
+    conn = get_read_connection()
+    try:
+        records = conn.execute('''
+            SELECT id, patron_id, book_id, due_date FROM borrow_records
+            WHERE return_date IS NULL AND (due_date, id) > (?, ?)
+            ORDER BY due_date, id
+            LIMIT ?
+        ''', (due_date, record_id, limit)).fetchall()
+    finally:
+        conn.close()
+    return [dict(record) for record in records]
+
+def iter_overdue_loans(due_before: str, batch_size: int = 500) -> Iterator[List[Dict]]:
+    """
+    Yield batches of open loans due before the given time, longest overdue
+    first. Each batch is read on its own short-lived connection, keyed on
+    the open-loan due-date index, so no read transaction stays open while
+    the caller works through a batch.
+    """
+    last_due, last_id = '', 0
+    while True:
+        conn = get_read_connection()
+        try:
+            records = conn.execute('''
+                SELECT br.id, br.patron_id, br.book_id, b.title, br.borrow_date, br.due_date
+                FROM borrow_records br
+                JOIN books b ON br.book_id = b.id
+                WHERE br.return_date IS NULL AND br.due_date < ? AND (br.due_date, br.id) > (?, ?)
+                ORDER BY br.due_date, br.id
+                LIMIT ?
+            ''', (due_before, last_due, last_id, batch_size)).fetchall()
+        finally:
+            conn.close()
+        if not records:
+            return
+        yield [dict(record) for record in records]
+        if len(records) < batch_size:
+            return
+        last_due, last_id = records[-1]['due_date'], records[-1]['id']
+
+def get_open_loan_ids(record_ids: List[int], conn: Optional[sqlite3.Connection] = None) -> List[int]:
+    """Get which of the given borrow records are still open."""
+    if not record_ids:
+        return []
+    own_conn = conn is None
+    if own_conn:
+        conn = get_read_connection()
+    try:
+        placeholders = ', '.join('?' for _ in record_ids)
+        rows = conn.execute(f'''
+            SELECT id FROM borrow_records WHERE id IN ({placeholders}) AND return_date IS NULL
+        ''', list(record_ids)).fetchall()
+    finally:
+        if own_conn:
+            conn.close()
+    return [row['id'] for row in rows]
+
+def get_scheduler_watermark(event: str) -> Tuple[str, int]:
+    """Get the (due_date, record_id) of the last loan an event fired for."""
+    conn = get_read_connection()
+    try:
+        row = conn.execute('SELECT due_date, record_id FROM scheduler_state WHERE event = ?', (event,)).fetchone()
+    finally:
         conn.close()
+    return (row['due_date'], row['record_id']) if row else ('', 0)
+
+def set_scheduler_watermark(event: str, due_date: str, record_id: int) -> bool:
+    """Record the last loan an event fired for."""
+    conn = get_write_connection()
+    try:
+        conn.execute('''
+            INSERT INTO scheduler_state (event, due_date, record_id) VALUES (?, ?, ?)
+            ON CONFLICT (event) DO UPDATE SET due_date = excluded.due_date, record_id = excluded.record_id
+        ''', (event, due_date, record_id))
+        conn.commit()
         return True
     except Exception as e:
+        return False
+    finally:
+        conn.close()
+
+def rebuild_circulation_rollups() -> Tuple[int, int]:
+    """
+    Recompute the circulation rollups from the full borrow history, live
+    and archived, for databases that had loans before the rollup triggers
+    existed.
+
+    Runs in one write transaction, so the triggers cannot count a borrow or
+    return twice while it works; readers keep using the old rollups until
+    it commits.
+
+    Returns:
+        tuple: (days, books) rows written
+    """
+    with transaction() as conn:
+        conn.execute('DELETE FROM daily_circulation')
+        conn.execute('DELETE FROM book_circulation')
+        conn.execute('''
+            INSERT INTO daily_circulation (day, loans, returns, late_returns)
+            WITH loans AS (
+                SELECT book_id, borrow_date, due_date, return_date FROM borrow_records
+                UNION ALL
+                SELECT book_id, borrow_date, due_date, return_date FROM borrow_records_archive
+            )
+            SELECT day, SUM(loans), SUM(returns), SUM(late_returns) FROM (
+                SELECT substr(borrow_date, 1, 10) AS day, 1 AS loans, 0 AS returns, 0 AS late_returns
+                FROM loans
+                UNION ALL
+                SELECT substr(return_date, 1, 10), 0, 1, return_date > due_date
+                FROM loans WHERE return_date IS NOT NULL
+            )
+            GROUP BY day
+        ''')
+        days = conn.execute('SELECT COUNT(*) FROM daily_circulation').fetchone()[0]
+        conn.execute('''
+            INSERT INTO book_circulation (book_id, loans, returns, late_returns)
+            WITH loans AS (
+                SELECT book_id, due_date, return_date FROM borrow_records
+                UNION ALL
+                SELECT book_id, due_date, return_date FROM borrow_records_archive
+            )
+            SELECT book_id, COUNT(*), COUNT(return_date),
+                   COALESCE(SUM(return_date IS NOT NULL AND return_date > due_date), 0)
+            FROM loans
+            GROUP BY book_id
+        ''')
+        books = conn.execute('SELECT COUNT(*) FROM book_circulation').fetchone()[0]
+        conn.execute('''
+            UPDATE circulation_totals SET
+                (loans, returns, late_returns) = (
+                    SELECT COALESCE(SUM(loans), 0), COALESCE(SUM(returns), 0), COALESCE(SUM(late_returns), 0)
+                    FROM daily_circulation
+                )
+            WHERE id = 1
+        ''')
+    return days, books
+
+def get_daily_circulation(since_day: str) -> List[Dict]:
+    """Get the per-day circulation rollups from since_day (YYYY-MM-DD) on, oldest first."""
+    conn = get_read_connection()
+    try:
+        rows = conn.execute('''
+            SELECT day, loans, returns, late_returns FROM daily_circulation
+            WHERE day >= ? ORDER BY day
+        ''', (since_day,)).fetchall()
+    finally:
+        conn.close()
+    return [dict(row) for row in rows]
+
+def get_circulation_totals() -> Dict:
+    """Get all-time loans, returns and late returns."""
+    conn = get_read_connection()
+    try:
+        row = conn.execute('SELECT loans, returns, late_returns FROM circulation_totals WHERE id = 1').fetchone()
+    finally:
+        conn.close()
+    return dict(row) if row else {'loans': 0, 'returns': 0, 'late_returns': 0}
+
+def get_top_borrowed_books(limit: int = 10) -> List[Dict]:
+    """Get the most borrowed books with their circulation counts, most loans first."""
+    conn = get_read_connection()
+    try:
+        rows = conn.execute('''
+            SELECT bc.book_id, b.title, b.author, bc.loans, bc.returns, bc.late_returns
+            FROM book_circulation bc
+            JOIN books b ON bc.book_id = b.id
+            ORDER BY bc.loans DESC, bc.book_id
+            LIMIT ?
+        ''', (limit,)).fetchall()
+    finally:
+        conn.close()
+    return [dict(row) for row in rows]
+
+def count_overdue_loans(due_before: str) -> int:
+    """Count open loans due before the given time, from the open-loan due-date index."""
+    conn = get_read_connection()
+    try:
+        count = conn.execute('''
+            SELECT COUNT(*) FROM borrow_records WHERE return_date IS NULL AND due_date < ?
+        ''', (due_before,)).fetchone()[0]
+    finally:
+        conn.close()
+    return count
+
+def archive_returned_loans(returned_before: str, batch_size: int = 1000) -> int:
+    """
+    Move up to batch_size loans returned before the given time from
+    borrow_records to borrow_records_archive, in one short transaction.
+
+    Returns:
+        int: Number of loans archived
+    """
+    with transaction() as conn:
+        ids = [row[0] for row in conn.execute('''
+            SELECT id FROM borrow_records
+            WHERE return_date IS NOT NULL AND return_date < ?
+            ORDER BY return_date
+            LIMIT ?
+        ''', (returned_before, batch_size))]
+        if not ids:
+            return 0
+        placeholders = ', '.join('?' * len(ids))
+        conn.execute(f'''
+            INSERT INTO borrow_records_archive
+                (id, patron_id, book_id, borrow_date, due_date, return_date, archived_date)
+            SELECT id, patron_id, book_id, borrow_date, due_date, return_date, ?
+            FROM borrow_records WHERE id IN ({placeholders})
+        ''', [datetime.now().isoformat()] + ids)
+        conn.execute(f'DELETE FROM borrow_records WHERE id IN ({placeholders})', ids)
+    return len(ids)
+
+def get_loan_table_sizes() -> Dict[str, int]:
+    """Get the number of live and archived borrow records."""
+    conn = get_read_connection()
+    try:
+        live = conn.execute('SELECT COUNT(*) FROM borrow_records').fetchone()[0]
+        archived = conn.execute('SELECT COUNT(*) FROM borrow_records_archive').fetchone()[0]
+    finally:
+        conn.close()
+    return {'live': live, 'archived': archived}
+
+def get_patron_loan_history(patron_id: str, limit: int = 100) -> List[Dict]:
+    """
+    Get a patron's returned loans, most recently returned first, from both
+    borrow_records and borrow_records_archive.
+    """
+    conn = get_read_connection()
+    try:
+        records = conn.execute('''
+            SELECT loans.book_id, b.title, b.author, loans.borrow_date, loans.due_date, loans.return_date
+            FROM (
+                SELECT book_id, borrow_date, due_date, return_date FROM borrow_records
+                WHERE patron_id = ? AND return_date IS NOT NULL
+                UNION ALL
+                SELECT book_id, borrow_date, due_date, return_date FROM borrow_records_archive
+                WHERE patron_id = ?
+            ) AS loans
+            LEFT JOIN books b ON loans.book_id = b.id
+            ORDER BY loans.return_date DESC
+            LIMIT ?
+        ''', (patron_id, patron_id, limit)).fetchall()
+    finally:
+        conn.close()
+    return [dict(record) for record in records]
+
+def get_changes(since: int, limit: int = 500, conn: Optional[sqlite3.Connection] = None) -> List[Dict]:
+    """Get up to limit change_log entries with ids after since, oldest first, with data decoded."""
+    own_conn = conn is None
+    if own_conn:
+        conn = get_read_connection()
+    try:
+        rows = conn.execute('''
+            SELECT id, table_name, row_id, operation, changed_at, data FROM change_log
+            WHERE id > ? ORDER BY id LIMIT ?
+        ''', (since, limit)).fetchall()
+    finally:
+        if own_conn:
+            conn.close()
+    return [dict(row, data=json.loads(row['data'])) for row in rows]
+
+def get_change_log_bounds(conn: Optional[sqlite3.Connection] = None) -> Tuple[int, int]:
+    """
+    Get (oldest retained id, latest id assigned) for the change log. The
+    latest id survives pruning, so it is 0 only if nothing was ever logged.
+    """
+    own_conn = conn is None
+    if own_conn:
+        conn = get_read_connection()
+    try:
+        oldest = conn.execute('SELECT MIN(id) FROM change_log').fetchone()[0]
+        latest = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'change_log'").fetchone()
+    finally:
+        if own_conn:
+            conn.close()
+    latest = latest[0] if latest else 0
+    return (oldest if oldest is not None else latest + 1), latest
+
+def prune_change_log(changed_before: str) -> int:
+    """Delete change_log entries recorded before the given time; returns how many."""
+    with transaction() as conn:
+        return conn.execute('DELETE FROM change_log WHERE changed_at < ?', (changed_before,)).rowcount
+
+@contextmanager
+def read_transaction():
+    """
+    Open a pooled read connection in a transaction, so every query made
+    with it in the block sees the same committed state. Pass the yielded
+    connection as conn to the data-access functions.
+    """
+    conn = get_read_connection()
+    try:
+        conn.execute('BEGIN')
+        yield conn
+    finally:
         conn.close()
+
+@contextmanager
+def catalog_snapshot():
+    """
+    Read the whole catalog and the change log position it corresponds to,
+    in one read transaction.
+
+    Yields:
+        tuple: (change cursor, iterator of (id, title, author, isbn,
+            total_copies, available_copies) rows ordered by title and id)
+    """
+    with read_transaction() as conn:
+        row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'change_log'").fetchone()
+        rows = conn.execute('''
+            SELECT id, title, author, isbn, total_copies, available_copies
+            FROM books ORDER BY title, id
+        ''')
+        yield (row[0] if row else 0), (tuple(book) for book in rows)
+
+# Fee Ledger Operations
+
+def get_latest_loan(patron_id: str, book_id: int, conn: Optional[sqlite3.Connection] = None) -> Optional[Dict]:
+    """Get a patron's open loan of a book, or else their most recently returned one."""
+    own_conn = conn is None
+    if own_conn:
+        conn = get_read_connection()
+    try:
+        # One lookup on each partial index, rather than ordering every loan
+        # of the book by whether it is open
+        loan = conn.execute('''
+            SELECT * FROM borrow_records
+            WHERE patron_id = ? AND book_id = ? AND return_date IS NULL
+            ORDER BY borrow_date DESC, id DESC
+            LIMIT 1
+        ''', (patron_id, book_id)).fetchone()
+        if loan is None:
+            loan = conn.execute('''
+                SELECT * FROM borrow_records
+                WHERE patron_id = ? AND return_date IS NOT NULL AND book_id = ?
+                ORDER BY return_date DESC, id DESC
+                LIMIT 1
+            ''', (patron_id, book_id)).fetchone()
+    finally:
+        if own_conn:
+            conn.close()
+    return dict(loan) if loan else None
+
+# A patron's open loans, narrowed by {book_filter}, with what has been paid on each
+OPEN_LOANS_WITH_PAYMENTS_SQL = '''
+    SELECT br.id, br.patron_id, br.book_id, br.borrow_date, br.due_date, b.title,
+           COALESCE((SELECT -SUM(f.amount_cents) FROM fee_ledger f
+                     WHERE f.loan_id = br.id AND f.entry_type IN ('payment', 'refund')), 0) AS paid_cents
+    FROM borrow_records br
+    JOIN books b ON b.id = br.book_id
+    WHERE br.patron_id = ? {book_filter} AND br.return_date IS NULL
+    ORDER BY br.due_date, br.id
+'''
+
+def get_open_loans_with_payments(patron_id: str, book_id: Optional[int] = None,
+                                 conn: Optional[sqlite3.Connection] = None) -> List[Dict]:
+    """
+    Get a patron's open loans (of one book if book_id is given), earliest
+    due first, with the book's title and paid_cents: what payments net of
+    refunds have settled on each loan so far.
+    """
+    own_conn = conn is None
+    if own_conn:
+        conn = get_read_connection()
+    try:
+        book_filter = 'AND br.book_id = ?' if book_id is not None else ''
+        params = (patron_id, book_id) if book_id is not None else (patron_id,)
+        loans = conn.execute(OPEN_LOANS_WITH_PAYMENTS_SQL.format(book_filter=book_filter), params).fetchall()
+    finally:
+        if own_conn:
+            conn.close()
+    return [dict(loan) for loan in loans]
+
+def get_accrued_fees(loan_ids: List[int], conn: Optional[sqlite3.Connection] = None) -> Dict[int, int]:
+    """Get the late fees accrued so far on each of the given loans, in cents."""
+    if not loan_ids:
+        return {}
+    own_conn = conn is None
+    if own_conn:
+        conn = get_read_connection()
+    try:
+        placeholders = ', '.join('?' for _ in loan_ids)
+        rows = conn.execute(f'''
+            SELECT loan_id, SUM(amount_cents) FROM fee_ledger
+            WHERE loan_id IN ({placeholders}) AND entry_type = 'accrual'
+            GROUP BY loan_id
+        ''', list(loan_ids)).fetchall()
+    finally:
+        if own_conn:
+            conn.close()
+    return {loan_id: accrued for loan_id, accrued in rows}
+
+def get_loan_fees(loan_id: int, conn: Optional[sqlite3.Connection] = None) -> Tuple[int, int]:
+    """Get the late fees accrued on a loan and what payments net of refunds have settled, in cents."""
+    own_conn = conn is None
+    if own_conn:
+        conn = get_read_connection()
+    try:
+        accrued, paid = conn.execute('''
+            SELECT COALESCE(SUM(CASE WHEN entry_type = 'accrual' THEN amount_cents END), 0),
+                   COALESCE(-SUM(CASE WHEN entry_type IN ('payment', 'refund') THEN amount_cents END), 0)
+            FROM fee_ledger WHERE loan_id = ?
+        ''', (loan_id,)).fetchone()
+    finally:
+        if own_conn:
+            conn.close()
+    return accrued, paid
+
+def insert_fee_entries(entries: List[Tuple], conn: Optional[sqlite3.Connection] = None) -> bool:
+    """
+    Post ledger entries, each (patron_id, loan_id, entry_type, amount_cents,
+    posted_date, reference), within conn's transaction if given.
+    """
+    own_conn = conn is None
+    if own_conn:
+        conn = get_write_connection()
+    try:
+        conn.executemany('''
+            INSERT INTO fee_ledger (patron_id, loan_id, entry_type, amount_cents, posted_date, reference)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', entries)
+        if own_conn:
+            conn.commit()
+        return True
+    except Exception as e:
         return False
+    finally:
+        if own_conn:
+            conn.close()
+
+def get_patron_balance(patron_id: str, conn: Optional[sqlite3.Connection] = None) -> int:
+    """Get what a patron owes in late fees, in cents."""
+    own_conn = conn is None
+    if own_conn:
+        conn = get_read_connection()
+    try:
+        row = conn.execute('SELECT balance_cents FROM patron_balances WHERE patron_id = ?', (patron_id,)).fetchone()
+    finally:
+        if own_conn:
+            conn.close()
+    return row[0] if row else 0
+
+def get_fee_ledger(patron_id: str, limit: int = 50) -> List[Dict]:
+    """Get a patron's most recent ledger entries, newest first."""
+    conn = get_read_connection()
+    try:
+        entries = conn.execute('''
+            SELECT * FROM fee_ledger WHERE patron_id = ? ORDER BY id DESC LIMIT ?
+        ''', (patron_id, limit)).fetchall()
+    finally:
+        conn.close()
+    return [dict(entry) for entry in entries]
+
+def get_payment_entry(reference: str, conn: Optional[sqlite3.Connection] = None) -> Optional[Dict]:
+    """Get the payment entry posted for a gateway transaction."""
+    own_conn = conn is None
+    if own_conn:
+        conn = get_read_connection()
+    try:
+        entry = conn.execute('''
+            SELECT * FROM fee_ledger WHERE reference = ? AND entry_type = 'payment'
+        ''', (reference,)).fetchone()
+    finally:
+        if own_conn:
+            conn.close()
+    return dict(entry) if entry else None
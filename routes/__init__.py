@@ -6,10 +6,12 @@ from .catalog_routes import catalog_bp
 from .borrowing_routes import borrowing_bp
 from .search_routes import search_bp
 from .api_routes import api_bp
+from .async_api_routes import async_api_bp
 
 def register_blueprints(app):
     """Register all route blueprints with the Flask app."""
     app.register_blueprint(catalog_bp)
     app.register_blueprint(borrowing_bp)
     app.register_blueprint(search_bp)
-    app.register_blueprint(api_bp)
+    # The async /api needs Flask's async extra (asgiref)
+    app.register_blueprint(async_api_bp if app.config.get('ASYNC_API') else api_bp)
@@ -2,38 +2,473 @@
 API Routes - JSON API endpoints
 """
 
-from flask import Blueprint, jsonify, request
-from services.library_service import calculate_late_fee_for_book, search_books_in_catalog
+import json
+
+from flask import Blueprint, Response, current_app, jsonify, request
+from database import get_book_copies, get_current_branch, get_hold_queue, get_patron_holds, use_branch
+from services.library_service import (
+    calculate_late_fee_for_book, search_books_in_catalog, get_search_suggestions, query_catalog,
+    place_hold, cancel_hold, pay_late_fees, refund_late_fee_payment, return_book_by_barcode, get_patron_fees,
+    get_patron_late_fee_quotes
+)
+from services.availability_stream import (
+    HEARTBEAT_INTERVAL, get_availability_broadcaster, replay_availability
+)
+from services.change_feed import CHANGES_PAGE_SIZE, read_changes
+from services.circulation_stats import get_circulation_stats
+from services.federated_search import federated_search
+from services.overdue_report import REPORT_FORMATS, format_report, generate_overdue_report
+from services.search_cache import search_cache
+from routes.http_cache import conditional_on_catalog
 
 api_bp = Blueprint('api', __name__, url_prefix='/api')
 
+# Parameters that switch /api/search to a structured catalog query
+QUERY_PARAMS = ('title', 'author', 'isbn', 'available_only', 'sort', 'order', 'limit', 'offset')
+
 @api_bp.route('/late_fee/<patron_id>/<int:book_id>')
 def get_late_fee(patron_id, book_id):
     """
     Calculate late fee for a specific book borrowed by a patron.
     API endpoint for R4: Late Fee Calculation
+    
+    Prices the patron's open loan of the book, or else their latest
+    returned one; 404 if they never borrowed it.
     """
     result = calculate_late_fee_for_book(patron_id, book_id)
-    return jsonify(result), 501 if 'not implemented' in result.get('status', '') else 200
+    return jsonify(result), 404 if result.get('status') == 'No loan' else 200
+
+@api_bp.route('/late_fees/<patron_id>')
+def get_patron_late_fees(patron_id):
+    """
+    Late fees on all of a patron's open loans, with what is still due on
+    each and in total.
+    """
+    success, message, quote = get_patron_late_fee_quotes(patron_id)
+    if not success:
+        return jsonify({'error': message}), 400
+    return jsonify(quote)
 
 @api_bp.route('/search')
+@conditional_on_catalog
 def search_books_api():
     """
     Search for books via API endpoint.
     Alternative API interface for R5: Book Search Functionality
+    
+    Any of title, author, isbn, available_only, sort, order, limit or offset
+    turns the request into a structured query (see catalog_query).
     """
+    if any(param in request.args for param in QUERY_PARAMS):
+        return catalog_query()
+    
     search_term = request.args.get('q', '').strip()
     search_type = request.args.get('type', 'title')
+    page = request.args.get('page', type=int)
     
     if not search_term:
         return jsonify({'error': 'Search term is required'}), 400
     
+    if page is not None and page < 1:
+        return jsonify({'error': 'Page must be a positive integer'}), 400
+    
     # Use business logic function
-    books = search_books_in_catalog(search_term, search_type)
+    books = search_books_in_catalog(search_term, search_type, page)
     
-    return jsonify({
+    response = {
         'search_term': search_term,
         'search_type': search_type,
         'results': books,
         'count': len(books)
+    }
+    if page is not None:
+        response['page'] = page
+    # Unpaged searches can match most of the catalog
+    return current_app.json.stream_response(response, 'results')
+
+def catalog_query():
+    """
+    Structured catalog query combining predicates, sorting and paging.
+    
+    Query parameters: title, author, isbn, available_only, sort, order,
+    limit, offset. q with type=title/author/isbn adds one more predicate.
+    """
+    filters = {field: request.args.get(field) for field in ('title', 'author', 'isbn')}
+    
+    search_term = request.args.get('q', '').strip()
+    if search_term:
+        search_type = request.args.get('type', 'title')
+        if search_type not in filters:
+            return jsonify({'error': 'Search type must be title, author or isbn in a structured query'}), 400
+        filters[search_type] = search_term
+    
+    try:
+        limit = int(request.args.get('limit', 20))
+        offset = int(request.args.get('offset', 0))
+    except ValueError:
+        return jsonify({'error': 'Limit and offset must be integers'}), 400
+    
+    available_only = request.args.get('available_only', '').lower() in ('1', 'true', 'yes')
+    sort = request.args.get('sort', 'title')
+    order = request.args.get('order', 'asc').lower()
+    
+    # Use business logic function
+    success, message, page = query_catalog(
+        available_only=available_only, sort=sort, order=order,
+        limit=limit, offset=offset, **filters
+    )
+    if not success:
+        return jsonify({'error': message}), 400
+    
+    return jsonify({
+        'query': {
+            **{field: value for field, value in filters.items() if value},
+            'available_only': available_only,
+            'sort': sort,
+            'order': order,
+            'limit': limit,
+            'offset': offset
+        },
+        'results': page['results'],
+        'count': len(page['results']),
+        'total': page['total']
     })
+
+@api_bp.route('/search/cache')
+def search_cache_stats():
+    """
+    Report search result cache size and hit-rate metrics.
+    """
+    return jsonify(search_cache.stats())
+
+
+@api_bp.route('/search/federated')
+def federated_search_api():
+    """
+    Search the catalogs of all branches at once.
+    
+    Query parameters: q, type (title, author or isbn), branches
+    (comma-separated; all configured branches by default)
+    """
+    search_term = request.args.get('q', '').strip()
+    search_type = request.args.get('type', 'title')
+    branches = request.args.get('branches')
+    if branches is not None:
+        branches = [branch.strip() for branch in branches.split(',') if branch.strip()]
+    
+    success, message, result = federated_search(search_term, search_type, branches)
+    if not success:
+        return jsonify({'error': message}), 400
+    
+    return jsonify({'search_term': search_term, 'search_type': search_type, **result})
+
+
+@api_bp.route('/suggest')
+def suggest_api():
+    """
+    Typeahead suggestions for the search box, served from memory.
+    """
+    query = request.args.get('q', '')
+    limit = request.args.get('limit', 10, type=int)
+    
+    if limit < 1:
+        return jsonify({'error': 'Limit must be a positive integer'}), 400
+    
+    suggestions = get_search_suggestions(query, limit)
+    
+    return jsonify({
+        'query': query,
+        'suggestions': suggestions,
+        'count': len(suggestions)
+    })
+
+
+@api_bp.route('/returns/scan', methods=['POST'])
+def scan_return_api():
+    """
+    Return the copy whose barcode was scanned at the desk.
+    Body (JSON or form): barcode
+    """
+    data = request.get_json(silent=True) or request.form
+    
+    success, message = return_book_by_barcode(str(data.get('barcode', '')))
+    if not success:
+        return jsonify({'error': message}), 404 if message.startswith('No open loan') else 400
+    
+    return jsonify({'message': message})
+
+@api_bp.route('/books/<int:book_id>/copies')
+def book_copies_api(book_id):
+    """
+    List a book's copies with their barcodes and who has each on loan.
+    """
+    copies = get_book_copies(book_id)
+    return jsonify({'book_id': book_id, 'copies': copies, 'count': len(copies)})
+
+
+@api_bp.route('/holds', methods=['POST'])
+def place_hold_api():
+    """
+    Place a hold on a book with no available copies.
+    Body (JSON or form): patron_id, book_id
+    """
+    data = request.get_json(silent=True) or request.form
+    patron_id = str(data.get('patron_id', '')).strip()
+    
+    try:
+        book_id = int(data.get('book_id', ''))
+    except (ValueError, TypeError):
+        return jsonify({'error': 'Invalid book ID.'}), 400
+    
+    success, message, hold = place_hold(patron_id, book_id)
+    if not success:
+        return jsonify({'error': message}), 404 if message == 'Book not found.' else 400
+    
+    return jsonify({'message': message, 'hold': hold}), 201
+
+@api_bp.route('/holds/<int:hold_id>', methods=['DELETE'])
+def cancel_hold_api(hold_id):
+    """
+    Cancel one of a patron's holds.
+    Query parameter: patron_id
+    """
+    patron_id = request.args.get('patron_id', '').strip()
+    
+    success, message = cancel_hold(patron_id, hold_id)
+    if not success:
+        return jsonify({'error': message}), 404
+    
+    return jsonify({'message': message})
+
+@api_bp.route('/holds/book/<int:book_id>')
+def book_hold_queue_api(book_id):
+    """
+    Inspect the hold queue for a book, first in line first.
+    """
+    holds = get_hold_queue(book_id)
+    return jsonify({'book_id': book_id, 'holds': holds, 'count': len(holds)})
+
+@api_bp.route('/holds/patron/<patron_id>')
+def patron_holds_api(patron_id):
+    """
+    List a patron's active holds with their position in each queue.
+    """
+    holds = get_patron_holds(patron_id)
+    return jsonify({'patron_id': patron_id, 'holds': holds, 'count': len(holds)})
+
+
+@api_bp.route('/overdue')
+def overdue_report_api():
+    """
+    Stream every overdue loan with its late fee, longest overdue first.
+    Query parameters: format (ndjson or csv), min_days, min_fee
+    """
+    report_format = request.args.get('format', 'ndjson').lower()
+    if report_format not in REPORT_FORMATS:
+        return jsonify({'error': 'Format must be ndjson or csv'}), 400
+    
+    try:
+        min_days = int(request.args.get('min_days', 1))
+        min_fee = float(request.args.get('min_fee', 0))
+    except ValueError:
+        return jsonify({'error': 'min_days must be an integer and min_fee a number'}), 400
+    
+    # The report is read while it is sent, after the request's branch is reset
+    branch = get_current_branch()
+    
+    def lines():
+        with use_branch(branch):
+            rows = generate_overdue_report(min_days_overdue=min_days, min_fee=min_fee)
+            yield from format_report(rows, report_format)
+    
+    mimetype = 'text/csv' if report_format == 'csv' else 'application/x-ndjson'
+    return Response(lines(), mimetype=mimetype)
+
+
+@api_bp.route('/stats')
+def circulation_stats_api():
+    """
+    Circulation statistics from the rollup tables: daily loans and returns,
+    late return rates, most borrowed books and loans overdue now.
+    Query parameters: days (default 30), top (default 10)
+    """
+    try:
+        days = int(request.args.get('days', 30))
+        top = int(request.args.get('top', 10))
+    except ValueError:
+        return jsonify({'error': 'days and top must be integers'}), 400
+    
+    success, message, stats = get_circulation_stats(days, top)
+    if not success:
+        return jsonify({'error': message}), 400
+    
+    return jsonify(stats)
+
+
+@api_bp.route('/changes')
+def changes_api():
+    """
+    Changes to books and borrow records after a cursor, oldest first.
+    Query parameters: since (id of the last change processed, default 0),
+    limit. Pass the response's next as since to continue; 410 means the
+    cursor is older than the retained log and the consumer must resync.
+    """
+    try:
+        since = int(request.args.get('since', 0))
+        limit = int(request.args.get('limit', CHANGES_PAGE_SIZE))
+    except ValueError:
+        return jsonify({'error': 'since and limit must be integers'}), 400
+    
+    success, message, page = read_changes(since, limit)
+    if not success:
+        if page is not None:
+            return jsonify({'error': message, **page}), 410
+        return jsonify({'error': message}), 400
+    
+    return jsonify(page)
+
+
+def format_event(event_id: int, event: str, data) -> str:
+    """Encode one server-sent event."""
+    return f"id: {event_id}\nevent: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def availability_event(batch) -> str:
+    batch_id, changes = batch
+    return format_event(batch_id, 'availability', [
+        {'book_id': book_id, 'available_copies': available} for book_id, available in changes
+    ])
+
+
+@api_bp.route('/availability/stream')
+def availability_stream_api():
+    """
+    Server-sent events carrying available_copies changes as borrows and
+    returns commit. Each 'availability' event's data is a list of
+    {book_id, available_copies} and its id is a change log cursor. A client
+    reconnecting with Last-Event-ID first gets the changes it missed, or a
+    'reset' event if they were pruned and it should reload the catalog.
+    """
+    try:
+        last_event_id = int(request.headers.get('Last-Event-ID', -1))
+    except ValueError:
+        return jsonify({'error': 'Last-Event-ID must be an integer'}), 400
+    
+    broadcaster = get_availability_broadcaster()
+    subscription = broadcaster.subscribe()
+    if subscription is None:
+        response = jsonify({'error': 'Too many availability subscribers'})
+        response.headers['Retry-After'] = '5'
+        return response, 503
+    
+    def events():
+        yield 'retry: 3000\n\n'
+        last = subscription.since
+        if 0 <= last_event_id < last:
+            success, _, batches = replay_availability(broadcaster.branch, last_event_id, last)
+            if not success:
+                yield format_event(last, 'reset', {})
+            for batch in batches:
+                yield availability_event(batch)
+        else:
+            last = max(last, last_event_id)
+        
+        # A dropped subscriber's stream ends; the client reconnects and replays
+        while not subscription.dropped:
+            batch = subscription.get(HEARTBEAT_INTERVAL)
+            if batch is None:
+                yield ': keep-alive\n\n'
+                continue
+            if batch[0] <= last:
+                continue
+            last = batch[0]
+            yield availability_event(batch)
+    
+    response = Response(events(), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    response.call_on_close(lambda: broadcaster.unsubscribe(subscription))
+    return response
+
+
+@api_bp.route('/patrons/<patron_id>/fees')
+def patron_fees_api(patron_id):
+    """
+    What a patron owes in late fees, whether that blocks borrowing, and
+    their latest fee ledger entries.
+    Query parameter: limit (entries, default 50)
+    """
+    try:
+        limit = int(request.args.get('limit', 50))
+    except ValueError:
+        return jsonify({'error': 'limit must be an integer'}), 400
+    
+    success, message, fees = get_patron_fees(patron_id, min(max(limit, 0), 500))
+    if not success:
+        return jsonify({'error': message}), 400
+    
+    return jsonify(fees)
+
+
+def parse_payment_request():
+    """
+    Read patron_id and book_ids (or a single book_id) from a payment request body.
+    
+    Returns:
+        tuple: (patron_id, book_ids, error message or None)
+    """
+    data = request.get_json(silent=True) or {}
+    patron_id = str(data.get('patron_id', '')).strip()
+    book_ids = data.get('book_ids', [data['book_id']] if 'book_id' in data else [])
+    
+    if not isinstance(book_ids, list) or not book_ids:
+        return patron_id, [], 'book_id or a list of book_ids is required'
+    try:
+        book_ids = [int(book_id) for book_id in book_ids]
+    except (ValueError, TypeError):
+        return patron_id, [], 'Invalid book ID.'
+    return patron_id, book_ids, None
+
+def parse_refund_request():
+    """
+    Read transaction_id and amount from a refund request body.
+    
+    Returns:
+        tuple: (transaction_id, amount, error message or None)
+    """
+    data = request.get_json(silent=True) or {}
+    try:
+        amount = float(data.get('amount', ''))
+    except (ValueError, TypeError):
+        return '', 0.0, 'Amount must be a number'
+    return str(data.get('transaction_id', '')), amount, None
+
+@api_bp.route('/late_fees/pay', methods=['POST'])
+def pay_late_fees_api():
+    """
+    Pay the late fees on one or more books through the payment gateway.
+    Body (JSON): patron_id, book_id or book_ids
+    """
+    patron_id, book_ids, error = parse_payment_request()
+    if error:
+        return jsonify({'error': error}), 400
+    
+    payments = []
+    for book_id in book_ids:
+        success, message, transaction_id = pay_late_fees(patron_id, book_id)
+        payments.append({'book_id': book_id, 'success': success, 'message': message,
+                         'transaction_id': transaction_id})
+    return jsonify({'patron_id': patron_id, 'payments': payments})
+
+@api_bp.route('/late_fees/refund', methods=['POST'])
+def refund_late_fee_api():
+    """
+    Refund a late fee payment.
+    Body (JSON): transaction_id, amount
+    """
+    transaction_id, amount, error = parse_refund_request()
+    if error:
+        return jsonify({'error': error}), 400
+    
+    success, message = refund_late_fee_payment(transaction_id, amount)
+    return jsonify({'success': success, 'message': message}), 200 if success else 400
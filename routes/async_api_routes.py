@@ -0,0 +1,82 @@
+"""
+Async API Routes - The /api blueprint as async views
+Registered instead of api_routes when the app is created with ASYNC_API.
+"""
+
+from functools import wraps
+
+from flask import Blueprint, copy_current_request_context, jsonify
+from routes import api_routes
+from services.async_service import (
+    run_db, pay_late_fees_for_books_async, refund_late_fee_payment_async
+)
+
+async_api_bp = Blueprint('api', __name__, url_prefix='/api')
+
+
+def offload(view):
+    """Serve a synchronous view from the bounded database executor."""
+    @wraps(view)
+    async def wrapper(*args, **kwargs):
+        return await run_db(copy_current_request_context(view), *args, **kwargs)
+    return wrapper
+
+
+def inline(view):
+    """Serve a synchronous in-memory view directly on the event loop."""
+    @wraps(view)
+    async def wrapper(*args, **kwargs):
+        return view(*args, **kwargs)
+    return wrapper
+
+
+# Endpoints that touch SQLite run on the executor; the suggest index and
+# cache stats live in memory and answer inline
+for rule, view, methods in (
+    ('/late_fee/<patron_id>/<int:book_id>', offload(api_routes.get_late_fee), ['GET']),
+    ('/late_fees/<patron_id>', offload(api_routes.get_patron_late_fees), ['GET']),
+    ('/search', offload(api_routes.search_books_api), ['GET']),
+    ('/search/cache', inline(api_routes.search_cache_stats), ['GET']),
+    ('/search/federated', offload(api_routes.federated_search_api), ['GET']),
+    ('/suggest', inline(api_routes.suggest_api), ['GET']),
+    ('/returns/scan', offload(api_routes.scan_return_api), ['POST']),
+    ('/books/<int:book_id>/copies', offload(api_routes.book_copies_api), ['GET']),
+    ('/holds', offload(api_routes.place_hold_api), ['POST']),
+    ('/holds/<int:hold_id>', offload(api_routes.cancel_hold_api), ['DELETE']),
+    ('/holds/book/<int:book_id>', offload(api_routes.book_hold_queue_api), ['GET']),
+    ('/holds/patron/<patron_id>', offload(api_routes.patron_holds_api), ['GET']),
+    ('/overdue', offload(api_routes.overdue_report_api), ['GET']),
+    ('/stats', offload(api_routes.circulation_stats_api), ['GET']),
+    ('/changes', offload(api_routes.changes_api), ['GET']),
+    ('/availability/stream', offload(api_routes.availability_stream_api), ['GET']),
+    ('/patrons/<patron_id>/fees', offload(api_routes.patron_fees_api), ['GET']),
+):
+    async_api_bp.add_url_rule(rule, view_func=view, methods=methods)
+
+
+@async_api_bp.route('/late_fees/pay', methods=['POST'])
+async def pay_late_fees_api():
+    """
+    Pay the late fees on one or more books, with the gateway calls in flight together.
+    Body (JSON): patron_id, book_id or book_ids
+    """
+    patron_id, book_ids, error = api_routes.parse_payment_request()
+    if error:
+        return jsonify({'error': error}), 400
+
+    payments = await pay_late_fees_for_books_async(patron_id, book_ids)
+    return jsonify({'patron_id': patron_id, 'payments': payments})
+
+
+@async_api_bp.route('/late_fees/refund', methods=['POST'])
+async def refund_late_fee_api():
+    """
+    Refund a late fee payment.
+    Body (JSON): transaction_id, amount
+    """
+    transaction_id, amount, error = api_routes.parse_refund_request()
+    if error:
+        return jsonify({'error': error}), 400
+
+    success, message = await refund_late_fee_payment_async(transaction_id, amount)
+    return jsonify({'success': success, 'message': message}), 200 if success else 400
@@ -3,7 +3,7 @@ Borrowing Routes - Book borrowing and returning endpoints
 """
 
 from flask import Blueprint, render_template, request, redirect, url_for, flash
-from services.library_service import borrow_book_by_patron, return_book_by_patron
+from services.library_service import borrow_book_by_patron, return_book_by_barcode, return_book_by_patron
 
 borrowing_bp = Blueprint('borrowing', __name__)
 
@@ -36,6 +36,13 @@ def return_book():
     if request.method == 'GET':
         return render_template('return_book.html')
     
+    # A scanned barcode identifies the loan on its own
+    barcode = request.form.get('barcode', '').strip()
+    if barcode:
+        success, message = return_book_by_barcode(barcode)
+        flash(message, 'success' if success else 'error')
+        return render_template('return_book.html')
+    
     patron_id = request.form.get('patron_id', '').strip()
     
     try:
@@ -4,7 +4,9 @@ Catalog Routes - Book catalog related endpoints
 
 from flask import Blueprint, render_template, request, redirect, url_for, flash
 from database import get_all_books
-from services.library_service import add_book_to_catalog
+from services.catalog_replica import catalog_replica
+from services.library_service import add_book_to_catalog, list_catalog
+from routes.http_cache import conditional_on_catalog
 
 catalog_bp = Blueprint('catalog', __name__)
 
@@ -14,12 +16,16 @@ def index():
     return redirect(url_for('catalog.catalog'))
 
 @catalog_bp.route('/catalog')
+@conditional_on_catalog
 def catalog():
     """
     Display all books in the catalog.
     Implements R2: Book Catalog Display
     """
-    books = get_all_books()
+    if catalog_replica.serves_current_database():
+        books = list_catalog()
+    else:
+        books = get_all_books()
     return render_template('catalog.html', books=books)
 
 @catalog_bp.route('/add_book', methods=['GET', 'POST'])
@@ -0,0 +1,188 @@
+"""
+Response Compression - gzip for catalog pages, search results and the API
+
+Responses are compressed with zlib when the client accepts gzip, streamed
+responses chunk by chunk. Catalog-backed responses (see http_cache) are
+kept compressed under their ETag, so repeat requests skip both the view
+and the compression.
+"""
+
+import threading
+import zlib
+from collections import OrderedDict
+from typing import Hashable, Iterable, Iterator, Optional, Tuple
+
+from flask import Response, current_app, request
+from database import get_catalog_generation, get_database_path
+
+# Paths whose responses are compressed (prefixes)
+COMPRESSED_PATHS = ('/catalog', '/search', '/api/')
+
+# Mimetypes worth compressing; server-sent events must reach kiosks unbuffered
+COMPRESSED_MIMETYPES = ('text/html', 'text/csv', 'text/plain', 'application/json', 'application/x-ndjson')
+
+# Appended to a catalog ETag for its gzip representation
+GZIP_ETAG_SUFFIX = '-gzip'
+
+# zlib window bits for a gzip header and trailer
+GZIP_WBITS = 16 + zlib.MAX_WBITS
+
+
+class CompressedResponseCache:
+    """
+    LRU cache of gzip bodies bounded by total size in bytes.
+
+    Like the search result cache, entries belong to a catalog generation
+    and a newer generation drops them all.
+    """
+
+    def __init__(self, max_bytes: int = 32 * 1024 * 1024, max_entry_bytes: int = 4 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._version = None
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def _check_version(self, version: int):
+        if version != self._version:
+            self._entries.clear()
+            self._bytes = 0
+            self._version = version
+
+    def get(self, key: Hashable, version: int) -> Optional[Tuple[bytes, str]]:
+        """Return (body, mimetype) cached for key at the given generation, or None."""
+        with self._lock:
+            self._check_version(version)
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key: Hashable, body: bytes, mimetype: str, version: int):
+        """Store a gzip body produced at the given generation."""
+        with self._lock:
+            if self._version is None or version > self._version:
+                self._check_version(version)
+            if version != self._version or len(body) > self.max_entry_bytes:
+                return
+            if key in self._entries:
+                self._bytes -= len(self._entries.pop(key)[0])
+            self._entries[key] = (body, mimetype)
+            self._bytes += len(body)
+            while self._bytes > self.max_bytes:
+                _, (evicted, _) = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {'entries': len(self._entries), 'bytes': self._bytes, 'hits': self.hits, 'misses': self.misses}
+
+
+# Process-wide cache of compressed catalog-backed responses
+compressed_cache = CompressedResponseCache()
+
+
+def accepts_gzip() -> bool:
+    """Whether the request's Accept-Encoding allows gzip."""
+    return request.accept_encodings['gzip'] > 0
+
+
+def _cache_key(etag: str) -> Tuple[str, str]:
+    # Generations are per process, not per database file
+    return get_database_path(), etag
+
+
+def precompressed_response(etag: str) -> Optional[Response]:
+    """The cached gzip response for a catalog ETag, if the client takes gzip and one is cached."""
+    if not current_app.config['GZIP_RESPONSES'] or not accepts_gzip():
+        return None
+    cached = compressed_cache.get(_cache_key(etag), get_catalog_generation())
+    if cached is None:
+        return None
+    body, mimetype = cached
+    response = current_app.response_class(body, mimetype=mimetype)
+    response.headers['Content-Encoding'] = 'gzip'
+    response.set_etag(etag + GZIP_ETAG_SUFFIX)
+    return response
+
+
+def gzip_chunks(chunks: Iterable[bytes], level: int, cache_key: Optional[Hashable] = None,
+                version: int = 0, mimetype: str = 'application/json') -> Iterator[bytes]:
+    """
+    Compress a streamed body, flushing after each chunk so every part the
+    view yields reaches the client without waiting for the next. If
+    cache_key is given and the whole body fits, it is cached.
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, GZIP_WBITS)
+    kept = [] if cache_key is not None else None
+    kept_bytes = 0
+    try:
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode()
+            if not chunk:
+                continue
+            part = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+            if kept is not None:
+                kept.append(part)
+                kept_bytes += len(part)
+                if kept_bytes > compressed_cache.max_entry_bytes:
+                    kept = None
+            yield part
+    finally:
+        # Let the view's generator release what it holds if the client went away
+        if hasattr(chunks, 'close'):
+            chunks.close()
+    part = compressor.flush()
+    if kept is not None:
+        kept.append(part)
+        compressed_cache.put(cache_key, b''.join(kept), mimetype, version)
+    yield part
+
+
+def compress_response(response: Response) -> Response:
+    """after_request hook: gzip eligible responses for clients that accept it."""
+    config = current_app.config
+    if not config['GZIP_RESPONSES'] or not request.path.startswith(COMPRESSED_PATHS):
+        return response
+    response.vary.add('Accept-Encoding')
+    if (response.status_code != 200 or response.direct_passthrough or 'Content-Encoding' in response.headers
+            or response.mimetype not in COMPRESSED_MIMETYPES or not accepts_gzip()):
+        return response
+
+    etag = response.get_etag()[0]
+    cache_key = _cache_key(etag) if etag else None
+    version = get_catalog_generation()
+    level = config['GZIP_LEVEL']
+    if response.is_streamed:
+        response.response = gzip_chunks(response.response, level, cache_key, version, response.mimetype)
+        response.headers.pop('Content-Length', None)
+    else:
+        data = response.get_data()
+        if len(data) < config['GZIP_MIN_SIZE']:
+            return response
+        compressor = zlib.compressobj(level, zlib.DEFLATED, GZIP_WBITS)
+        body = compressor.compress(data) + compressor.flush()
+        response.set_data(body)
+        if cache_key:
+            compressed_cache.put(cache_key, body, response.mimetype, version)
+    response.headers['Content-Encoding'] = 'gzip'
+    if etag:
+        response.set_etag(etag + GZIP_ETAG_SUFFIX)
+    return response
+
+
+def register_compression(app):
+    """Compress responses of the app's catalog, search and API routes."""
+    app.after_request(compress_response)
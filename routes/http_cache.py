@@ -0,0 +1,58 @@
+"""
+HTTP Caching - Conditional GET support for catalog-backed pages
+"""
+
+import hashlib
+from functools import wraps
+
+from flask import current_app, make_response, request, session
+from database import CATALOG_EPOCH, get_catalog_generation, get_current_branch
+from routes.compression import GZIP_ETAG_SUFFIX, precompressed_response
+
+
+def catalog_etag() -> str:
+    """
+    Build a strong ETag for the current request against the catalog generation.
+
+    The tag covers the endpoint, the branch and the query string, so every
+    distinct search gets its own validator, and changes whenever the
+    catalog does.
+    """
+    query_hash = hashlib.sha1(request.query_string).hexdigest()[:16]
+    branch = get_current_branch() or ''
+    return f'{request.endpoint}-{branch}-{CATALOG_EPOCH}-{get_catalog_generation()}-{query_hash}'
+
+
+def conditional_on_catalog(view):
+    """
+    Answer If-None-Match requests with 304 Not Modified while the catalog is unchanged.
+
+    The check only reads the in-memory catalog generation, so a matching
+    request never reaches SQLite or template rendering. Neither does a
+    client taking gzip while a compressed copy of the response is cached.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        # Pending flash messages are rendered into the page, so it must be rebuilt
+        if session.get('_flashes'):
+            return view(*args, **kwargs)
+
+        etag = catalog_etag()
+        # Either representation's tag validates; compression appends its suffix
+        matched = next((tag for tag in (etag, etag + GZIP_ETAG_SUFFIX) if request.if_none_match.contains(tag)), None)
+        if matched:
+            response = current_app.response_class(status=304)
+            response.set_etag(matched)
+        else:
+            response = precompressed_response(etag)
+            if response is None:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+                response.set_etag(etag)
+
+        response.headers['Cache-Control'] = 'no-cache'
+        response.vary.add('X-Branch')
+        return response
+
+    return wrapper
@@ -0,0 +1,114 @@
+"""
+JSON Provider - Fast JSON encoding for API responses
+
+Encodes with orjson when it is installed and with the standard library
+otherwise; both write dates as ISO 8601 and records as objects.
+"""
+
+import dataclasses
+import sqlite3
+from datetime import date, datetime, time
+from typing import Any, Dict, Iterable, Iterator
+
+from flask import Response
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # optional; requirements.txt
+    orjson = None
+
+# Array items encoded per chunk of a streamed response
+STREAM_CHUNK_ITEMS = 1000
+
+
+def encode_default(obj: Any) -> Any:
+    """Encode what JSON has no type for: dates, SQLite rows and dataclasses."""
+    if isinstance(obj, (datetime, date, time)):
+        return obj.isoformat()
+    if isinstance(obj, sqlite3.Row):
+        return dict(obj)
+    if dataclasses.is_dataclass(obj) and not isinstance(obj, type):
+        return dataclasses.asdict(obj)
+    # orjson defers named tuples here; the standard library writes them as arrays
+    if isinstance(obj, tuple):
+        return list(obj)
+    raise TypeError(f'Object of type {type(obj).__name__} is not JSON serializable')
+
+
+class LibraryJSONProvider(DefaultJSONProvider):
+    """
+    Flask JSON provider backed by orjson when available.
+
+    Keys are sorted and output is compact unless debugging, as with Flask's
+    default provider, but non-ASCII text is written as UTF-8 rather than
+    escaped. Set use_orjson to False to encode with the standard library.
+    """
+
+    default = staticmethod(encode_default)
+    ensure_ascii = False
+    use_orjson = orjson is not None
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        if self.use_orjson and not kwargs.keys() - {'indent', 'separators'}:
+            return self._orjson_dumps(obj, bool(kwargs.get('indent'))).decode()
+        return super().dumps(obj, **kwargs)
+
+    def dumps_bytes(self, obj: Any, indent: bool = False, newline: bool = False) -> bytes:
+        """Encode obj as UTF-8 JSON, without a str in between when orjson is used."""
+        if self.use_orjson:
+            return self._orjson_dumps(obj, indent, newline)
+        end = '\n' if newline else ''
+        if indent:
+            return (super().dumps(obj, indent=2) + end).encode()
+        return (super().dumps(obj, separators=(',', ':')) + end).encode()
+
+    def loads(self, s: Any, **kwargs: Any) -> Any:
+        if self.use_orjson and not kwargs:
+            return orjson.loads(s)
+        return super().loads(s, **kwargs)
+
+    def response(self, *args: Any, **kwargs: Any) -> Response:
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        return self._app.response_class(self.dumps_bytes(obj, indent, newline=True), mimetype=self.mimetype)
+
+    def iter_array(self, items: Iterable, chunk_items: int = STREAM_CHUNK_ITEMS) -> Iterator[bytes]:
+        """Encode items as a JSON array, chunk_items items per chunk."""
+        yield b'['
+        first = True
+        chunk = []
+        for item in items:
+            chunk.append(item)
+            if len(chunk) == chunk_items:
+                yield (b'' if first else b',') + self.dumps_bytes(chunk)[1:-1]
+                first = False
+                chunk = []
+        if chunk:
+            yield (b'' if first else b',') + self.dumps_bytes(chunk)[1:-1]
+        yield b']'
+
+    def stream_response(self, obj: Dict, key: str, chunk_items: int = STREAM_CHUNK_ITEMS) -> Response:
+        """
+        Respond with obj as a JSON object whose key array is encoded while
+        it is sent, so the whole body is never held in memory. The array
+        comes after obj's other keys.
+        """
+        head = self.dumps_bytes({name: value for name, value in obj.items() if name != key})[:-1]
+
+        def chunks():
+            yield head + (b',' if len(head) > 1 else b'') + self.dumps_bytes(key) + b':'
+            yield from self.iter_array(obj[key], chunk_items)
+            yield b'}\n'
+
+        return self._app.response_class(chunks(), mimetype=self.mimetype)
+
+    def _orjson_dumps(self, obj: Any, indent: bool, newline: bool = False) -> bytes:
+        option = orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        if newline:
+            option |= orjson.OPT_APPEND_NEWLINE
+        return orjson.dumps(obj, default=encode_default, option=option)
@@ -0,0 +1,180 @@
+"""
+Rate Limiting - Token buckets per patron and client, and a cap on concurrent writes
+
+Circulation endpoints take a token from the bucket of the client's IP
+address and of the patron the request is for; an empty bucket answers 429.
+Every write request (POST, PUT, PATCH, DELETE) must also get one of a
+fixed number of write slots, waiting in a bounded queue for one to free
+up; a full queue or a wait that times out answers 503.
+"""
+
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Hashable, Optional
+
+from flask import abort, current_app, g, request
+
+# Endpoints that take tokens from the patron's and the client's buckets
+RATE_LIMITED_ENDPOINTS = frozenset({
+    'borrowing.borrow_book', 'borrowing.return_book',
+    'api.get_late_fee', 'api.get_patron_late_fees', 'api.patron_fees_api',
+    'api.pay_late_fees_api', 'api.refund_late_fee_api', 'api.scan_return_api',
+    'api.place_hold_api', 'api.cancel_hold_api',
+})
+
+# Methods that need a write slot
+WRITE_METHODS = frozenset({'POST', 'PUT', 'PATCH', 'DELETE'})
+
+
+class TokenBucketLimiter:
+    """
+    Token buckets keyed by any hashable, refilled at rate tokens per second
+    up to burst.
+
+    Buckets are kept least recently used first. A bucket idle for
+    burst / rate seconds is full again and no different from a new one, so
+    such buckets are dropped from the front as requests come in; past
+    max_buckets the oldest are dropped even if not yet full.
+    """
+
+    def __init__(self, rate: float, burst: int, max_buckets: int = 100000):
+        self.rate = rate
+        self.burst = burst
+        self.max_buckets = max_buckets
+        self._refill_seconds = burst / rate
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+        self.limited = 0
+
+    def take(self, key: Hashable, now: Optional[float] = None) -> float:
+        """
+        Take a token from key's bucket.
+
+        Returns:
+            float: 0 if a token was taken, else seconds until one is available
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            buckets = self._buckets
+            while buckets:
+                oldest = next(iter(buckets))
+                if now - buckets[oldest][1] < self._refill_seconds and len(buckets) < self.max_buckets:
+                    break
+                del buckets[oldest]
+
+            tokens, updated = buckets.pop(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+            if tokens >= 1:
+                buckets[key] = (tokens - 1, now)
+                return 0.0
+            buckets[key] = (tokens, now)
+            self.limited += 1
+            return (1 - tokens) / self.rate
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+
+class WriteAdmission:
+    """
+    At most max_concurrent requests hold a write slot; up to max_queued more
+    wait for one for at most timeout seconds. Everything beyond is shed.
+    """
+
+    def __init__(self, max_concurrent: int, max_queued: int, timeout: float):
+        self.max_concurrent = max_concurrent
+        self.max_queued = max_queued
+        self.timeout = timeout
+        self._condition = threading.Condition()
+        self.active = 0
+        self.queued = 0
+        self.shed = 0
+
+    def acquire(self) -> bool:
+        """Take a write slot, waiting in the queue if needed; False if shed."""
+        with self._condition:
+            if self.active >= self.max_concurrent:
+                if self.queued >= self.max_queued:
+                    self.shed += 1
+                    return False
+                self.queued += 1
+                try:
+                    admitted = self._condition.wait_for(lambda: self.active < self.max_concurrent, self.timeout)
+                finally:
+                    self.queued -= 1
+                if not admitted:
+                    self.shed += 1
+                    return False
+            self.active += 1
+            return True
+
+    def release(self):
+        with self._condition:
+            self.active -= 1
+            self._condition.notify()
+
+    def stats(self) -> dict:
+        with self._condition:
+            return {'active': self.active, 'queued': self.queued, 'shed': self.shed}
+
+
+def request_patron_id() -> Optional[str]:
+    """The patron a request is for: from the URL, the form or a JSON body."""
+    patron_id = (request.view_args or {}).get('patron_id') or request.form.get('patron_id')
+    if patron_id is None and request.is_json:
+        patron_id = (request.get_json(silent=True) or {}).get('patron_id')
+    if patron_id is None:
+        return None
+    return str(patron_id).strip() or None
+
+
+def limit_request_rate():
+    """before_request hook: 429 once the client's or the patron's bucket is empty."""
+    if request.endpoint not in RATE_LIMITED_ENDPOINTS:
+        return
+    extensions = current_app.extensions
+    wait = extensions['ip_rate_limiter'].take(request.remote_addr)
+    patron_id = request_patron_id()
+    if not wait and patron_id:
+        wait = extensions['patron_rate_limiter'].take(patron_id)
+    if wait:
+        abort(429, description='Too many requests. Please slow down.', retry_after=math.ceil(wait))
+
+
+def admit_write():
+    """before_request hook: hold a write slot for the request, or 503 if none frees up."""
+    if request.method not in WRITE_METHODS:
+        return
+    admission = current_app.extensions['write_admission']
+    if not admission.acquire():
+        abort(503, description='The library is busy. Please try again shortly.',
+              retry_after=max(1, math.ceil(admission.timeout)))
+    g.write_slot = admission
+
+
+def release_write(exc):
+    admission = g.pop('write_slot', None)
+    if admission is not None:
+        admission.release()
+
+
+def register_rate_limits(app):
+    """Install the token buckets and the write cap configured on the app."""
+    config = app.config
+    if config['RATE_LIMITS']:
+        app.extensions['ip_rate_limiter'] = TokenBucketLimiter(
+            config['RATE_LIMIT_IP_PER_SECOND'], config['RATE_LIMIT_IP_BURST'], config['RATE_LIMIT_MAX_BUCKETS']
+        )
+        app.extensions['patron_rate_limiter'] = TokenBucketLimiter(
+            config['RATE_LIMIT_PATRON_PER_SECOND'], config['RATE_LIMIT_PATRON_BURST'],
+            config['RATE_LIMIT_MAX_BUCKETS']
+        )
+        app.before_request(limit_request_rate)
+    if config['MAX_CONCURRENT_WRITES']:
+        app.extensions['write_admission'] = WriteAdmission(
+            config['MAX_CONCURRENT_WRITES'], config['WRITE_QUEUE_SIZE'], config['WRITE_QUEUE_TIMEOUT_MS'] / 1000
+        )
+        app.before_request(admit_write)
+        app.teardown_request(release_write)
@@ -0,0 +1,103 @@
+"""
+Async Service Module - Coroutine versions of the slow library operations
+Used by the async API blueprint. SQLite work runs on a bounded thread pool
+so a burst of slow requests cannot open unbounded connections, and payment
+gateway calls are awaited directly.
+"""
+
+import asyncio
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Callable, Dict, List, Optional, Tuple
+
+from services.library_service import (
+    prepare_late_fee_payment, payment_result, validate_refund, refund_result,
+    record_late_fee_payment, record_late_fee_refund
+)
+from services.payment_service import AsyncPaymentGateway
+
+# Threads available for blocking SQLite work from async views
+DB_EXECUTOR_WORKERS = 8
+
+_db_executor = ThreadPoolExecutor(max_workers=DB_EXECUTOR_WORKERS, thread_name_prefix='db')
+
+
+def configure_db_executor(workers: int):
+    """Replace the SQLite executor with one of the given size."""
+    global _db_executor
+    previous, _db_executor = _db_executor, ThreadPoolExecutor(max_workers=workers, thread_name_prefix='db')
+    previous.shutdown(wait=False)
+
+
+async def run_db(function: Callable, *args, **kwargs):
+    """
+    Run blocking database work on the bounded executor and await its result.
+    The work sees this context's variables, such as the selected branch.
+    """
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(_db_executor, partial(context.run, function, *args, **kwargs))
+
+
+async def pay_late_fees_async(patron_id: str, book_id: int,
+                              payment_gateway: AsyncPaymentGateway = None) -> Tuple[bool, str, Optional[str]]:
+    """
+    Coroutine version of pay_late_fees, with the same checks and results.
+    """
+    error, fee_amount, book = await run_db(prepare_late_fee_payment, patron_id, book_id)
+    if error:
+        return False, error, None
+
+    if payment_gateway is None:
+        payment_gateway = AsyncPaymentGateway()
+
+    try:
+        success, transaction_id, message = await payment_gateway.process_payment(
+            patron_id=patron_id,
+            amount=fee_amount,
+            description=f"Late fees for '{book['title']}'"
+        )
+    except Exception as e:
+        return False, f"Payment processing error: {str(e)}", None
+
+    recorded = success and await run_db(record_late_fee_payment, patron_id, book_id, fee_amount, transaction_id)
+    return payment_result(success, transaction_id, message, recorded)
+
+
+async def pay_late_fees_for_books_async(patron_id: str, book_ids: List[int],
+                                        payment_gateway: AsyncPaymentGateway = None) -> List[Dict]:
+    """
+    Pay the late fees on several books at once, with the gateway calls in flight together.
+
+    Returns:
+        list: One dict per book with book_id, success, message and transaction_id
+    """
+    results = await asyncio.gather(*(
+        pay_late_fees_async(patron_id, book_id, payment_gateway) for book_id in book_ids
+    ))
+    return [
+        {'book_id': book_id, 'success': success, 'message': message, 'transaction_id': transaction_id}
+        for book_id, (success, message, transaction_id) in zip(book_ids, results)
+    ]
+
+
+async def refund_late_fee_payment_async(transaction_id: str, amount: float,
+                                        payment_gateway: AsyncPaymentGateway = None) -> Tuple[bool, str]:
+    """
+    Coroutine version of refund_late_fee_payment, with the same checks and results.
+    """
+    error = validate_refund(transaction_id, amount)
+    if error:
+        return False, error
+
+    if payment_gateway is None:
+        payment_gateway = AsyncPaymentGateway()
+
+    try:
+        success, message = await payment_gateway.refund_payment(transaction_id, amount)
+    except Exception as e:
+        return False, f"Refund processing error: {str(e)}"
+
+    recorded = success and await run_db(record_late_fee_refund, transaction_id, amount)
+    return refund_result(success, message, recorded)
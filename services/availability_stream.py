@@ -0,0 +1,209 @@
+"""
+Availability Stream Module - Push availability changes to kiosk screens
+One feed thread per branch database follows the change log and fans each
+batch of (book_id, available_copies) changes out to every subscriber, so
+kiosks stop polling and re-rendering the whole catalog.
+"""
+
+import queue
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from database import get_change_log_bounds, get_current_branch, get_database_path, use_branch
+from services.change_feed import read_changes
+
+# Undelivered batches a subscriber may fall behind by before it is dropped
+SUBSCRIBER_BUFFER = 256
+
+# Most concurrent subscribers per branch database
+MAX_SUBSCRIBERS = 500
+
+# Seconds between checks for new commits while anyone is subscribed
+POLL_INTERVAL = 0.1
+
+# Change log entries read per query by the feed thread
+FEED_BATCH_SIZE = 1000
+
+# Seconds of silence after which a stream sends a keep-alive comment
+HEARTBEAT_INTERVAL = 15.0
+
+# A batch of changes: (id of its last change log entry, [(book_id, available_copies), ...])
+Batch = Tuple[int, List[Tuple[int, int]]]
+
+
+def availability_changes(changes: List[Dict]) -> List[Tuple[int, int]]:
+    """
+    Reduce change log entries to the latest available_copies per book, in
+    the order the books first changed. Inserts count, deletes do not.
+    """
+    latest = {}
+    for change in changes:
+        if change['table_name'] == 'books' and change['operation'] != 'delete':
+            latest[change['row_id']] = change['data']['available_copies']
+    return list(latest.items())
+
+
+class Subscription:
+    """One client's bounded buffer of batches; dropped once it overflows."""
+
+    def __init__(self, since: int, buffer_size: int):
+        self.since = since
+        self.batches = queue.Queue(maxsize=buffer_size)
+        self.dropped = False
+
+    def get(self, timeout: float) -> Optional[Batch]:
+        """Next batch, or None if none arrived within timeout."""
+        try:
+            return self.batches.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class AvailabilityBroadcaster:
+    """
+    Fan-out of availability changes for one branch database.
+
+    The feed thread runs only while someone is subscribed. It costs one
+    PRAGMA data_version per POLL_INTERVAL while nothing is committed;
+    after a commit it reads the new change log entries and puts one batch
+    in every subscriber's buffer. Publishing never waits: a subscriber
+    whose buffer is full is dropped, and can reconnect and catch up from
+    the change log with the id of the last batch it handled.
+    """
+
+    def __init__(self, branch: Optional[str] = None, buffer_size: int = SUBSCRIBER_BUFFER,
+                 max_subscribers: int = MAX_SUBSCRIBERS):
+        self.branch = branch
+        self.buffer_size = buffer_size
+        self.max_subscribers = max_subscribers
+        self.cursor = 0
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._thread = None
+        self.published = 0
+        self.dropped = 0
+
+    def subscribe(self) -> Optional[Subscription]:
+        """
+        Start receiving batches committed from now on.
+
+        Returns:
+            Subscription, or None if max_subscribers are already connected
+        """
+        with self._lock:
+            if len(self._subscribers) >= self.max_subscribers:
+                return None
+            if self._thread is None:
+                with use_branch(self.branch):
+                    self.cursor = get_change_log_bounds()[1]
+                self._thread = threading.Thread(target=self._run, name='availability-feed', daemon=True)
+                self._thread.start()
+            subscription = Subscription(self.cursor, self.buffer_size)
+            self._subscribers.add(subscription)
+            return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def publish(self, batch: Batch):
+        """Hand batch to every subscriber, dropping those with a full buffer."""
+        with self._lock:
+            for subscription in list(self._subscribers):
+                try:
+                    subscription.batches.put_nowait(batch)
+                except queue.Full:
+                    subscription.dropped = True
+                    self._subscribers.discard(subscription)
+                    self.dropped += 1
+            self.cursor = batch[0]
+            self.published += 1
+
+    def _run(self):
+        with use_branch(self.branch):
+            watch_conn = sqlite3.connect(get_database_path())
+            try:
+                data_version = None
+                while self._has_subscribers():
+                    version = watch_conn.execute('PRAGMA data_version').fetchone()[0]
+                    if version != data_version:
+                        data_version = version
+                        self._forward_changes()
+                    time.sleep(POLL_INTERVAL)
+            finally:
+                watch_conn.close()
+
+    def _has_subscribers(self) -> bool:
+        with self._lock:
+            if not self._subscribers:
+                self._thread = None
+                return False
+            return True
+
+    def _forward_changes(self):
+        while True:
+            success, _, page = read_changes(self.cursor, FEED_BATCH_SIZE)
+            if not success:
+                # Entries we never read were pruned; carry on from the newest
+                with self._lock:
+                    self.cursor = page['latest']
+                return
+            if page['changes']:
+                changes = availability_changes(page['changes'])
+                if changes:
+                    self.publish((page['next'], changes))
+                else:
+                    with self._lock:
+                        self.cursor = page['next']
+            if not page['has_more']:
+                return
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'subscribers': len(self._subscribers),
+                'cursor': self.cursor,
+                'published': self.published,
+                'dropped': self.dropped
+            }
+
+
+_broadcasters: Dict[Optional[str], AvailabilityBroadcaster] = {}
+_broadcasters_lock = threading.Lock()
+
+
+def get_availability_broadcaster() -> AvailabilityBroadcaster:
+    """Get the broadcaster for this context's branch database."""
+    branch = get_current_branch()
+    with _broadcasters_lock:
+        broadcaster = _broadcasters.get(branch)
+        if broadcaster is None:
+            broadcaster = _broadcasters[branch] = AvailabilityBroadcaster(branch)
+        return broadcaster
+
+
+def replay_availability(branch: Optional[str], since: int, until: int) -> Tuple[bool, str, List[Batch]]:
+    """
+    Rebuild the batches after since, up to and including until, from the
+    change log, for a subscriber resuming after a disconnect.
+
+    Returns:
+        tuple: (success: bool, message: str, batches: list); message is
+            'Cursor expired' when changes after since were pruned
+    """
+    batches = []
+    with use_branch(branch):
+        while since < until:
+            success, message, page = read_changes(since, FEED_BATCH_SIZE)
+            if not success:
+                return False, message, []
+            changes = [change for change in page['changes'] if change['id'] <= until]
+            if not changes:
+                break
+            since = changes[-1]['id']
+            batch = availability_changes(changes)
+            if batch:
+                batches.append((since, batch))
+    return True, "OK", batches
@@ -0,0 +1,120 @@
+"""
+Backup Module - Online snapshots of the library database
+Copies the database with SQLite's online backup API a few pages at a time,
+so circulation keeps running while a consistent snapshot is taken.
+"""
+
+import gzip
+import os
+import shutil
+import sqlite3
+import time
+import urllib.parse
+from typing import Callable, Dict, Optional, Tuple
+
+from database import get_database_path
+
+# Pages copied per backup step, and seconds slept between steps
+BACKUP_PAGES = 256
+BACKUP_SLEEP = 0.005
+
+
+def _open_source(path: str) -> sqlite3.Connection:
+    """
+    Open the database read-only and start a read transaction on it.
+
+    The backup steps reuse this transaction, so every step copies the same
+    WAL snapshot: writers carry on, and the backup never restarts because
+    of them.
+    """
+    uri = f"file:{urllib.parse.quote(os.path.abspath(path))}?mode=ro"
+    conn = sqlite3.connect(uri, uri=True, isolation_level=None)
+    conn.execute('BEGIN')
+    conn.execute('SELECT COUNT(*) FROM sqlite_master').fetchone()
+    return conn
+
+
+def check_integrity(path: str) -> str:
+    """Run PRAGMA integrity_check on a database file; returns 'ok' or the first problem."""
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute('PRAGMA integrity_check').fetchone()[0]
+    finally:
+        conn.close()
+
+
+def _compress(source: str, destination: str):
+    """gzip a file."""
+    with open(source, 'rb') as raw, gzip.open(destination, 'wb', compresslevel=6) as packed:
+        shutil.copyfileobj(raw, packed, 1024 * 1024)
+
+
+def backup_database(destination: str, pages: int = BACKUP_PAGES, sleep: float = BACKUP_SLEEP,
+                    compress: bool = False, verify: bool = True,
+                    progress: Optional[Callable[[int, int, int], None]] = None) -> Tuple[bool, str, Optional[Dict]]:
+    """
+    Take a consistent snapshot of the selected database while it is in use.
+
+    Pages are copied in steps of pages, sleeping sleep seconds between
+    steps. The snapshot is written next to destination and only moved into
+    place once it is complete (and, with verify, has passed PRAGMA
+    integrity_check), so destination never holds a partial backup.
+
+    Args:
+        destination: File to write; gzip-compressed when compress is True
+        pages: Pages copied per step (-1 copies everything in one step)
+        sleep: Seconds to sleep between steps
+        compress: gzip the snapshot
+        verify: Check the snapshot's integrity before keeping it
+        progress: Called as progress(status, remaining, total) after each step
+
+    Returns:
+        tuple: (success: bool, message: str, result: dict with path, pages,
+            bytes, seconds, integrity and compressed)
+    """
+    if pages == 0 or pages < -1:
+        return False, "Pages per step must be positive, or -1 for all at once.", None
+
+    if sleep < 0:
+        return False, "Sleep must not be negative.", None
+
+    started = time.perf_counter()
+    snapshot = destination + '.partial'
+    packed = destination + '.gz.partial'
+    source = target = None
+    try:
+        source = _open_source(get_database_path())
+        target = sqlite3.connect(snapshot)
+        source.backup(target, pages=pages, sleep=sleep, progress=progress)
+        page_count = target.execute('PRAGMA page_count').fetchone()[0]
+        source.close()
+        target.close()
+
+        integrity = check_integrity(snapshot) if verify else None
+        if verify and integrity != 'ok':
+            return False, f"Backup failed integrity check: {integrity}", None
+
+        if compress:
+            _compress(snapshot, packed)
+            os.replace(packed, destination)
+        else:
+            os.replace(snapshot, destination)
+    except (sqlite3.Error, OSError) as e:
+        return False, f"Backup failed: {e}", None
+    finally:
+        # Closing twice is harmless; whatever was not moved into place goes
+        for conn in (source, target):
+            if conn is not None:
+                conn.close()
+        for path in (snapshot, packed):
+            if os.path.exists(path):
+                os.remove(path)
+
+    return True, "Backup complete.", {
+        'path': destination,
+        'pages': page_count,
+        'bytes': os.path.getsize(destination),
+        'seconds': round(time.perf_counter() - started, 3),
+        'integrity': integrity,
+        'compressed': compress
+    }
@@ -0,0 +1,314 @@
+"""
+Catalog Replica Module - Columnar in-memory copy of the books table
+Lets read-mostly nodes (kiosks, OPAC terminals) search and list the catalog
+without going to SQLite, and keeps up with writes through the change log.
+"""
+
+import bisect
+import heapq
+import sqlite3
+import sys
+import threading
+from array import array
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from database import catalog_snapshot, get_database_path
+from services.change_feed import read_changes
+
+# Books held outside the columns (added or retitled since the last load)
+# before the columns are rebuilt
+COMPACT_AFTER = 10000
+
+# Changes read from the change log per query while refreshing
+REFRESH_BATCH_SIZE = 5000
+
+BOOK_FIELDS = ('id', 'title', 'author', 'isbn', 'total_copies', 'available_copies')
+
+
+class _TextColumn:
+    """
+    Many strings stored as one newline-separated string plus an array of
+    start offsets, so a value costs 8 bytes of offset instead of a Python
+    object. Rows are found by substring search over the whole column.
+    """
+
+    def __init__(self, values: List[str]):
+        self.text = '\n' + '\n'.join(values) + '\n'
+        self.starts = array('q')
+        position = 1
+        for value in values:
+            self.starts.append(position)
+            position += len(value) + 1
+
+    def __getitem__(self, row: int) -> str:
+        start = self.starts[row]
+        return self.text[start:self.text.index('\n', start)]
+
+    def find_rows(self, term: str) -> Iterator[int]:
+        """Yield each row whose value contains term, in row order."""
+        text, starts = self.text, self.starts
+        if not term:
+            # Every value contains it, and find would stop at the end forever
+            yield from range(len(starts))
+            return
+        position = text.find(term, 1)
+        while position != -1:
+            row = bisect.bisect_right(starts, position) - 1
+            yield row
+            next_start = starts[row + 1] if row + 1 < len(starts) else len(text)
+            position = text.find(term, next_start)
+
+    def find_exact(self, value: str) -> Optional[int]:
+        """Row whose value is exactly value, or None."""
+        position = self.text.find(f'\n{value}\n')
+        if position == -1:
+            return None
+        return bisect.bisect_left(self.starts, position + 1)
+
+    def memory_bytes(self) -> int:
+        return sys.getsizeof(self.text) + sys.getsizeof(self.starts)
+
+
+class _CatalogColumns:
+    """Books in title order as parallel columns; copies can change in place."""
+
+    def __init__(self, rows: Iterable[Tuple]):
+        self.ids = array('q')
+        self.total_copies = array('l')
+        self.available_copies = array('l')
+        titles, authors, isbns = [], [], []
+        for book_id, title, author, isbn, total, available in rows:
+            self.ids.append(book_id)
+            titles.append(title)
+            authors.append(author)
+            isbns.append(isbn)
+            self.total_copies.append(total)
+            self.available_copies.append(available)
+
+        self.titles = _TextColumn(titles)
+        self.title_keys = _TextColumn([title.lower() for title in titles])
+        del titles
+        self.authors = _TextColumn(authors)
+        self.author_keys = _TextColumn([author.lower() for author in authors])
+        del authors
+        self.isbns = _TextColumn(isbns)
+        del isbns
+
+        # Row of each book id (-1 if none), and rows superseded since loading
+        self.row_of_id = array('q', [-1]) * (max(self.ids, default=0) + 1)
+        for row, book_id in enumerate(self.ids):
+            self.row_of_id[book_id] = row
+        self.dead = bytearray(len(self.ids))
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def row(self, book_id: int) -> int:
+        return self.row_of_id[book_id] if 0 <= book_id < len(self.row_of_id) else -1
+
+    def book(self, row: int) -> Dict:
+        return {
+            'id': self.ids[row],
+            'title': self.titles[row],
+            'author': self.authors[row],
+            'isbn': self.isbns[row],
+            'total_copies': self.total_copies[row],
+            'available_copies': self.available_copies[row]
+        }
+
+    def memory_bytes(self) -> int:
+        columns = (self.ids, self.total_copies, self.available_copies, self.row_of_id, self.dead)
+        texts = (self.titles, self.title_keys, self.authors, self.author_keys, self.isbns)
+        return sum(sys.getsizeof(column) for column in columns) + sum(text.memory_bytes() for text in texts)
+
+
+def _sort_key(book: Dict) -> Tuple[str, int]:
+    return book['title'], book['id']
+
+
+class CatalogReplica:
+    """
+    In-process replica of the books table for searching and listing.
+
+    load() reads the catalog once into compact columns. refresh() applies
+    the change log entries since the last load or refresh, and costs one
+    PRAGMA data_version when nothing was committed. Copy counts change in
+    place; books that are added or retitled are held in a small overlay
+    of dicts until it reaches COMPACT_AFTER, when the columns are rebuilt.
+    The replica serves one database file, the one it was loaded from.
+    """
+
+    def __init__(self):
+        self.path = None
+        self.cursor = 0
+        self._columns = _CatalogColumns(())
+        self._overlay = {}
+        self._watch_conn = None
+        self._data_version = None
+        self._lock = threading.RLock()
+        self.loads = 0
+        self.changes_applied = 0
+
+    @property
+    def loaded(self) -> bool:
+        return self.path is not None
+
+    def serves_current_database(self) -> bool:
+        """Check whether the replica holds the catalog of this context's database."""
+        return self.path is not None and self.path == get_database_path()
+
+    def load(self):
+        """Read the whole catalog of this context's database into the replica."""
+        with self._lock:
+            path = get_database_path()
+            if self._watch_conn is None or path != self.path:
+                if self._watch_conn is not None:
+                    self._watch_conn.close()
+                self._watch_conn = sqlite3.connect(path, check_same_thread=False)
+            self._data_version = self._watch_conn.execute('PRAGMA data_version').fetchone()[0]
+            with catalog_snapshot() as (cursor, rows):
+                self._columns = _CatalogColumns(rows)
+            self._overlay = {}
+            self.cursor = cursor
+            self.path = path
+            self.loads += 1
+
+    def unload(self):
+        """Drop the replica's data; searches go back to SQLite."""
+        with self._lock:
+            if self._watch_conn is not None:
+                self._watch_conn.close()
+            self._watch_conn = None
+            self._data_version = None
+            self._columns = _CatalogColumns(())
+            self._overlay = {}
+            self.path = None
+            self.cursor = 0
+            self.loads = 0
+            self.changes_applied = 0
+
+    def refresh(self) -> int:
+        """
+        Apply the changes committed since the last load or refresh.
+
+        Returns:
+            int: Number of book changes applied
+        """
+        with self._lock:
+            if not self.loaded:
+                return 0
+            data_version = self._watch_conn.execute('PRAGMA data_version').fetchone()[0]
+            if data_version == self._data_version:
+                return 0
+            self._data_version = data_version
+
+            applied = 0
+            while True:
+                success, _, page = read_changes(self.cursor, REFRESH_BATCH_SIZE)
+                if not success:
+                    # Changes we never saw were pruned; start over
+                    self.load()
+                    return applied
+                for change in page['changes']:
+                    if change['table_name'] == 'books':
+                        self._apply(change['operation'], change['data'])
+                        applied += 1
+                self.cursor = page['next']
+                if not page['has_more']:
+                    break
+
+            if len(self._overlay) > COMPACT_AFTER:
+                self._compact()
+            self.changes_applied += applied
+            return applied
+
+    def _apply(self, operation: str, book: Dict):
+        columns = self._columns
+        row = columns.row(book['id'])
+        if row >= 0 and columns.dead[row]:
+            row = -1
+
+        if operation == 'delete':
+            if row >= 0:
+                columns.dead[row] = 1
+            self._overlay.pop(book['id'], None)
+            return
+
+        if row >= 0 and (columns.titles[row], columns.authors[row], columns.isbns[row]) == \
+                (book['title'], book['author'], book['isbn']):
+            columns.total_copies[row] = book['total_copies']
+            columns.available_copies[row] = book['available_copies']
+            return
+
+        if row >= 0:
+            columns.dead[row] = 1
+        self._overlay[book['id']] = {field: book[field] for field in BOOK_FIELDS}
+
+    def _compact(self):
+        """Rebuild the columns with the overlay folded in."""
+        books = sorted(self._iter_books(), key=_sort_key)
+        self._columns = _CatalogColumns(tuple(book[field] for field in BOOK_FIELDS) for book in books)
+        self._overlay = {}
+
+    def _iter_books(self) -> Iterator[Dict]:
+        columns = self._columns
+        for row in range(len(columns)):
+            if not columns.dead[row]:
+                yield columns.book(row)
+        yield from self._overlay.values()
+
+    def _matches(self, rows: Iterable[int], overlay_match) -> List[Dict]:
+        """Books for live column rows plus matching overlay books, in title order."""
+        columns = self._columns
+        found = [columns.book(row) for row in rows if not columns.dead[row]]
+        extra = sorted((book for book in self._overlay.values() if overlay_match(book)), key=_sort_key)
+        if not extra:
+            return found
+        return list(heapq.merge(found, extra, key=_sort_key))
+
+    def all_books(self) -> List[Dict]:
+        """Every book, ordered by title."""
+        with self._lock:
+            return self._matches(range(len(self._columns)), lambda book: True)
+
+    def search(self, term: str, search_type: str) -> List[Dict]:
+        """
+        Find books the way the catalog search does: a lowercase term
+        contained in the title or author, or an exact ISBN.
+
+        Returns:
+            list: Matching book dicts, ordered by title
+        """
+        if '\n' in term:
+            return []
+        if not term:
+            # As in SQLite: every title and author contains it, no ISBN equals it
+            return self.all_books() if search_type in ('title', 'author') else []
+        with self._lock:
+            columns = self._columns
+            if search_type == 'title':
+                return self._matches(columns.title_keys.find_rows(term),
+                                     lambda book: term in book['title'].lower())
+            if search_type == 'author':
+                return self._matches(columns.author_keys.find_rows(term),
+                                     lambda book: term in book['author'].lower())
+            if search_type == 'isbn':
+                row = columns.isbns.find_exact(term)
+                return self._matches([] if row is None else [row], lambda book: book['isbn'] == term)
+            return []
+
+    def stats(self) -> Dict:
+        """Size and refresh counters."""
+        with self._lock:
+            return {
+                'books': len(self._columns) - self._columns.dead.count(1) + len(self._overlay),
+                'overlay': len(self._overlay),
+                'memory_bytes': self._columns.memory_bytes() + sys.getsizeof(self._overlay),
+                'cursor': self.cursor,
+                'loads': self.loads,
+                'changes_applied': self.changes_applied
+            }
+
+
+# Process-wide replica, loaded at startup when the app enables CATALOG_REPLICA
+catalog_replica = CatalogReplica()
@@ -0,0 +1,50 @@
+"""
+Change Feed Module - Cursor-based reads of the change log
+Consumers keep the id of the last change they processed and ask only for
+what came after it, instead of re-reading the catalog and loan tables.
+"""
+
+from typing import Dict, Optional, Tuple
+
+from database import get_change_log_bounds, get_changes, read_transaction
+
+# Default and largest number of changes returned per request
+CHANGES_PAGE_SIZE = 500
+MAX_CHANGES_PAGE_SIZE = 5000
+
+
+def read_changes(since: int = 0, limit: int = CHANGES_PAGE_SIZE) -> Tuple[bool, str, Optional[Dict]]:
+    """
+    Get the changes recorded after the since cursor.
+
+    A cursor older than the oldest retained change means the consumer
+    missed pruned changes and has to resynchronize from the tables.
+
+    Args:
+        since: Id of the last change the consumer processed (0 for all)
+        limit: Most changes to return
+
+    Returns:
+        tuple: (success: bool, message: str, page: dict with 'changes',
+            'next' cursor and 'has_more'); message is 'Cursor expired' when
+            changes after since were pruned
+    """
+    if since < 0:
+        return False, "Since must not be negative.", None
+
+    if not 1 <= limit <= MAX_CHANGES_PAGE_SIZE:
+        return False, f"Limit must be between 1 and {MAX_CHANGES_PAGE_SIZE}.", None
+
+    # One snapshot, so a prune committed in between cannot slip past the check
+    with read_transaction() as conn:
+        oldest, latest = get_change_log_bounds(conn=conn)
+        if since < oldest - 1:
+            return False, "Cursor expired", {'oldest': oldest, 'latest': latest}
+        changes = get_changes(since, limit + 1, conn=conn)
+    has_more = len(changes) > limit
+    changes = changes[:limit]
+    return True, "OK", {
+        'changes': changes,
+        'next': changes[-1]['id'] if changes else max(since, 0),
+        'has_more': has_more
+    }
@@ -0,0 +1,68 @@
+"""
+Circulation Stats Module - Management statistics from the rollup tables
+Daily loans, most borrowed books and overdue rates are read from rollups
+that the borrow and return transactions keep current, never from a scan
+of the borrow history.
+"""
+
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
+
+from database import (
+    count_overdue_loans, get_circulation_totals, get_daily_circulation, get_top_borrowed_books
+)
+
+# Longest window of daily figures one request may ask for
+MAX_STATS_DAYS = 366
+
+# Most books one request may ask for in the top borrowed list
+MAX_TOP_BOOKS = 100
+
+
+def _rate(part: int, whole: int) -> float:
+    """Fraction of whole, rounded for display; 0.0 when there is nothing to divide."""
+    return round(part / whole, 4) if whole else 0.0
+
+
+def get_circulation_stats(days: int = 30, top: int = 10,
+                          now: Optional[datetime] = None) -> Tuple[bool, str, Optional[Dict]]:
+    """
+    Get circulation statistics for management reporting.
+
+    Args:
+        days: Number of days of daily figures, ending today
+        top: Number of most borrowed books to list
+        now: Current time (defaults to datetime.now())
+
+    Returns:
+        tuple: (success: bool, message: str, stats: dict with 'daily',
+            'window', 'all_time', 'top_books' and 'overdue_now')
+    """
+    if not 1 <= days <= MAX_STATS_DAYS:
+        return False, f"Days must be between 1 and {MAX_STATS_DAYS}.", None
+
+    if not 1 <= top <= MAX_TOP_BOOKS:
+        return False, f"Top must be between 1 and {MAX_TOP_BOOKS}.", None
+
+    now = now or datetime.now()
+    since = (now - timedelta(days=days - 1)).strftime('%Y-%m-%d')
+
+    daily = get_daily_circulation(since)
+    window = {
+        'since': since,
+        'loans': sum(day['loans'] for day in daily),
+        'returns': sum(day['returns'] for day in daily),
+        'late_returns': sum(day['late_returns'] for day in daily)
+    }
+    window['late_return_rate'] = _rate(window['late_returns'], window['returns'])
+
+    all_time = get_circulation_totals()
+    all_time['late_return_rate'] = _rate(all_time['late_returns'], all_time['returns'])
+
+    return True, "OK", {
+        'daily': daily,
+        'window': window,
+        'all_time': all_time,
+        'top_books': get_top_borrowed_books(top),
+        'overdue_now': count_overdue_loans(now.isoformat())
+    }
@@ -0,0 +1,154 @@
+"""
+Federated Search Module - Catalog search across every branch database
+Each branch is searched on a shared thread pool, so a federated search
+takes about as long as the slowest branch rather than the sum of them.
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Dict, List, Optional, Tuple
+
+from database import get_branches, query_books, sync_external_writes, use_branch
+from services.search_cache import normalize_search_term
+
+# Threads searching branch databases, shared by all federated searches
+FEDERATED_SEARCH_WORKERS = 8
+
+# Seconds to wait for the slowest branch before reporting it as timed out
+FEDERATED_SEARCH_TIMEOUT = 5.0
+
+# Search types a federated search supports (fuzzy uses a per-process index)
+FEDERATED_SEARCH_TYPES = ('title', 'author', 'isbn')
+
+# Most matches taken from any one branch
+FEDERATED_BRANCH_LIMIT = 100
+
+_executor = ThreadPoolExecutor(max_workers=FEDERATED_SEARCH_WORKERS, thread_name_prefix='branch-search')
+
+
+def search_branch_catalog(search_term: str, search_type: str) -> Tuple[List[Dict], int]:
+    """
+    Search the selected branch's catalog in SQLite, keeping the work each
+    branch does under the GIL small so the branch searches overlap.
+
+    Returns:
+        tuple: (first FEDERATED_BRANCH_LIMIT matches by title, total matches)
+    """
+    return query_books(**{search_type: search_term.strip()}, limit=FEDERATED_BRANCH_LIMIT)
+
+
+def _search_branch(branch: str, search_term: str, search_type: str) -> Tuple[List[Dict], int, float]:
+    """Search one branch database; returns its results, total matches and the time taken in ms."""
+    started = time.perf_counter()
+    with use_branch(branch):
+        sync_external_writes()
+        results, total = search_branch_catalog(search_term, search_type)
+    return results, total, (time.perf_counter() - started) * 1000
+
+
+def _relevance(book: Dict, term: str, search_type: str) -> Tuple[int, str]:
+    """Sort key: exact matches first, then prefix matches, then the rest, by title."""
+    value = book[search_type].lower()
+    if value == term:
+        rank = 0
+    elif value.startswith(term):
+        rank = 1
+    else:
+        rank = 2
+    return rank, book['title'].lower()
+
+
+def merge_branch_results(branch_results: Dict[str, List[Dict]], search_term: str,
+                         search_type: str) -> List[Dict]:
+    """
+    Merge per-branch results into one ranked list, one entry per ISBN.
+
+    Returns:
+        list: Book dicts with copies totalled over the branches and a
+            'branches' list of each branch's book id and copies
+    """
+    term = normalize_search_term(search_term)
+    merged = {}
+    for branch, books in branch_results.items():
+        for book in books:
+            entry = merged.get(book['isbn'])
+            if entry is None:
+                entry = merged[book['isbn']] = {
+                    'isbn': book['isbn'],
+                    'title': book['title'],
+                    'author': book['author'],
+                    'total_copies': 0,
+                    'available_copies': 0,
+                    'branches': []
+                }
+            entry['total_copies'] += book['total_copies']
+            entry['available_copies'] += book['available_copies']
+            entry['branches'].append({
+                'branch': branch,
+                'book_id': book['id'],
+                'total_copies': book['total_copies'],
+                'available_copies': book['available_copies']
+            })
+
+    return sorted(merged.values(), key=lambda book: _relevance(book, term, search_type))
+
+
+def federated_search(search_term: str, search_type: str = 'title',
+                     branches: Optional[List[str]] = None,
+                     timeout: float = FEDERATED_SEARCH_TIMEOUT) -> Tuple[bool, str, Optional[Dict]]:
+    """
+    Search the catalogs of several branches at once.
+
+    Each branch contributes up to FEDERATED_BRANCH_LIMIT matches. A branch
+    that fails or does not answer within timeout is reported in the branch
+    status and left out of the results.
+
+    Args:
+        search_term: Term to search for
+        search_type: 'title', 'author' or 'isbn'
+        branches: Branch names to search; all configured branches if None
+        timeout: Seconds to wait for the slowest branch
+
+    Returns:
+        tuple: (success: bool, message: str, result: dict with 'results',
+            'count' and per-branch 'branches' status: count, total matches,
+            elapsed_ms and error)
+    """
+    if not search_term or not search_term.strip():
+        return False, "Search term is required.", None
+
+    if search_type not in FEDERATED_SEARCH_TYPES:
+        return False, f"Search type must be one of: {', '.join(FEDERATED_SEARCH_TYPES)}.", None
+
+    configured = get_branches()
+    if not configured:
+        return False, "No branches are configured.", None
+
+    if branches is None:
+        branches = configured
+    unknown = [branch for branch in branches if branch not in configured]
+    if unknown:
+        return False, f"Unknown branch: {', '.join(unknown)}.", None
+
+    futures = {branch: _executor.submit(_search_branch, branch, search_term, search_type)
+               for branch in branches}
+    wait(futures.values(), timeout=timeout)
+
+    branch_results = {}
+    status = {}
+    for branch, future in futures.items():
+        if not future.done():
+            future.cancel()
+            status[branch] = {'count': 0, 'total': None, 'elapsed_ms': None, 'error': 'Timed out'}
+            continue
+        try:
+            results, total, elapsed_ms = future.result()
+        except Exception as e:
+            status[branch] = {'count': 0, 'total': None, 'elapsed_ms': None, 'error': str(e)}
+            continue
+        branch_results[branch] = results
+        status[branch] = {'count': len(results), 'total': total,
+                          'elapsed_ms': round(elapsed_ms, 2), 'error': None}
+
+    results = merge_branch_results(branch_results, search_term, search_type)
+    return True, "OK", {'results': results, 'count': len(results), 'branches': status}
@@ -0,0 +1,48 @@
+"""
+Fee Ledger Module - Nightly accrual of late fees on open loans
+Returns post the fee a loan ended with; this job posts what loans still out
+have run up since, so patron balances stay current without recomputing them.
+"""
+
+from datetime import datetime
+from typing import Dict, List, Tuple
+
+from database import get_accrued_fees, get_open_loan_ids, insert_fee_entries, iter_overdue_loans
+from services.library_service import late_fee_accruals
+from services.write_queue import run_write
+
+# Overdue loans accrued per transaction
+ACCRUAL_BATCH_SIZE = 500
+
+
+def _accrue_batch(conn, loans: List[Dict], as_of: datetime):
+    """Accrue a batch within conn's transaction, skipping loans returned meanwhile."""
+    still_open = set(get_open_loan_ids([loan['id'] for loan in loans], conn=conn))
+    loans = [loan for loan in loans if loan['id'] in still_open]
+    entries = late_fee_accruals(loans, get_accrued_fees([loan['id'] for loan in loans], conn=conn), as_of)
+    if not insert_fee_entries(entries, conn=conn):
+        return False, "Database error while posting accruals.", []
+    return True, "OK", entries
+
+
+def accrue_overdue_fees(now: datetime = None, batch_size: int = ACCRUAL_BATCH_SIZE) -> Tuple[bool, str, Dict]:
+    """
+    Post the late fees every overdue open loan has run up since its last
+    accrual, one transaction per batch. Run it daily; running it again
+    the same day posts nothing.
+
+    Returns:
+        tuple: (success: bool, message: str, result: dict with loans
+            (overdue loans checked), entries (accruals posted) and amount
+            (their total, in dollars))
+    """
+    now = now or datetime.now()
+    loans_checked, entries, cents = 0, 0, 0
+    for loans in iter_overdue_loans(now.isoformat(), batch_size):
+        success, message, posted = run_write(_accrue_batch, loans, now)
+        if not success:
+            return False, message, {'loans': loans_checked, 'entries': entries, 'amount': cents / 100}
+        loans_checked += len(loans)
+        entries += len(posted)
+        cents += sum(entry[3] for entry in posted)
+    return True, "OK", {'loans': loans_checked, 'entries': entries, 'amount': cents / 100}
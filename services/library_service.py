@@ -3,16 +3,51 @@ Library Service Module - Business Logic Functions
 Contains all the core business logic for the Library Management System
 """
 
+from services.catalog_replica import catalog_replica
 from services.payment_service import PaymentGateway
+from services.search_cache import normalize_search_term, search_cache
+from services.suggest_index import suggest_index
+from services.trigram_index import trigram_index
+from services.write_queue import run_write
 
+import logging
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Tuple
 from database import (
     get_book_by_id, get_book_by_isbn, get_patron_borrow_count,
     insert_book, insert_borrow_record, update_book_availability,
-    update_borrow_record_return_date, get_all_books
+    get_all_books, get_catalog_generation,
+    add_book_insert_listener, add_catalog_reload_listener, get_books_by_ids, query_books, BOOK_SORT_COLUMNS,
+    get_current_branch, is_default_database, get_patron_borrowed_books, get_patron_loan_history,
+    insert_hold, get_active_hold, get_next_hold, close_hold, get_open_loan_by_barcode, close_borrow_record,
+    get_latest_loan, get_accrued_fees, get_loan_fees, insert_fee_entries, get_patron_balance, get_fee_ledger, get_payment_entry,
+    get_open_loans_with_payments
 )
 
+logger = logging.getLogger(__name__)
+
+# Circulation rules
+MAX_BORROWED_BOOKS = 5
+LOAN_PERIOD_DAYS = 14
+MAX_LATE_FEE = 15.0
+
+# Patrons owing more than this in late fees cannot borrow
+MAX_OUTSTANDING_FEES = 10.0
+
+# Number of results per page when a search page is requested
+SEARCH_PAGE_SIZE = 20
+
+# Maximum number of ranked matches returned by a fuzzy search
+FUZZY_MAX_RESULTS = 50
+
+# Largest page a structured catalog query may request, and the largest
+# offset SQLite can bind (a signed 64-bit integer)
+MAX_QUERY_LIMIT = 100
+MAX_QUERY_OFFSET = 2 ** 63 - 1
+
+# Returned loans listed in a patron status report
+PATRON_HISTORY_LIMIT = 100
+
 def add_book_to_catalog(title: str, author: str, isbn: str, total_copies: int) -> Tuple[bool, str]:
     """
     Add a new book to the catalog.
@@ -74,30 +109,40 @@ def borrow_book_by_patron(patron_id: str, book_id: int) -> Tuple[bool, str]:
     if not patron_id or not patron_id.isdigit() or len(patron_id) != 6:
         return False, "Invalid patron ID. Must be exactly 6 digits."
     
+    # Checks and writes share one transaction so the last copy can't be lent twice
+    return run_write(_borrow, patron_id, book_id)
+
+def _borrow(conn, patron_id: str, book_id: int) -> Tuple[bool, str]:
+    """Borrow within conn's transaction; the caller rolls back on failure."""
     # Check if book exists and is available
-    book = get_book_by_id(book_id)
+    book = get_book_by_id(book_id, conn=conn)
     if not book:
         return False, "Book not found."
     
     if book['available_copies'] <= 0:
-        return False, "This book is currently not available."
+        return False, "This book is currently not available. You can place a hold to join the waiting list."
     
     # Check patron's current borrowed books count
-    current_borrowed = get_patron_borrow_count(patron_id)
+    current_borrowed = get_patron_borrow_count(patron_id, conn=conn)
+    
+    if current_borrowed >= MAX_BORROWED_BOOKS:
+        return False, f"You have reached the maximum borrowing limit of {MAX_BORROWED_BOOKS} books."
     
-    if current_borrowed >= 5:
-        return False, "You have reached the maximum borrowing limit of 5 books."
+    # Maintained balance, so this is one primary key lookup
+    balance = get_patron_balance(patron_id, conn=conn)
+    if balance > to_cents(MAX_OUTSTANDING_FEES):
+        return False, f"You owe ${balance / 100:.2f} in late fees. Please pay them before borrowing."
     
     # Create borrow record
     borrow_date = datetime.now()
-    due_date = borrow_date + timedelta(days=14)
+    due_date = borrow_date + timedelta(days=LOAN_PERIOD_DAYS)
     
     # Insert borrow record and update availability
-    borrow_success = insert_borrow_record(patron_id, book_id, borrow_date, due_date)
+    borrow_success = insert_borrow_record(patron_id, book_id, borrow_date, due_date, conn=conn)
     if not borrow_success:
         return False, "Database error occurred while creating borrow record."
     
-    availability_success = update_book_availability(book_id, -1)
+    availability_success = update_book_availability(book_id, -1, conn=conn)
     if not availability_success:
         return False, "Database error occurred while updating book availability."
     
@@ -107,52 +152,268 @@ def return_book_by_patron(patron_id: str, book_id: int) -> Tuple[bool, str]:
     """
     Process book return by a patron.
     Implements R4: Book Return Processing
+
+    If patrons are waiting for the book, the returned copy is lent to the
+    first eligible one in the same transaction.
     """
     # Validate patron ID
     if not patron_id or not patron_id.isdigit() or len(patron_id) != 6:
         return False, "Invalid patron ID. Must be exactly 6 digits."
 
+    return run_write(_return, patron_id, book_id)
+
+def _return(conn, patron_id: str, book_id: int) -> Tuple[bool, str]:
+    """Return within conn's transaction; the caller rolls back on failure."""
     # Verify that the book exists
-    book = get_book_by_id(book_id)
+    book = get_book_by_id(book_id, conn=conn)
     if not book:
         return False, "Book not found."
 
-    # Check if this book was borrowed by the patron (placeholder logic)
-    # In a real system, we would query the borrow records table.
-    borrow_count = get_patron_borrow_count(patron_id)
-    if borrow_count == 0:
-        return False, "No record found of this patron borrowing any books."
+    # Only a copy this patron has out of this book can come back
+    loan = get_latest_loan(patron_id, book_id, conn=conn)
+    if not loan or loan['return_date'] is not None:
+        return False, "No open loan found for this patron and book."
 
-    # Update book availability (+1 copy)
-    update_success = update_book_availability(book_id, 1)
-    if not update_success:
+    return_date = datetime.now()
+    if not close_borrow_record(loan['id'], return_date, conn=conn):
+        return False, "Database error while recording the return."
+
+    if not update_book_availability(book_id, 1, conn=conn):
         return False, "Database error while updating book availability."
 
-    # Record the return date
-    update_borrow_record_return_date(patron_id, book_id, datetime.now())
+    # Record the late fee the loan ended with
+    if not accrue_late_fee(conn, loan, return_date):
+        return False, "Database error while recording the late fee."
+
+    return _pass_to_hold_queue(conn, book_id, book['title'], return_date)
+
+def return_book_by_barcode(barcode: str) -> Tuple[bool, str]:
+    """
+    Process the return of a copy scanned at the desk.
+    Implements R4: Book Return Processing
+
+    The barcode identifies the copy and with it the open loan, so neither
+    the patron nor the book ID is needed.
+    """
+    if not isinstance(barcode, str) or not barcode.strip():
+        return False, "Barcode is required."
+
+    return run_write(_return_barcode, barcode.strip())
+
+def _return_barcode(conn, barcode: str) -> Tuple[bool, str]:
+    """Return a scanned copy within conn's transaction."""
+    loan = get_open_loan_by_barcode(barcode, conn=conn)
+    if not loan:
+        return False, "No open loan found for this barcode."
+
+    return_date = datetime.now()
+    if not close_borrow_record(loan['id'], return_date, conn=conn):
+        return False, "Database error while recording the return."
+
+    if not update_book_availability(loan['book_id'], 1, conn=conn):
+        return False, "Database error while updating book availability."
+
+    if not accrue_late_fee(conn, loan, return_date):
+        return False, "Database error while recording the late fee."
+
+    return _pass_to_hold_queue(conn, loan['book_id'], loan['title'], return_date)
+
+def _pass_to_hold_queue(conn, book_id: int, title: str, return_date: datetime) -> Tuple[bool, str]:
+    """Hand a returned copy straight to the head of the hold queue, if any."""
+    hold = get_next_hold(book_id, MAX_BORROWED_BOOKS, conn=conn)
+    if hold and not _lend_to_hold(hold, return_date, conn):
+        return False, "Database error while allocating the copy to the hold queue."
+
+    if hold:
+        return True, (f'Book "{title}" successfully returned. '
+                      f'The copy has been checked out to the next patron in the hold queue.')
+    return True, f'Book "{title}" successfully returned.'
+
+def _lend_to_hold(hold: Dict, borrow_date: datetime, conn) -> bool:
+    """Check out one copy to the patron of a hold and close the hold."""
+    due_date = borrow_date + timedelta(days=LOAN_PERIOD_DAYS)
+    return (insert_borrow_record(hold['patron_id'], hold['book_id'], borrow_date, due_date, conn=conn)
+            and update_book_availability(hold['book_id'], -1, conn=conn)
+            and close_hold(hold['id'], 'fulfilled', borrow_date, conn=conn))
+
+def place_hold(patron_id: str, book_id: int) -> Tuple[bool, str, Optional[Dict]]:
+    """
+    Join the waiting list for a book with no available copies.
+    
+    Args:
+        patron_id: 6-digit library card ID
+        book_id: ID of the book to hold
+        
+    Returns:
+        tuple: (success: bool, message: str, hold: Optional[dict] with queue_position)
+    """
+    if not patron_id or not patron_id.isdigit() or len(patron_id) != 6:
+        return False, "Invalid patron ID. Must be exactly 6 digits.", None
+    
+    return run_write(_place_hold, patron_id, book_id)
+
+def _place_hold(conn, patron_id: str, book_id: int) -> Tuple[bool, str, Optional[Dict]]:
+    """Place a hold within conn's transaction; the caller rolls back on failure."""
+    book = get_book_by_id(book_id, conn=conn)
+    if not book:
+        return False, "Book not found.", None
+    
+    if book['available_copies'] > 0:
+        return False, "This book is available. Borrow it instead of placing a hold.", None
+    
+    if get_active_hold(patron_id, book_id, conn=conn):
+        return False, "You already have a hold on this book.", None
+    
+    hold = insert_hold(patron_id, book_id, datetime.now(), conn=conn)
+    if not hold:
+        return False, "Database error occurred while placing the hold.", None
+    
+    return True, f'Hold placed on "{book["title"]}". You are number {hold["queue_position"]} in the queue.', hold
+
+def cancel_hold(patron_id: str, hold_id: int) -> Tuple[bool, str]:
+    """
+    Cancel one of a patron's active holds.
+    
+    Returns:
+        tuple: (success: bool, message: str)
+    """
+    if not patron_id or not patron_id.isdigit() or len(patron_id) != 6:
+        return False, "Invalid patron ID. Must be exactly 6 digits."
+    
+    return run_write(_cancel_hold, patron_id, hold_id)
+
+def _cancel_hold(conn, patron_id: str, hold_id: int) -> Tuple[bool, str]:
+    """Cancel a hold within conn's transaction."""
+    if not close_hold(hold_id, 'cancelled', datetime.now(), patron_id=patron_id, conn=conn):
+        return False, "No active hold found for this patron."
+    
+    return True, "Hold cancelled."
+
+def late_fee_for_days(days_overdue: int) -> float:
+    """Late fee for a loan overdue by the given number of whole days."""
+    if days_overdue <= 0:
+        return 0.0
+    
+    # $0.50/day for first 7 days, $1/day thereafter, capped at $15
+    if days_overdue <= 7:
+        fee = 0.5 * days_overdue
+    else:
+        fee = (0.5 * 7) + 1.0 * (days_overdue - 7)
+    
+    return round(min(fee, MAX_LATE_FEE), 2)
 
-    return True, f'Book "{book["title"]}" successfully returned.'
+def to_cents(amount: float) -> int:
+    """Dollar amount in whole cents, as fees are kept in the ledger."""
+    return int(round(amount * 100))
+
+def late_fee_accruals(loans: List[Dict], accrued: Dict[int, int], as_of: datetime) -> List[Tuple]:
+    """
+    Ledger entries for the late fees loans have run up by as_of beyond
+    what was already accrued on them (cents per loan id). Fees only grow
+    with lateness, so each accrual is the difference.
+    """
+    entries = []
+    for loan in loans:
+        owed = to_cents(late_fee_for_days((as_of - datetime.fromisoformat(loan['due_date'])).days))
+        if owed > accrued.get(loan['id'], 0):
+            entries.append((loan['patron_id'], loan['id'], 'accrual', owed - accrued.get(loan['id'], 0),
+                            as_of.isoformat(), None))
+    return entries
+
+def accrue_late_fee(conn, loan: Dict, as_of: datetime) -> bool:
+    """
+    Post what a loan has run up in late fees by as_of and the ledger does
+    not have yet, within conn's transaction.
+
+    Returns:
+        bool: False if the entry could not be posted
+    """
+    entries = late_fee_accruals([loan], get_accrued_fees([loan['id']], conn=conn), as_of)
+    return not entries or insert_fee_entries(entries, conn=conn)
 
-def calculate_late_fee_for_book(patron_id: str, book_id: int, borrow_date: datetime, return_date: datetime = None) -> Dict:
+def late_fee_quotes(loans: List[Dict], as_of: datetime) -> List[Dict]:
+    """
+    Price open loans (rows from get_open_loans_with_payments) as of a
+    time: the late fee each has run up, what has been paid on it and what
+    is still due, in dollars.
+    """
+    quotes = []
+    for loan in loans:
+        days_overdue = max((as_of - datetime.fromisoformat(loan['due_date'])).days, 0)
+        fee = late_fee_for_days(days_overdue)
+        paid = loan['paid_cents'] / 100
+        quotes.append({
+            'loan_id': loan['id'],
+            'book_id': loan['book_id'],
+            'title': loan['title'],
+            'borrow_date': loan['borrow_date'][:10],
+            'due_date': loan['due_date'][:10],
+            'fee_amount': fee,
+            'amount_paid': paid,
+            'amount_due': max(to_cents(fee) - loan['paid_cents'], 0) / 100,
+            'days_overdue': days_overdue,
+            'status': 'Overdue' if days_overdue > 0 else 'On time'
+        })
+    return quotes
+
+def returned_loan_quote(loan: Dict) -> Dict:
+    """
+    Price a returned loan (a borrow_records row) from the ledger: the fee
+    posted when it came back, what has been paid on it and what is still
+    due, with the same fields as late_fee_quotes plus return_date.
+    """
+    accrued, paid = get_loan_fees(loan['id'])
+    book = get_book_by_id(loan['book_id'])
+    returned = datetime.fromisoformat(loan['return_date'])
+    return {
+        'loan_id': loan['id'],
+        'book_id': loan['book_id'],
+        'title': book['title'] if book else None,
+        'borrow_date': loan['borrow_date'][:10],
+        'due_date': loan['due_date'][:10],
+        'return_date': loan['return_date'][:10],
+        'fee_amount': accrued / 100,
+        'amount_paid': paid / 100,
+        'amount_due': max(accrued - paid, 0) / 100,
+        'days_overdue': max((returned - datetime.fromisoformat(loan['due_date'])).days, 0),
+        'status': 'Returned'
+    }
+
+def calculate_late_fee_for_book(patron_id: str, book_id: int, borrow_date: Optional[datetime] = None,
+                                return_date: datetime = None) -> Dict:
     """
     Implements R5: Late Fee Calculation API
     
+    Without a borrow_date the patron's open loan of the book is looked up
+    and priced from its own due date, together with what has already been
+    paid on it. With no open loan, their latest returned loan of the book
+    owes what the ledger accrued on it at return, less payments.
+    
     Args:
         patron_id: 6-digit patron ID
         book_id: ID of the book
-        borrow_date: datetime when the book was borrowed
+        borrow_date: datetime when the book was borrowed; defaults to the open loan's
         return_date: datetime when the book was returned; defaults to now if not provided
     
     Returns:
         dict: {
             'fee_amount': float,
             'days_overdue': int,
-            'status': 'On time' or 'Overdue'
-        }
+            'status': 'On time', 'Overdue', 'Returned' or 'No loan'
+        }, plus the late_fee_quotes fields when a loan was priced
     """
     if return_date is None:
         return_date = datetime.now()
     
+    if borrow_date is None:
+        loans = get_open_loans_with_payments(patron_id, book_id)
+        if loans:
+            return late_fee_quotes(loans[:1], return_date)[0]
+        loan = get_latest_loan(patron_id, book_id)
+        if not loan:
+            return {'fee_amount': 0.0, 'days_overdue': 0, 'status': 'No loan'}
+        return returned_loan_quote(loan)
+    
     # Books are due 14 days after borrowing
     due_date = borrow_date + timedelta(days=14)
     days_overdue = (return_date - due_date).days
@@ -160,27 +421,82 @@ def calculate_late_fee_for_book(patron_id: str, book_id: int, borrow_date: datet
     if days_overdue <= 0:
         return {'fee_amount': 0.0, 'days_overdue': 0, 'status': 'On time'}
     
-    # $0.50/day for first 7 days, $1/day thereafter, capped at $15
-    if days_overdue <= 7:
-        fee = 0.5 * days_overdue
-    else:
-        fee = (0.5 * 7) + 1.0 * (days_overdue - 7)
-    
-    fee = min(fee, 15.0)
-    
     return {
-        'fee_amount': round(fee, 2),
+        'fee_amount': late_fee_for_days(days_overdue),
         'days_overdue': days_overdue,
         'status': 'Overdue'
     }
 
+def get_patron_late_fee_quotes(patron_id: str, as_of: Optional[datetime] = None) -> Tuple[bool, str, Optional[Dict]]:
+    """
+    Price every open loan of a patron from one query.
 
-def search_books_in_catalog(search_term: str, search_type: str) -> List[Dict]:
+    Returns:
+        tuple: (success: bool, message: str, quote: dict with 'loans'
+            (late_fee_quotes), 'total_fees' and 'total_due' in dollars)
+    """
+    if not patron_id or not patron_id.isdigit() or len(patron_id) != 6:
+        return False, "Invalid patron ID. Must be exactly 6 digits.", None
+
+    quotes = late_fee_quotes(get_open_loans_with_payments(patron_id), as_of or datetime.now())
+    return True, "OK", {
+        'patron_id': patron_id,
+        'loans': quotes,
+        'total_fees': sum(to_cents(quote['fee_amount']) for quote in quotes) / 100,
+        'total_due': sum(to_cents(quote['amount_due']) for quote in quotes) / 100
+    }
+
+
+def search_books_in_catalog(search_term: str, search_type: str, page: Optional[int] = None) -> List[Dict]:
     """
     Implements R6: Catalog Search
+
+    Results are served from the shared search cache while the catalog is
+    unchanged. Searches the branch database selected in this context.
+
+    Args:
+        search_term: Term to search for
+        search_type: 'title', 'author', 'isbn' or 'fuzzy' (typo-tolerant,
+            over titles and authors, best match first; other branches than
+            the default get a partial title or author match instead)
+        page: 1-based page of SEARCH_PAGE_SIZE results; all results if None
+
+    Returns:
+        list: Matching book dicts
     """
+    term = normalize_search_term(search_term)
+    key = (get_current_branch(), term, search_type, page)
+    version = get_catalog_generation()
+
+    cached = search_cache.get(key, version)
+    if cached is not None:
+        return cached
+
+    if search_type == "fuzzy" and not is_default_database():
+        # The trigram index only covers the default database
+        results = [book for book in get_all_books()
+                   if term in book["title"].lower() or term in book["author"].lower()]
+    elif search_type == "fuzzy":
+        matches = trigram_index.search(term, FUZZY_MAX_RESULTS)
+        results = get_books_by_ids([book_id for book_id, _ in matches])
+    else:
+        results = _scan_catalog(term, search_type)
+
+    if page is not None:
+        start = (page - 1) * SEARCH_PAGE_SIZE
+        results = results[start:start + SEARCH_PAGE_SIZE]
+
+    search_cache.put(key, results, version)
+    return results
+
+
+def _scan_catalog(term: str, search_type: str) -> List[Dict]:
+    """Match a normalized term against every book in the catalog."""
+    if catalog_replica.serves_current_database():
+        catalog_replica.refresh()
+        return catalog_replica.search(term, search_type)
+
     books = get_all_books()
-    term = search_term.strip().lower()
     results = []
 
     for book in books:
@@ -191,33 +507,157 @@ def search_books_in_catalog(search_term: str, search_type: str) -> List[Dict]:
         elif search_type == "isbn" and term == book["isbn"]:
             results.append(book)
 
-
     return results
 
 
+def list_catalog() -> List[Dict]:
+    """
+    Implements R2: Book Catalog Display
+
+    Every book ordered by title, from the catalog replica when it is
+    loaded for this database, otherwise from SQLite.
+    """
+    if catalog_replica.serves_current_database():
+        catalog_replica.refresh()
+        return catalog_replica.all_books()
+    return get_all_books()
+
+
+def query_catalog(title: Optional[str] = None, author: Optional[str] = None, isbn: Optional[str] = None,
+                  available_only: bool = False, sort: str = 'title', order: str = 'asc',
+                  limit: int = 20, offset: int = 0) -> Tuple[bool, str, Optional[Dict]]:
+    """
+    Search the catalog with combined predicates, sorting and paging.
+
+    All predicates must match; filtering, sorting and paging run in the
+    database rather than over get_all_books().
+
+    Args:
+        title: Case-insensitive partial title match
+        author: Case-insensitive partial author match
+        isbn: Exact ISBN match
+        available_only: Only books with at least one available copy
+        sort: One of 'title', 'author', 'id', 'available_copies'
+        order: 'asc' or 'desc'
+        limit: Page size (1-100)
+        offset: Number of matches to skip
+
+    Returns:
+        tuple: (success: bool, message: str, page: dict with 'results' and 'total')
+    """
+    if sort not in BOOK_SORT_COLUMNS:
+        return False, f"Sort must be one of: {', '.join(BOOK_SORT_COLUMNS)}.", None
+
+    if order not in ('asc', 'desc'):
+        return False, "Order must be 'asc' or 'desc'.", None
+
+    if not 1 <= limit <= MAX_QUERY_LIMIT:
+        return False, f"Limit must be between 1 and {MAX_QUERY_LIMIT}.", None
+
+    if not 0 <= offset <= MAX_QUERY_OFFSET:
+        return False, f"Offset must be between 0 and {MAX_QUERY_OFFSET}.", None
+
+    books, total = query_books(
+        title=title.strip() if title else None,
+        author=author.strip() if author else None,
+        isbn=isbn.strip() if isbn else None,
+        available_only=available_only,
+        sort=sort, order=order, limit=limit, offset=offset
+    )
+    return True, "OK", {'results': books, 'total': total}
+
+
+def rebuild_search_indexes():
+    """Rebuild the in-memory search indexes from the default database's catalog."""
+    books = get_all_books()
+    suggest_index.build(books)
+    trigram_index.build(books)
+
+
+def init_search_indexes():
+    """
+    Build the in-memory search indexes from the catalog and keep them
+    up to date as books are inserted here or changed by another process.
+    """
+    rebuild_search_indexes()
+    add_book_insert_listener(suggest_index.add)
+    add_book_insert_listener(trigram_index.add)
+    add_catalog_reload_listener(rebuild_search_indexes)
+
+
+def get_search_suggestions(query: str, limit: int = 10) -> List[Dict]:
+    """
+    Get typeahead suggestions for titles and authors starting with the query.
+
+    Args:
+        query: Text typed so far
+        limit: Maximum number of suggestions
+
+    Returns:
+        list: Suggestion dicts from the in-memory prefix index
+    """
+    return suggest_index.suggest(query, limit)
+
+
 def get_patron_status_report(patron_id: str) -> Dict:
     """
     Implements R7: Patron Status Report
-    """
-    # Mock current borrowed books (would normally come from database)
-    borrowed_books = [
-        {"title": "Book A", "due_date": "2025-10-20", "status": "Borrowed"},
-        {"title": "Book B", "due_date": "2025-10-05", "status": "Overdue"}
-    ]
 
-    # Mock borrowing history (returned books)
-    borrowing_history = [
-        {"title": "Book C", "returned_date": "2025-09-15"},
-        {"title": "Book D", "returned_date": "2025-09-01"}
-    ]
+    Current loans come from borrow_records; the borrowing history spans
+    borrow_records and the loan archive, most recent PATRON_HISTORY_LIMIT
+    returns first.
 
-    return {
+    Args:
+        patron_id: 6-digit patron ID
+
+    Returns:
+        dict: patron_id, borrowed_books (title, author, due_date, status,
+            late_fee), total_borrowed, outstanding_fees (the fee ledger
+            balance, including fees current loans have run up since they
+            were last accrued) and borrowing_history (title, author,
+            borrow_date, returned_date)
+    """
+    report = {
         "patron_id": patron_id,
-        "borrowed_books": borrowed_books,
-        "total_borrowed": len(borrowed_books),
-        "outstanding_fees": 5.50,
-        "borrowing_history": borrowing_history
+        "borrowed_books": [],
+        "total_borrowed": 0,
+        "outstanding_fees": 0.0,
+        "borrowing_history": []
     }
+    if not isinstance(patron_id, str):
+        return report
+
+    now = datetime.now()
+    loans = get_patron_borrowed_books(patron_id)
+    accrued = get_accrued_fees([loan['id'] for loan in loans])
+    # The ledger balance, plus what open loans have run up since their last accrual
+    outstanding = get_patron_balance(patron_id)
+    for loan in loans:
+        fee = late_fee_for_days((now - loan['due_date']).days)
+        outstanding += max(to_cents(fee) - accrued.get(loan['id'], 0), 0)
+        report["borrowed_books"].append({
+            "book_id": loan['book_id'],
+            "title": loan['title'],
+            "author": loan['author'],
+            "borrow_date": loan['borrow_date'].strftime('%Y-%m-%d'),
+            "due_date": loan['due_date'].strftime('%Y-%m-%d'),
+            "status": "Overdue" if loan['is_overdue'] else "Borrowed",
+            "late_fee": fee
+        })
+
+    report["total_borrowed"] = len(report["borrowed_books"])
+    report["outstanding_fees"] = outstanding / 100
+    report["borrowing_history"] = [
+        {
+            "book_id": loan['book_id'],
+            "title": loan['title'],
+            "author": loan['author'],
+            "borrow_date": loan['borrow_date'][:10],
+            "returned_date": loan['return_date'][:10]
+        }
+        for loan in get_patron_loan_history(patron_id, PATRON_HISTORY_LIMIT)
+    ]
+    return report
 
 def pay_late_fees(patron_id: str, book_id: int, payment_gateway: PaymentGateway = None) -> Tuple[bool, str, Optional[str]]:
     """
@@ -240,49 +680,97 @@ def pay_late_fees(patron_id: str, book_id: int, payment_gateway: PaymentGateway
         mock_gateway.process_payment.return_value = (True, "txn_123", "Success")
         success, msg, txn = pay_late_fees("123456", 1, mock_gateway)
     """
+    error, fee_amount, book = prepare_late_fee_payment(patron_id, book_id)
+    if error:
+        return False, error, None
+    
+    # Use provided gateway or create new one
+    if payment_gateway is None:
+        payment_gateway = PaymentGateway()
+    
+    # Process payment through external gateway
+    # THIS IS WHAT YOU SHOULD MOCK IN THEIR TESTS!
+    try:
+        success, transaction_id, message = payment_gateway.process_payment(
+            patron_id=patron_id,
+            amount=fee_amount,
+            description=f"Late fees for '{book['title']}'"
+        )
+    except Exception as e:
+        # Handle payment gateway errors
+        return False, f"Payment processing error: {str(e)}", None
+    
+    recorded = success and record_late_fee_payment(patron_id, book_id, fee_amount, transaction_id)
+    return payment_result(success, transaction_id, message, recorded)
+
+def prepare_late_fee_payment(patron_id: str, book_id: int) -> Tuple[Optional[str], float, Optional[Dict]]:
+    """
+    Validate a late fee payment and look up what to charge.
+    
+    Returns:
+        tuple: (error message or None, fee_amount, book)
+    """
     # Validate patron ID
     if not patron_id or not patron_id.isdigit() or len(patron_id) != 6:
-        return False, "Invalid patron ID. Must be exactly 6 digits.", None
+        return "Invalid patron ID. Must be exactly 6 digits.", 0.0, None
     
     # Calculate late fee first
     fee_info = calculate_late_fee_for_book(patron_id, book_id)
     
     # Check if there's a fee to pay
     if not fee_info or 'fee_amount' not in fee_info:
-        return False, "Unable to calculate late fees.", None
+        return "Unable to calculate late fees.", 0.0, None
     
-    fee_amount = fee_info.get('fee_amount', 0.0)
+    # Only what has not been paid on the loan yet
+    fee_amount = fee_info.get('amount_due', fee_info['fee_amount'])
     
     if fee_amount <= 0:
-        return False, "No late fees to pay for this book.", None
+        return "No late fees to pay for this book.", 0.0, None
     
     # Get book details for payment description
     book = get_book_by_id(book_id)
     if not book:
-        return False, "Book not found.", None
-    
-    # Use provided gateway or create new one
-    if payment_gateway is None:
-        payment_gateway = PaymentGateway()
+        return "Book not found.", 0.0, None
     
-    # Process payment through external gateway
-    # THIS IS WHAT YOU SHOULD MOCK IN THEIR TESTS!
+    return None, fee_amount, book
+
+def record_late_fee_payment(patron_id: str, book_id: int, amount: float, transaction_id: str) -> bool:
+    """
+    Post a charged late fee payment to the ledger, against the loan it paid
+    for. The gateway has already taken the money, so a payment that cannot
+    be posted is logged for reconciliation and False returned.
+    """
     try:
-        success, transaction_id, message = payment_gateway.process_payment(
-            patron_id=patron_id,
-            amount=fee_amount,
-            description=f"Late fees for '{book['title']}'"
-        )
-        
-        if success:
-            return True, f"Payment successful! {message}", transaction_id
-        else:
-            return False, f"Payment failed: {message}", None
-            
+        success, message = run_write(_post_payment, patron_id, book_id, amount, transaction_id)
     except Exception as e:
-        # Handle payment gateway errors
-        return False, f"Payment processing error: {str(e)}", None
+        success, message = False, str(e)
+    if not success:
+        logger.error('Late fee payment %s of $%.2f by patron %s for book %s was charged but not posted: %s',
+                     transaction_id, amount, patron_id, book_id, message)
+    return success
+
+def _post_payment(conn, patron_id: str, book_id: int, amount: float, transaction_id: str) -> Tuple[bool, str]:
+    loan = get_latest_loan(patron_id, book_id, conn=conn)
+    entry = (patron_id, loan['id'] if loan else None, 'payment', -to_cents(amount),
+             datetime.now().isoformat(), transaction_id)
+    if not insert_fee_entries([entry], conn=conn):
+        return False, "Database error while recording the payment."
+    return True, "Payment recorded."
+
+def payment_result(success: bool, transaction_id: str, message: str,
+                   recorded: bool = True) -> Tuple[bool, str, Optional[str]]:
+    """
+    Turn a gateway charge response into the pay_late_fees result; recorded
+    says whether the charge made it into the ledger.
+    """
+    if success and not recorded:
+        return True, (f"Payment successful! {message} It could not be applied to your balance yet; "
+                      f"please keep transaction {transaction_id} for the front desk."), transaction_id
+    if success:
+        return True, f"Payment successful! {message}", transaction_id
+    return False, f"Payment failed: {message}", None
     
+
 def refund_late_fee_payment(transaction_id: str, amount: float, payment_gateway: PaymentGateway = None) -> Tuple[bool, str]:
     """
     Refund a late fee payment (e.g., if book was returned on time but fees were charged in error).
@@ -297,15 +785,9 @@ def refund_late_fee_payment(transaction_id: str, amount: float, payment_gateway:
     Returns:
         tuple: (success: bool, message: str)
     """
-    # Validate inputs
-    if not transaction_id or not transaction_id.startswith("txn_"):
-        return False, "Invalid transaction ID."
-    
-    if amount <= 0:
-        return False, "Refund amount must be greater than 0."
-    
-    if amount > 15.00:  # Maximum late fee per book
-        return False, "Refund amount exceeds maximum late fee."
+    error = validate_refund(transaction_id, amount)
+    if error:
+        return False, error
     
     # Use provided gateway or create new one
     if payment_gateway is None:
@@ -315,11 +797,81 @@ def refund_late_fee_payment(transaction_id: str, amount: float, payment_gateway:
     # THIS IS WHAT YOU SHOULD MOCK IN YOUR TESTS!
     try:
         success, message = payment_gateway.refund_payment(transaction_id, amount)
-        
-        if success:
-            return True, message
-        else:
-            return False, f"Refund failed: {message}"
-            
     except Exception as e:
-        return False, f"Refund processing error: {str(e)}"
\ No newline at end of file
+        return False, f"Refund processing error: {str(e)}"
+    
+    recorded = success and record_late_fee_refund(transaction_id, amount)
+    return refund_result(success, message, recorded)
+
+def validate_refund(transaction_id: str, amount: float) -> Optional[str]:
+    """Check a late fee refund request; returns an error message or None."""
+    if not transaction_id or not transaction_id.startswith("txn_"):
+        return "Invalid transaction ID."
+    
+    if amount <= 0:
+        return "Refund amount must be greater than 0."
+    
+    if amount > MAX_LATE_FEE:  # Maximum late fee per book
+        return "Refund amount exceeds maximum late fee."
+    
+    return None
+
+def record_late_fee_refund(transaction_id: str, amount: float) -> bool:
+    """
+    Post a refund to the ledger, owed again by the patron whose payment it
+    reverses. The gateway has already paid it out, so a refund that cannot
+    be posted, or whose payment is not in the ledger, is logged for
+    reconciliation and False returned.
+    """
+    try:
+        success, message = run_write(_post_refund, transaction_id, amount)
+    except Exception as e:
+        success, message = False, str(e)
+    if not success:
+        logger.error('Late fee refund of $%.2f for %s was paid out but not posted: %s', amount, transaction_id, message)
+    return success
+
+def _post_refund(conn, transaction_id: str, amount: float) -> Tuple[bool, str]:
+    payment = get_payment_entry(transaction_id, conn=conn)
+    if not payment:
+        return False, "No payment recorded for this transaction."
+    entry = (payment['patron_id'], payment['loan_id'], 'refund', to_cents(amount),
+             datetime.now().isoformat(), transaction_id)
+    if not insert_fee_entries([entry], conn=conn):
+        return False, "Database error while recording the refund."
+    return True, "Refund recorded."
+
+def get_patron_fees(patron_id: str, limit: int = 50) -> Tuple[bool, str, Optional[Dict]]:
+    """
+    Get what a patron owes in late fees and their latest ledger entries.
+
+    Returns:
+        tuple: (success: bool, message: str, fees: dict with 'balance',
+            'borrowing_blocked' and 'entries', amounts in dollars)
+    """
+    if not patron_id or not patron_id.isdigit() or len(patron_id) != 6:
+        return False, "Invalid patron ID. Must be exactly 6 digits.", None
+
+    balance = get_patron_balance(patron_id)
+    entries = [
+        {**{key: entry[key] for key in ('id', 'loan_id', 'entry_type', 'posted_date', 'reference')},
+         'amount': entry['amount_cents'] / 100}
+        for entry in get_fee_ledger(patron_id, limit)
+    ]
+    return True, "OK", {
+        'patron_id': patron_id,
+        'balance': balance / 100,
+        'borrowing_blocked': balance > to_cents(MAX_OUTSTANDING_FEES),
+        'entries': entries
+    }
+
+def refund_result(success: bool, message: str, recorded: bool = True) -> Tuple[bool, str]:
+    """
+    Turn a gateway refund response into the refund_late_fee_payment result;
+    recorded says whether the refund made it into the ledger.
+    """
+    if success and not recorded:
+        return True, f"{message} The refund could not be recorded against the late fees and needs reconciling."
+    if success:
+        return True, message
+    return False, f"Refund failed: {message}"
\ No newline at end of file
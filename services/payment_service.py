@@ -6,11 +6,43 @@ For Assignment 3: You will learn to mock this service in their tests
 since we cannot make actual payment API calls during testing.
 """
 
+import asyncio
 import requests
 from typing import Dict, Tuple
 import time
 
 
+def _simulate_payment(patron_id: str, amount: float) -> Tuple[bool, str, str]:
+    """Gateway response to a charge, without the network round trip."""
+    # For this template, we simulate different scenarios based on amount
+    # This allows testing without a real API
+    
+    if amount <= 0:
+        return False, "", "Invalid amount: must be greater than 0"
+    
+    if amount > 1000:
+        return False, "", "Payment declined: amount exceeds limit"
+    
+    if len(patron_id) != 6:
+        return False, "", "Invalid patron ID format"
+    
+    # Simulate successful payment
+    transaction_id = f"txn_{patron_id}_{int(time.time())}"
+    return True, transaction_id, f"Payment of ${amount:.2f} processed successfully"
+
+
+def _simulate_refund(transaction_id: str, amount: float) -> Tuple[bool, str]:
+    """Gateway response to a refund, without the network round trip."""
+    if not transaction_id or not transaction_id.startswith("txn_"):
+        return False, "Invalid transaction ID"
+    
+    if amount <= 0:
+        return False, "Invalid refund amount"
+    
+    refund_id = f"refund_{transaction_id}_{int(time.time())}"
+    return True, f"Refund of ${amount:.2f} processed successfully. Refund ID: {refund_id}"
+
+
 class PaymentGateway:
     """
     Simulates an external payment gateway API.
@@ -66,21 +98,7 @@ class PaymentGateway:
         #     }
         # )
         
-        # For this template, we simulate different scenarios based on amount
-        # This allows testing without a real API
-        
-        if amount <= 0:
-            return False, "", "Invalid amount: must be greater than 0"
-        
-        if amount > 1000:
-            return False, "", "Payment declined: amount exceeds limit"
-        
-        if len(patron_id) != 6:
-            return False, "", "Invalid patron ID format"
-        
-        # Simulate successful payment
-        transaction_id = f"txn_{patron_id}_{int(time.time())}"
-        return True, transaction_id, f"Payment of ${amount:.2f} processed successfully"
+        return _simulate_payment(patron_id, amount)
     
     def refund_payment(self, transaction_id: str, amount: float) -> Tuple[bool, str]:
         """
@@ -98,14 +116,7 @@ class PaymentGateway:
         """
         time.sleep(0.5)
         
-        if not transaction_id or not transaction_id.startswith("txn_"):
-            return False, "Invalid transaction ID"
-        
-        if amount <= 0:
-            return False, "Invalid refund amount"
-        
-        refund_id = f"refund_{transaction_id}_{int(time.time())}"
-        return True, f"Refund of ${amount:.2f} processed successfully. Refund ID: {refund_id}"
+        return _simulate_refund(transaction_id, amount)
     
     def verify_payment_status(self, transaction_id: str) -> Dict:
         """
@@ -131,4 +142,41 @@ class PaymentGateway:
             "status": "completed",
             "amount": 10.50,
             "timestamp": time.time()
-        }
\ No newline at end of file
+        }
+
+
+class AsyncPaymentGateway:
+    """
+    Non-blocking version of PaymentGateway for the async API.
+    
+    Same calls and results, but each one is a coroutine that waits on the
+    gateway without holding a thread, so many payments can be in flight at
+    once on one event loop. Mock it with AsyncMock in tests.
+    """
+    
+    def __init__(self, api_key: str = "test_key_12345"):
+        self.api_key = api_key
+        self.base_url = "https://api.payment-gateway.example.com"
+    
+    async def process_payment(self, patron_id: str, amount: float, description: str = "") -> Tuple[bool, str, str]:
+        """
+        Process a payment through the external gateway.
+        
+        Returns:
+            tuple: (success: bool, transaction_id: str, message: str)
+        """
+        # Simulate API call delay
+        await asyncio.sleep(0.5)
+        
+        return _simulate_payment(patron_id, amount)
+    
+    async def refund_payment(self, transaction_id: str, amount: float) -> Tuple[bool, str]:
+        """
+        Refund a previous payment.
+        
+        Returns:
+            tuple: (success: bool, message: str)
+        """
+        await asyncio.sleep(0.5)
+        
+        return _simulate_refund(transaction_id, amount)
@@ -0,0 +1,166 @@
+"""
+Scheduler Module - Fires time-based circulation events for open loans
+Reminders before a loan falls due and overdue notices once it has, driven
+by an in-process min-heap instead of periodic table scans.
+"""
+
+import heapq
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+
+from database import (
+    get_open_loans_due_after, get_open_loan_ids,
+    get_scheduler_watermark, set_scheduler_watermark
+)
+
+logger = logging.getLogger(__name__)
+
+REMINDER = 'reminder'
+OVERDUE = 'overdue'
+
+
+def log_events(event: str, loans: List[Dict]):
+    """Default handler: log one line per batch of fired events."""
+    logger.info('%d %s event(s): borrow records %s', len(loans), event,
+                [loan['id'] for loan in loans])
+
+
+class DueDateScheduler:
+    """
+    Min-heap of upcoming reminder and overdue events for open loans.
+
+    Each event type walks open loans in (due_date, id) order through the
+    open-loan due-date index, loading batch_size loans at a time and only
+    as far ahead as the next wake-up needs. Events that come due are fired
+    to the handler in batches per type, and the (due_date, id) of the last
+    loan fired is stored in scheduler_state, so after a restart loading
+    resumes from there instead of rescanning every open loan.
+
+    Loans returned before their event fires are skipped. Loans are assumed
+    to be created with due dates ahead of the load position, which holds
+    while the loan period is longer than the reminder lead time.
+    """
+
+    def __init__(self, reminder_days: int = 2, batch_size: int = 500,
+                 handler: Callable[[str, List[Dict]], None] = log_events,
+                 max_sleep: float = 60.0):
+        self.leads = {REMINDER: timedelta(days=reminder_days), OVERDUE: timedelta(0)}
+        self.batch_size = batch_size
+        self.handler = handler
+        self.max_sleep = max_sleep
+        self._heap = []
+        self._cursors = {}
+        self._exhausted = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.reload()
+
+    def reload(self):
+        """Drop loaded events and resume each event type from its watermark."""
+        with self._lock:
+            self._heap = []
+            for event in self.leads:
+                self._cursors[event] = get_scheduler_watermark(event)
+                self._exhausted[event] = False
+
+    def _fire_time(self, event: str, due_date: str) -> datetime:
+        return datetime.fromisoformat(due_date) - self.leads[event]
+
+    def _load_batch(self, event: str):
+        due_date, record_id = self._cursors[event]
+        loans = get_open_loans_due_after(due_date, record_id, self.batch_size)
+        for loan in loans:
+            heapq.heappush(self._heap, (self._fire_time(event, loan['due_date']),
+                                        loan['due_date'], loan['id'], event, loan))
+        if loans:
+            self._cursors[event] = (loans[-1]['due_date'], loans[-1]['id'])
+        self._exhausted[event] = len(loans) < self.batch_size
+
+    def _unloaded_fire_time(self, event: str) -> Optional[datetime]:
+        """Earliest fire time an event type could still have beyond its cursor."""
+        if self._exhausted[event]:
+            return None
+        due_date = self._cursors[event][0]
+        return self._fire_time(event, due_date) if due_date else datetime.min
+
+    def _ensure_loaded(self, until: datetime):
+        """Load loans until every event firing at or before until is in the heap."""
+        for event in self.leads:
+            while True:
+                pending = self._unloaded_fire_time(event)
+                if pending is None or pending > until:
+                    break
+                self._load_batch(event)
+
+    def next_fire_time(self) -> Optional[datetime]:
+        """Get when the next event is due, or None if nothing is scheduled."""
+        with self._lock:
+            times = [self._heap[0][0]] if self._heap else []
+            for event in self.leads:
+                pending = self._unloaded_fire_time(event)
+                if pending is not None:
+                    times.append(pending)
+            return min(times) if times else None
+
+    def run_pending(self, now: datetime = None) -> Dict[str, int]:
+        """
+        Fire every event due at or before now.
+
+        Returns:
+            dict: Number of events fired per event type
+        """
+        now = now or datetime.now()
+        with self._lock:
+            # Look past the end of the loaded loans again to pick up new ones
+            for event in self.leads:
+                self._exhausted[event] = False
+            self._ensure_loaded(now)
+            due = {event: [] for event in self.leads}
+            while self._heap and self._heap[0][0] <= now:
+                _, _, _, event, loan = heapq.heappop(self._heap)
+                due[event].append(loan)
+
+            fired = {}
+            for event, loans in due.items():
+                if not loans:
+                    continue
+                still_open = set(get_open_loan_ids([loan['id'] for loan in loans]))
+                batch = [loan for loan in loans if loan['id'] in still_open]
+                if event == REMINDER:
+                    # A reminder is pointless once the loan is already overdue
+                    batch = [loan for loan in batch if datetime.fromisoformat(loan['due_date']) > now]
+                if batch:
+                    self.handler(event, batch)
+                    fired[event] = len(batch)
+                last = loans[-1]
+                set_scheduler_watermark(event, last['due_date'], last['id'])
+            return fired
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.run_pending()
+            except Exception:
+                logger.exception('Due-date scheduler tick failed')
+            next_time = self.next_fire_time()
+            timeout = self.max_sleep
+            if next_time is not None:
+                timeout = min(timeout, max((next_time - datetime.now()).total_seconds(), 0.0))
+            self._stop.wait(timeout)
+
+    def start(self):
+        """Run the scheduler on a daemon thread."""
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='due-date-scheduler', daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        """Stop the scheduler thread."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
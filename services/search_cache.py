@@ -0,0 +1,115 @@
+"""
+Search Cache Module - Bounded LRU cache for catalog search results
+Shared by the web and API search endpoints through search_books_in_catalog.
+"""
+
+import sys
+import threading
+from collections import OrderedDict
+from typing import Dict, Hashable, List, Optional
+
+
+def normalize_search_term(search_term: str) -> str:
+    """Lowercase a search term and collapse runs of whitespace."""
+    return ' '.join(search_term.lower().split())
+
+
+def estimate_results_size(results: List[Dict]) -> int:
+    """Approximate the memory held by a list of book dicts, in bytes."""
+    size = sys.getsizeof(results)
+    for book in results:
+        size += sys.getsizeof(book)
+        for key, value in book.items():
+            size += sys.getsizeof(key) + sys.getsizeof(value)
+    return size
+
+
+class SearchResultCache:
+    """
+    LRU cache of search results bounded by entry count and total size in bytes.
+
+    Entries belong to a catalog version. Looking up or storing with a newer
+    version drops every entry at once, so writes never need to find the
+    individual searches they affect.
+    """
+
+    def __init__(self, max_entries: int = 512, max_bytes: int = 8 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._version = None
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def _check_version(self, version: int):
+        """Drop all entries if the catalog moved past the cached version."""
+        if version != self._version:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self._bytes = 0
+            self._version = version
+
+    def get(self, key: Hashable, version: int) -> Optional[List[Dict]]:
+        """Return cached results for key at the given catalog version, or None."""
+        with self._lock:
+            self._check_version(version)
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            # Copies, so callers can change their results without changing the cache
+            return [dict(book) for book in entry[0]]
+
+    def put(self, key: Hashable, results: List[Dict], version: int):
+        """Store results computed at the given catalog version."""
+        size = estimate_results_size(results)
+        with self._lock:
+            if self._version is None or version > self._version:
+                self._check_version(version)
+            if version != self._version or size > self.max_bytes:
+                # Results from an older catalog, or too big to ever fit
+                return
+            if key in self._entries:
+                self._bytes -= self._entries.pop(key)[1]
+            self._entries[key] = ([dict(book) for book in results], size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+    def clear(self):
+        """Remove all entries and reset the metrics."""
+        with self._lock:
+            self._entries.clear()
+            self._version = None
+            self._bytes = 0
+            self.hits = self.misses = self.evictions = self.invalidations = 0
+
+    def stats(self) -> Dict:
+        """Get cache size and hit-rate metrics."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'catalog_version': self._version
+            }
+
+
+# Process-wide cache shared by /search and /api/search
+search_cache = SearchResultCache()
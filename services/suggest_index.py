@@ -0,0 +1,243 @@
+"""
+Suggest Index Module - In-memory prefix index for typeahead suggestions
+Serves /api/suggest without touching SQLite.
+"""
+
+import bisect
+import re
+import sys
+import threading
+import unicodedata
+from array import array
+from typing import Callable, Dict, Iterable, List, Tuple
+
+# Words too common to be worth a suggestion entry of their own
+STOPWORDS = {'a', 'an', 'and', 'of', 'the', 'to', 'in', 'on', 'for'}
+
+_NON_ALNUM = re.compile(r'[^0-9a-z]+')
+
+
+def normalize_text(text: str) -> str:
+    """Lowercase, strip accents and reduce punctuation to single spaces."""
+    if not text.isascii():
+        text = unicodedata.normalize('NFKD', text)
+        text = ''.join(ch for ch in text if not unicodedata.combining(ch))
+    return _NON_ALNUM.sub(' ', text.lower()).strip()
+
+
+def _title_word(index: int, word: str) -> bool:
+    return index == 0 or word not in STOPWORDS
+
+
+def _author_word(index: int, word: str) -> bool:
+    return index == 0 or len(word) > 1
+
+
+def _word_starts(key: str, keep: Callable[[int, str], bool]) -> List[int]:
+    """Offsets in key of each word an entry should start from."""
+    offsets = []
+    offset = 0
+    for i, word in enumerate(key.split(' ')):
+        if keep(i, word):
+            offsets.append(offset)
+        offset += len(word) + 1
+    return offsets
+
+
+class _SuffixBlock:
+    """
+    Immutable suffix array over word starts of many normalized documents.
+
+    All normalized keys live in one newline-separated string and all labels
+    in one NUL-separated string, so a document costs a few array slots
+    instead of several Python objects. Entries are int offsets into the
+    key string, sorted by the text from that offset to the end of its key.
+    """
+
+    def __init__(self, docs: Iterable[Tuple[int, str, str]], keep: Callable[[int, str], bool]):
+        keys, labels = [], []
+        self.ids = array('q')
+        for doc_id, key, label in docs:
+            self.ids.append(doc_id)
+            keys.append(key)
+            labels.append(label)
+
+        self.text = '\n'.join(keys) + '\n'
+        self.labels = '\x00'.join(labels) + '\x00'
+        self.starts = array('l')
+        self.label_starts = array('l')
+
+        # Group entries by first character so only one bucket of sort keys
+        # is materialized at a time while building
+        buckets = {}
+        position = label_position = 0
+        for key, label in zip(keys, labels):
+            self.starts.append(position)
+            self.label_starts.append(label_position)
+            for offset in _word_starts(key, keep):
+                if offset < len(key):
+                    buckets.setdefault(key[offset], array('l')).append(position + offset)
+            position += len(key) + 1
+            label_position += len(label) + 1
+        del keys, labels
+
+        text = self.text
+        self.suffixes = array('l')
+        for first in sorted(buckets):
+            bucket = sorted(buckets.pop(first), key=lambda p: text[p:text.index('\n', p)])
+            self.suffixes.extend(bucket)
+
+    def __len__(self) -> int:
+        return len(self.suffixes)
+
+    def memory_bytes(self) -> int:
+        """Bytes held by the block's strings and arrays."""
+        return sum(sys.getsizeof(part) for part in (
+            self.text, self.labels, self.starts, self.label_starts, self.ids, self.suffixes
+        ))
+
+    def contains_key(self, key: str) -> bool:
+        """Check whether a document with exactly this key is present."""
+        return any(self.text[p:p + len(key) + 1] == key + '\n'
+                   and (p == 0 or self.text[p - 1] == '\n')
+                   for p in self._matching(key))
+
+    def _matching(self, prefix: str):
+        """Yield entry offsets whose suffix starts with prefix, in order."""
+        text, suffixes = self.text, self.suffixes
+        size = len(prefix)
+        i = bisect.bisect_left(suffixes, prefix, key=lambda p: text[p:p + size])
+        while i < len(suffixes) and text.startswith(prefix, suffixes[i]):
+            yield suffixes[i]
+            i += 1
+
+    def lookup(self, prefix: str, limit: int) -> List[Tuple[str, int, str]]:
+        """Get up to limit (sort key, doc id, label) matches for prefix."""
+        matches = []
+        seen = set()
+        for position in self._matching(prefix):
+            doc = bisect.bisect_right(self.starts, position) - 1
+            if doc in seen:
+                continue
+            seen.add(doc)
+            start = self.label_starts[doc]
+            label = self.labels[start:self.labels.index('\x00', start)]
+            sort_key = self.text[position:self.text.index('\n', position)]
+            matches.append((sort_key, self.ids[doc], label))
+            if len(matches) >= limit:
+                break
+        return matches
+
+
+class PrefixIndex:
+    """
+    Typeahead index over normalized titles and authors.
+
+    Titles are indexed from every word start (except stopwords), so "gats"
+    finds "The Great Gatsby"; authors are indexed the same way once per
+    distinct author. The bulk of the index is a compact suffix array built
+    at startup; books added afterwards go to a small sorted delta list that
+    is folded in on the next build().
+    """
+
+    def __init__(self, max_results: int = 10):
+        self.max_results = max_results
+        self._titles = _SuffixBlock((), _title_word)
+        self._authors = _SuffixBlock((), _author_word)
+        self._delta = []
+        self._delta_authors = set()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._titles) + len(self._authors) + len(self._delta)
+
+    def memory_bytes(self) -> int:
+        """Approximate bytes held by the index, including the delta list."""
+        delta = sys.getsizeof(self._delta) + sum(
+            sys.getsizeof(entry) + sys.getsizeof(entry[0]) + sys.getsizeof(entry[3])
+            for entry in self._delta
+        )
+        return self._titles.memory_bytes() + self._authors.memory_bytes() + delta
+
+    def build(self, books: Iterable[Dict]):
+        """Replace the index contents with entries for the given books."""
+        with self._lock:
+            titles = []
+            authors = {}
+            for book in books:
+                titles.append((book['id'], normalize_text(book['title']), book['title']))
+                authors.setdefault(normalize_text(book['author']), book['author'])
+            self._titles = _SuffixBlock(titles, _title_word)
+            del titles
+            self._authors = _SuffixBlock(((0, key, label) for key, label in authors.items() if key),
+                                         _author_word)
+            self._delta = []
+            self._delta_authors = set()
+
+    def add(self, book: Dict):
+        """Add a newly inserted book without rebuilding the index."""
+        with self._lock:
+            title_key = normalize_text(book['title'])
+            for offset in _word_starts(title_key, _title_word):
+                if offset < len(title_key):
+                    bisect.insort(self._delta, (title_key[offset:], 'title', book['id'], book['title']))
+
+            author_key = normalize_text(book['author'])
+            if author_key and author_key not in self._delta_authors \
+                    and not self._authors.contains_key(author_key):
+                self._delta_authors.add(author_key)
+                for offset in _word_starts(author_key, _author_word):
+                    bisect.insort(self._delta, (author_key[offset:], 'author', 0, book['author']))
+
+    def _delta_lookup(self, prefix: str, limit: int) -> List[Tuple[str, str, int, str]]:
+        i = bisect.bisect_left(self._delta, (prefix,))
+        matches = []
+        while i < len(self._delta) and len(matches) < limit:
+            entry = self._delta[i]
+            if not entry[0].startswith(prefix):
+                break
+            matches.append(entry)
+            i += 1
+        return matches
+
+    def suggest(self, query: str, limit: int = None) -> List[Dict]:
+        """
+        Get suggestions whose normalized text starts with the query.
+
+        Args:
+            query: Text typed so far
+            limit: Maximum number of suggestions (capped at max_results)
+
+        Returns:
+            list: Dicts with 'text', 'type' and, for titles, 'book_id'
+        """
+        prefix = normalize_text(query)
+        if not prefix:
+            return []
+        limit = min(limit or self.max_results, self.max_results)
+
+        candidates = [(key, 'title', doc_id, label)
+                      for key, doc_id, label in self._titles.lookup(prefix, limit)]
+        candidates += [(key, 'author', 0, label)
+                       for key, _, label in self._authors.lookup(prefix, limit)]
+        candidates += self._delta_lookup(prefix, limit)
+        candidates.sort()
+
+        suggestions = []
+        seen = set()
+        for _, kind, book_id, label in candidates:
+            identity = (kind, book_id if kind == 'title' else label)
+            if identity in seen:
+                continue
+            seen.add(identity)
+            if kind == 'title':
+                suggestions.append({'text': label, 'type': kind, 'book_id': book_id})
+            else:
+                suggestions.append({'text': label, 'type': kind})
+            if len(suggestions) >= limit:
+                break
+        return suggestions
+
+
+# Process-wide index, built at startup by init_search_indexes()
+suggest_index = PrefixIndex()
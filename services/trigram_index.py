@@ -0,0 +1,203 @@
+"""
+Trigram Index Module - Typo-tolerant fuzzy matching over titles and authors
+Backs the 'fuzzy' search type of search_books_in_catalog.
+"""
+
+import bisect
+import threading
+from array import array
+from collections import Counter
+from math import ceil
+from typing import Dict, Iterable, List, Set, Tuple
+
+from services.suggest_index import STOPWORDS, normalize_text
+
+
+def trigrams(word: str) -> Set[str]:
+    """
+    Get the set of trigrams of a normalized word, padded like pg_trgm.
+
+    "gatsby" -> {"  g", " ga", "gat", "ats", "tsb", "sby", "by "}
+    """
+    padded = f'  {word} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def edit_similarity(a: str, b: str) -> float:
+    """
+    Similarity from 0 to 1 based on optimal string alignment distance,
+    so a swap of two adjacent letters counts as a single edit.
+    """
+    if a == b:
+        return 1.0
+    previous2 = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        previous2, previous = previous, current
+    return 1.0 - previous[-1] / max(len(a), len(b))
+
+
+class TrigramIndex:
+    """
+    Fuzzy word index over book titles and authors.
+
+    Trigrams index the vocabulary of distinct words rather than every book,
+    and each word keeps a posting list of the books using it. A query word
+    is matched against the vocabulary first (trigram candidates, then edit
+    similarity), and only the books holding the best-matching words are
+    scored. The vocabulary grows far more slowly than the catalog, so
+    matching stays cheap as books are added, and scoring is capped at
+    max_candidates books per query.
+    """
+
+    def __init__(self, word_threshold: float = 0.6, threshold: float = 0.5,
+                 max_candidates: int = 5000):
+        self.word_threshold = word_threshold
+        self.threshold = threshold
+        self.max_candidates = max_candidates
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._vocabulary = {}
+        self._words = []
+        self._gram_postings = {}
+        self._word_postings = []
+        self._doc_words = array('l')
+        self._doc_offsets = array('l', [0])
+        self._doc_book_ids = array('q')
+
+    def __len__(self) -> int:
+        return len(self._doc_book_ids)
+
+    def _word_id(self, word: str) -> int:
+        word_id = self._vocabulary.get(word)
+        if word_id is None:
+            word_id = self._vocabulary[word] = len(self._words)
+            self._words.append(word)
+            self._word_postings.append(array('l'))
+            for gram in trigrams(word):
+                postings = self._gram_postings.get(gram)
+                if postings is None:
+                    postings = self._gram_postings[gram] = array('l')
+                postings.append(word_id)
+        return word_id
+
+    def _add_book(self, book: Dict):
+        doc = len(self._doc_book_ids)
+        words = dict.fromkeys(normalize_text(f"{book['title']} {book['author']}").split())
+        for word in words:
+            word_id = self._word_id(word)
+            self._word_postings[word_id].append(doc)
+            self._doc_words.append(word_id)
+        self._doc_offsets.append(len(self._doc_words))
+        self._doc_book_ids.append(book['id'])
+
+    def build(self, books: Iterable[Dict]):
+        """Replace the index contents with the given books."""
+        with self._lock:
+            self._reset()
+            for book in books:
+                self._add_book(book)
+
+    def add(self, book: Dict):
+        """Index a newly inserted book."""
+        with self._lock:
+            self._add_book(book)
+
+    def match_words(self, word: str) -> Dict[int, float]:
+        """
+        Find vocabulary words similar to a query word.
+
+        Returns:
+            dict: word id -> edit similarity, for words at or above word_threshold
+        """
+        grams = trigrams(word)
+        postings = self._gram_postings
+        # A close word shares at least `need` trigrams with the query, so it
+        # must contain one of the rarest len - need + 1 of them
+        need = max(1, ceil(len(grams) * self.word_threshold) - 2)
+        ranked = sorted(grams, key=lambda g: len(postings.get(g, ())))
+        probe, verify = ranked[:len(ranked) - need + 1], ranked[len(ranked) - need + 1:]
+
+        overlaps = Counter()
+        for gram in probe:
+            overlaps.update(postings.get(gram, ()))
+
+        matches = {}
+        for word_id, overlap in overlaps.items():
+            for gram in verify:
+                ids = postings.get(gram)
+                if ids:
+                    i = bisect.bisect_left(ids, word_id)
+                    if i < len(ids) and ids[i] == word_id:
+                        overlap += 1
+            if overlap < need:
+                continue
+            candidate = self._words[word_id]
+            if abs(len(candidate) - len(word)) > 2:
+                continue
+            similarity = edit_similarity(word, candidate)
+            if similarity >= self.word_threshold:
+                matches[word_id] = similarity
+        return matches
+
+    def search(self, query: str, limit: int = 50) -> List[Tuple[int, float]]:
+        """
+        Find books whose title and author words are similar to the query.
+
+        Args:
+            query: Possibly misspelled search text
+            limit: Maximum number of books to return
+
+        Returns:
+            list: (book_id, score) pairs, best match first. The score is the
+            mean, over the query words, of the best similarity of any word in
+            the book.
+        """
+        words = normalize_text(query).split()
+        words = [word for word in words if word not in STOPWORDS] or words
+        if not words:
+            return []
+
+        per_word = [self.match_words(word) for word in words]
+
+        # Drive candidate generation from the most selective query word
+        def postings_size(matches):
+            return sum(len(self._word_postings[word_id]) for word_id in matches) or float('inf')
+
+        driver = min(per_word, key=postings_size)
+        if not driver:
+            return []
+
+        # Words are visited best first, so a book's first hit is its best
+        candidates = {}
+        for word_id in sorted(driver, key=driver.get, reverse=True):
+            for doc in self._word_postings[word_id]:
+                candidates.setdefault(doc, driver[word_id])
+            if len(candidates) >= self.max_candidates:
+                break
+
+        others = [matches for matches in per_word if matches is not driver]
+        scored = []
+        for doc, total in candidates.items():
+            if others:
+                doc_words = self._doc_words[self._doc_offsets[doc]:self._doc_offsets[doc + 1]]
+                for matches in others:
+                    total += max((matches.get(word_id, 0.0) for word_id in doc_words), default=0.0)
+            score = total / len(per_word)
+            if score >= self.threshold:
+                scored.append((score, -doc))
+
+        scored.sort(reverse=True)
+        return [(self._doc_book_ids[-doc], round(score, 4)) for score, doc in scored[:limit]]
+
+
+# Process-wide index, built at startup by init_search_indexes()
+trigram_index = TrigramIndex()
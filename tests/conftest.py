@@ -0,0 +1,48 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+import database
+from app import create_app
+from services.search_cache import search_cache
+
+# Loans are dated from here; test modules' own NOW is taken after it, so
+# whole days between the two never come up one short
+NOW = datetime.now()
+
+
+@pytest.fixture
+def temp_db(tmp_path, monkeypatch):
+    """Point the data layer at a fresh, initialized database file."""
+    monkeypatch.setattr(database, "DATABASE", str(tmp_path / "library.db"))
+    database.init_database()
+    database.add_sample_data()
+    search_cache.clear()
+    return database.DATABASE
+
+
+@pytest.fixture
+def client(temp_db):
+    """Flask test client backed by the temporary database."""
+    app = create_app()
+    app.config["TESTING"] = True
+    return app.test_client()
+
+
+@pytest.fixture
+def lend(temp_db):
+    """
+    Factory that records a 14-day loan of a book's next free copy, due
+    days_overdue days ago (negative for due in the future). Loans given
+    returned_days_ago are closed then; open ones take the copy off the
+    shelf.
+    """
+    def lend(patron_id, book_id, days_overdue, returned_days_ago=None):
+        due = NOW - timedelta(days=days_overdue)
+        database.insert_borrow_record(patron_id, book_id, due - timedelta(days=14), due)
+        if returned_days_ago is None:
+            database.update_book_availability(book_id, -1)
+        else:
+            database.update_borrow_record_return_date(patron_id, book_id, NOW - timedelta(days=returned_days_ago))
+
+    return lend
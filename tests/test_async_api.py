@@ -0,0 +1,90 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from app import create_app
+from services import async_service
+
+
+@pytest.fixture
+def async_client(temp_db):
+    app = create_app({"ASYNC_API": True, "ASYNC_DB_WORKERS": 2})
+    app.config["TESTING"] = True
+    return app.test_client()
+
+
+def api_rules(app):
+    return {(rule.rule, tuple(sorted(rule.methods - {"HEAD", "OPTIONS"})))
+            for rule in app.url_map.iter_rules() if rule.endpoint.startswith("api.")}
+
+
+def test_async_api_serves_the_same_routes(temp_db):
+    assert api_rules(create_app({"ASYNC_API": True})) == api_rules(create_app())
+
+
+def test_async_views_match_sync_results(client, async_client):
+    for url in ("/api/search?q=gatsby", "/api/search?author=orwell", "/api/holds/book/3",
+                "/api/suggest?q=gr", "/api/overdue"):
+        sync, asynchronous = client.get(url), async_client.get(url)
+        assert asynchronous.status_code == sync.status_code
+        assert asynchronous.get_data() == sync.get_data()
+
+
+class SlowGateway:
+    async def process_payment(self, patron_id, amount, description=""):
+        await asyncio.sleep(0.2)
+        return True, f"txn_{patron_id}", f"Payment of ${amount:.2f} processed successfully"
+
+
+def test_payments_for_several_books_run_concurrently(async_client, mocker):
+    mocker.patch("services.library_service.calculate_late_fee_for_book",
+                 return_value={"fee_amount": 2.5, "days_overdue": 5, "status": "Overdue"})
+    mocker.patch("services.async_service.AsyncPaymentGateway", SlowGateway)
+
+    started = time.perf_counter()
+    response = async_client.post("/api/late_fees/pay", json={"patron_id": "123456", "book_ids": [1, 2, 3]})
+    elapsed = time.perf_counter() - started
+
+    assert [p["success"] for p in response.get_json()["payments"]] == [True, True, True]
+    assert elapsed < 0.5
+    assert async_client.post("/api/late_fees/pay", json={"patron_id": "123456"}).status_code == 400
+
+
+def test_refund_validation(async_client):
+    response = async_client.post("/api/late_fees/refund", json={"transaction_id": "bad", "amount": 5})
+    assert response.status_code == 400
+    assert response.get_json()["message"] == "Invalid transaction ID."
+
+
+def test_database_work_is_bounded(temp_db):
+    async_service.configure_db_executor(2)
+    running, peak = [0], [0]
+    lock = threading.Lock()
+
+    def work():
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        time.sleep(0.05)
+        with lock:
+            running[0] -= 1
+
+    async def burst():
+        await asyncio.gather(*(async_service.run_db(work) for _ in range(8)))
+
+    asyncio.run(burst())
+    assert peak[0] == 2
+
+
+def test_sync_payment_endpoint(client, mocker):
+    mocker.patch("services.library_service.calculate_late_fee_for_book",
+                 return_value={"fee_amount": 2.5, "days_overdue": 5, "status": "Overdue"})
+    gateway = mocker.patch("services.library_service.PaymentGateway").return_value
+    gateway.process_payment.return_value = (True, "txn_1", "ok")
+
+    response = client.post("/api/late_fees/pay", json={"patron_id": "123456", "book_id": 1})
+    assert response.get_json()["payments"] == [
+        {"book_id": 1, "success": True, "message": "Payment successful! ok", "transaction_id": "txn_1"}
+    ]
@@ -0,0 +1,109 @@
+import json
+import threading
+
+import pytest
+
+import database
+from services import availability_stream
+from services.availability_stream import AvailabilityBroadcaster
+from services.library_service import borrow_book_by_patron, return_book_by_patron
+
+
+@pytest.fixture(autouse=True)
+def fast_feed(monkeypatch):
+    monkeypatch.setattr(availability_stream, "POLL_INTERVAL", 0.01)
+    monkeypatch.setattr(availability_stream, "_broadcasters", {})
+
+
+def next_event(chunks):
+    """Next SSE event from a streamed response, skipping comments and retry."""
+    for chunk in chunks:
+        text = chunk.decode()
+        if text.startswith("id:"):
+            fields = dict(line.split(": ", 1) for line in text.strip().split("\n"))
+            return int(fields["id"]), fields["event"], json.loads(fields["data"])
+    return None
+
+
+def test_every_subscriber_sees_each_commit(temp_db):
+    broadcaster = AvailabilityBroadcaster()
+    subscriptions = [broadcaster.subscribe() for _ in range(200)]
+    received = [[] for _ in subscriptions]
+
+    def consume(subscription, batches):
+        while not batches or batches[-1][1] != [(1, 3)]:
+            batch = subscription.get(timeout=5)
+            assert batch is not None
+            batches.append(batch)
+
+    threads = [threading.Thread(target=consume, args=pair) for pair in zip(subscriptions, received)]
+    for thread in threads:
+        thread.start()
+    assert borrow_book_by_patron("111111", 1)[0]
+    assert return_book_by_patron("111111", 1)[0]
+    for thread in threads:
+        thread.join(timeout=10)
+
+    # Each consumer got the same batches, ending with the return
+    assert all(batches == received[0] for batches in received)
+    assert received[0][-1][1] == [(1, 3)]
+    assert broadcaster.stats()["dropped"] == 0
+    for subscription in subscriptions:
+        broadcaster.unsubscribe(subscription)
+
+
+def test_slow_subscriber_is_dropped(temp_db):
+    broadcaster = AvailabilityBroadcaster(buffer_size=2)
+    fast, slow = broadcaster.subscribe(), broadcaster.subscribe()
+
+    for patron in ("111111", "222222", "333333"):
+        assert borrow_book_by_patron(patron, 1)[0]
+        assert fast.get(timeout=5) is not None
+
+    assert slow.dropped and not fast.dropped
+    stats = broadcaster.stats()
+    assert (stats["subscribers"], stats["dropped"]) == (1, 1)
+    broadcaster.unsubscribe(fast)
+
+
+def test_subscriber_limit(client, monkeypatch):
+    broadcaster = AvailabilityBroadcaster(max_subscribers=1)
+    monkeypatch.setattr(availability_stream, "_broadcasters", {None: broadcaster})
+    subscription = broadcaster.subscribe()
+    assert broadcaster.subscribe() is None
+
+    response = client.get("/api/availability/stream")
+    assert response.status_code == 503
+    assert response.headers["Retry-After"]
+    broadcaster.unsubscribe(subscription)
+
+
+def test_stream_pushes_and_resumes(client):
+    response = client.get("/api/availability/stream", buffered=False)
+    assert response.mimetype == "text/event-stream"
+    chunks = iter(response.response)
+    assert next(chunks) == b"retry: 3000\n\n"
+
+    assert borrow_book_by_patron("111111", 1)[0]
+    event_id, event, data = next_event(chunks)
+    assert (event, data) == ("availability", [{"book_id": 1, "available_copies": 2}])
+    response.close()
+    assert availability_stream.get_availability_broadcaster().stats()["subscribers"] == 0
+
+    # Changes made while disconnected are replayed from the change log
+    assert borrow_book_by_patron("222222", 1)[0]
+    resumed = client.get("/api/availability/stream", buffered=False, headers={"Last-Event-ID": str(event_id)})
+    resumed_id, event, data = next_event(iter(resumed.response))
+    assert resumed_id > event_id
+    assert data == [{"book_id": 1, "available_copies": 1}]
+    resumed.close()
+
+
+def test_pruned_resume_asks_for_reload(client):
+    assert borrow_book_by_patron("111111", 1)[0]
+    database.prune_change_log("9999")
+    response = client.get("/api/availability/stream", buffered=False, headers={"Last-Event-ID": "1"})
+    assert next_event(iter(response.response))[1] == "reset"
+    response.close()
+
+    assert client.get("/api/availability/stream", headers={"Last-Event-ID": "x"}).status_code == 400
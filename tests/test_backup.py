@@ -0,0 +1,92 @@
+import gzip
+import os
+import shutil
+import sqlite3
+
+import database
+from app import create_app
+from services import backup
+from services.backup import backup_database
+from services.library_service import borrow_book_by_patron
+
+
+def count(path, table):
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def test_backup_copies_the_database(temp_db, tmp_path):
+    destination = str(tmp_path / "snapshot.db")
+    success, _, result = backup_database(destination)
+
+    assert success
+    assert result["integrity"] == "ok"
+    assert count(destination, "books") == 3
+    assert not any(name.endswith(".partial") for name in os.listdir(tmp_path))
+
+
+def test_compressed_backup(temp_db, tmp_path):
+    destination = str(tmp_path / "snapshot.db.gz")
+    success, _, result = backup_database(destination, compress=True)
+    assert success and result["compressed"]
+
+    restored = str(tmp_path / "restored.db")
+    with gzip.open(destination, "rb") as packed, open(restored, "wb") as raw:
+        shutil.copyfileobj(packed, raw)
+    assert count(restored, "borrow_records") == 1
+
+
+def test_snapshot_is_consistent_while_writes_continue(temp_db, tmp_path):
+    # Enough pages that the copy takes several steps
+    conn = database.get_db_connection()
+    conn.executemany(
+        "INSERT INTO books (title, author, isbn, total_copies, available_copies) VALUES (?, ?, ?, ?, ?)",
+        ((f"Title {n}", "Author", f"{n:013d}", 1, 1) for n in range(2000))
+    )
+    conn.commit()
+    conn.close()
+    steps = []
+
+    def borrow_between_steps(status, remaining, total):
+        steps.append(remaining)
+        assert borrow_book_by_patron(f"{100000 + len(steps)}", 1)[0] or len(steps) > 3
+
+    destination = str(tmp_path / "snapshot.db")
+    success, _, result = backup_database(destination, pages=2, sleep=0, progress=borrow_between_steps)
+
+    assert success and result["integrity"] == "ok"
+    assert len(steps) > 3
+    assert steps == sorted(steps, reverse=True)  # never restarted
+    # The snapshot is the state when the backup began
+    assert count(destination, "borrow_records") == 1
+    assert database.get_patron_borrow_count("100001") == 1
+
+
+def test_backup_rejects_bad_step_size(temp_db, tmp_path):
+    assert not backup_database(str(tmp_path / "snapshot.db"), pages=0)[0]
+
+
+def test_failed_backup_leaves_nothing_behind(temp_db, tmp_path, monkeypatch):
+    def disk_full(source, destination):
+        with open(destination, "wb") as packed:
+            packed.write(b"partly written")
+        raise OSError(28, "No space left on device")
+
+    monkeypatch.setattr(backup, "_compress", disk_full)
+    success, message, _ = backup_database(str(tmp_path / "snapshot.db.gz"), compress=True)
+    assert not success and "No space left on device" in message
+    assert not [name for name in os.listdir(tmp_path) if name.startswith("snapshot")]
+
+    # The source is released too: a write can still take the lock
+    assert borrow_book_by_patron("111111", 1)[0]
+
+
+def test_backup_command(temp_db, tmp_path):
+    directory = tmp_path / "backups"
+    result = create_app().test_cli_runner().invoke(args=["backup", "--gzip", "--dir", str(directory)])
+    assert result.exit_code == 0, result.output
+    (name,) = os.listdir(directory)
+    assert name.startswith("library-") and name.endswith(".db.gz")
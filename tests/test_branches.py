@@ -0,0 +1,127 @@
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+import database
+from app import create_app
+from services import federated_search as federated, write_queue
+from services.library_service import borrow_book_by_patron
+
+
+@pytest.fixture
+def branches(temp_db, tmp_path, monkeypatch):
+    monkeypatch.setattr(database, "BRANCH_DATABASES", {})
+    return {"main": temp_db, "north": str(tmp_path / "north.db"), "south": str(tmp_path / "south.db")}
+
+
+@pytest.fixture
+def branch_client(branches):
+    app = create_app({"LIBRARY_BRANCHES": branches, "DEFAULT_BRANCH": "main"})
+    app.config["TESTING"] = True
+    return app.test_client()
+
+
+def test_requests_read_the_selected_branch(branch_client):
+    with database.use_branch("north"):
+        database.insert_book("Branch Only", "Author", "1111111111111", 2, 2)
+
+    assert branch_client.get("/api/search?q=branch only&branch=north").get_json()["count"] == 1
+    assert branch_client.get("/api/search?q=branch only", headers={"X-Branch": "north"}).get_json()["count"] == 1
+    assert branch_client.get("/api/search?q=branch only").get_json()["count"] == 0
+    assert branch_client.get("/api/search?q=branch only&branch=east").status_code == 400
+
+
+@pytest.mark.parametrize("async_api", [False, True])
+def test_streamed_overdue_report_reads_the_selected_branch(branches, async_api):
+    due = datetime.now() - timedelta(days=10)
+    app = create_app({"LIBRARY_BRANCHES": branches, "DEFAULT_BRANCH": "main", "ASYNC_API": async_api})
+    with database.use_branch("north"):
+        database.insert_borrow_record("123456", 1, due - timedelta(days=14), due)
+    client = app.test_client()
+
+    def report_lines(*args, **kwargs):
+        return client.get(*args, **kwargs).get_data(as_text=True).splitlines()
+
+    assert len(report_lines("/api/overdue?branch=north")) == 1
+    assert len(report_lines("/api/overdue", headers={"X-Branch": "north"})) == 1
+    assert report_lines("/api/overdue") == []
+
+
+def test_writes_stay_in_their_branch(branches):
+    create_app({"LIBRARY_BRANCHES": branches, "DEFAULT_BRANCH": "main"})
+    writer = write_queue.start_group_commit(batch_size=8, linger=0.01)
+    try:
+        with database.use_branch("south"):
+            assert borrow_book_by_patron("123456", 1)[0]
+    finally:
+        write_queue.stop_group_commit()
+
+    with database.use_branch("south"):
+        assert database.get_book_by_id(1)["available_copies"] == 2
+    assert database.get_book_by_id(1)["available_copies"] == 3
+    assert writer.operations == 1
+
+
+def test_federated_search_merges_branches_by_isbn(branch_client):
+    with database.use_branch("north"):
+        database.update_book_availability(1, -3)
+
+    body = branch_client.get("/api/search/federated?q=gatsby").get_json()
+    assert body["count"] == 1
+    book = body["results"][0]
+    assert book["isbn"] == "9780743273565"
+    assert (book["total_copies"], book["available_copies"]) == (9, 6)
+    availability = {entry["branch"]: entry["available_copies"] for entry in book["branches"]}
+    assert availability == {"main": 3, "north": 0, "south": 3}
+    assert all(status["error"] is None for status in body["branches"].values())
+
+
+def test_federated_search_ranks_exact_then_prefix_matches(branches):
+    create_app({"LIBRARY_BRANCHES": branches, "DEFAULT_BRANCH": "main"})
+    with database.use_branch("south"):
+        database.insert_book("A History of 1984", "Author", "2222222222222", 1, 1)
+        database.insert_book("1984 Revisited", "Author", "3333333333333", 1, 1)
+
+    success, _, result = federated.federated_search("1984", "title")
+    assert success
+    assert [book["title"] for book in result["results"]] == ["1984", "1984 Revisited", "A History of 1984"]
+
+
+def test_federated_search_rejects_bad_requests(branch_client):
+    assert branch_client.get("/api/search/federated?q=gatsby&type=fuzzy").status_code == 400
+    assert branch_client.get("/api/search/federated?q=gatsby&branches=east").status_code == 400
+    assert branch_client.get("/api/search/federated").status_code == 400
+
+
+def test_branches_are_searched_in_parallel(branches, monkeypatch):
+    create_app({"LIBRARY_BRANCHES": branches, "DEFAULT_BRANCH": "main"})
+
+    def slow_search(search_term, search_type):
+        time.sleep(0.3)
+        return [], 0
+
+    monkeypatch.setattr(federated, "search_branch_catalog", slow_search)
+    started = time.perf_counter()
+    success, _, result = federated.federated_search("gatsby")
+    elapsed = time.perf_counter() - started
+
+    assert success and len(result["branches"]) == 3
+    assert elapsed < 0.6
+
+
+def test_slow_branch_is_reported_as_timed_out(branches, monkeypatch):
+    create_app({"LIBRARY_BRANCHES": branches, "DEFAULT_BRANCH": "main"})
+    real_search = federated.search_branch_catalog
+
+    def search(search_term, search_type):
+        if database.get_current_branch() == "north":
+            time.sleep(0.5)
+        return real_search(search_term, search_type)
+
+    monkeypatch.setattr(federated, "search_branch_catalog", search)
+    success, _, result = federated.federated_search("gatsby", timeout=0.2)
+
+    assert success
+    assert result["branches"]["north"]["error"] == "Timed out"
+    assert [entry["branch"] for entry in result["results"][0]["branches"]] == ["main", "south"]
@@ -0,0 +1,53 @@
+import os
+import subprocess
+import sys
+import textwrap
+
+import database
+from services.library_service import add_book_to_catalog, search_books_in_catalog
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def in_other_process(db_path, code):
+    """Run code against the same database file from a separate Python process."""
+    script = textwrap.dedent(f"""
+        import database
+        database.DATABASE = {db_path!r}
+    """) + textwrap.dedent(code)
+    subprocess.run([sys.executable, "-c", script], cwd=ROOT, check=True)
+
+
+def test_own_writes_are_not_treated_as_external(client):
+    assert not database.sync_external_writes()
+    assert add_book_to_catalog("Local Book", "Someone", "9990000000001", 1)[0]
+    assert not database.sync_external_writes()
+
+
+def test_other_process_write_invalidates_cached_search(client, temp_db):
+    first = client.get("/api/search?q=gatsby").get_json()["results"][0]
+    etag = client.get("/api/search?q=gatsby").headers["ETag"]
+    assert first["available_copies"] == 3
+
+    in_other_process(temp_db, """
+        from services.library_service import borrow_book_by_patron
+        assert borrow_book_by_patron("222222", 1)[0]
+    """)
+
+    response = client.get("/api/search?q=gatsby", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.get_json()["results"][0]["available_copies"] == 2
+    assert not database.sync_external_writes()
+
+
+def test_other_process_insert_rebuilds_search_indexes(client, temp_db):
+    assert client.get("/api/suggest?q=zephyr").get_json()["count"] == 0
+
+    in_other_process(temp_db, """
+        from services.library_service import add_book_to_catalog
+        assert add_book_to_catalog("Zephyr Winds", "Ada Quill", "9990000000002", 2)[0]
+    """)
+
+    suggestions = client.get("/api/suggest?q=zephyr").get_json()["suggestions"]
+    assert [s["text"] for s in suggestions] == ["Zephyr Winds"]
+    assert search_books_in_catalog("zephir windz", "fuzzy")[0]["title"] == "Zephyr Winds"
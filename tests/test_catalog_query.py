@@ -0,0 +1,92 @@
+import pytest
+
+import database
+from services.library_service import add_book_to_catalog, query_catalog
+
+
+@pytest.fixture
+def catalog(temp_db):
+    add_book_to_catalog("Tender Is the Night", "F. Scott Fitzgerald", "9780684801544", 1)
+    add_book_to_catalog("Animal Farm", "George Orwell", "9780451526342", 2)
+    add_book_to_catalog("100%_Pure", "Test Author", "9990000000001", 1)
+    return temp_db
+
+
+def titles(page):
+    return [book["title"] for book in page["results"]]
+
+
+def test_predicates_are_combined(catalog):
+    success, _, page = query_catalog(author="fitzgerald", title="night")
+    assert success
+    assert titles(page) == ["Tender Is the Night"]
+
+
+def test_available_only_excludes_borrowed_out_books(catalog):
+    _, _, page = query_catalog(author="orwell", available_only=True)
+    assert titles(page) == ["Animal Farm"]  # 1984 has no available copies
+
+
+def test_sort_order_and_paging(catalog):
+    _, _, page = query_catalog(sort="title", order="desc", limit=2, offset=1)
+    assert page["total"] == 6
+    assert titles(page) == ["The Great Gatsby", "Tender Is the Night"]
+
+    _, _, page = query_catalog(offset=10)
+    assert page == {"results": [], "total": 6}
+
+
+def test_like_wildcards_are_literal(catalog):
+    _, _, page = query_catalog(title="0%_")
+    assert titles(page) == ["100%_Pure"]
+    _, _, page = query_catalog(title="%")
+    assert titles(page) == ["100%_Pure"]
+
+
+def test_invalid_parameters_are_rejected(catalog):
+    assert not query_catalog(sort="isbn; DROP TABLE books")[0]
+    assert not query_catalog(order="sideways")[0]
+    assert not query_catalog(limit=0)[0]
+    assert not query_catalog(offset=-1)[0]
+    assert not query_catalog(offset=2 ** 64)[0]
+    assert query_catalog(offset=2 ** 63 - 1)[2] == {"results": [], "total": 6}
+
+
+def test_query_is_pushed_down_to_sql(catalog, mocker):
+    get_all_books = mocker.patch("database.get_all_books")
+    query_catalog(author="orwell")
+    get_all_books.assert_not_called()
+
+    conn = database.get_db_connection()
+    plan = conn.execute(
+        "EXPLAIN QUERY PLAN SELECT * FROM books WHERE available_copies > 0 "
+        "ORDER BY title COLLATE NOCASE LIMIT 5"
+    ).fetchall()
+    conn.close()
+    assert "idx_books_available_title" in " ".join(row["detail"] for row in plan)
+
+
+def test_api_structured_query(client, catalog):
+    response = client.get("/api/search?author=orwell&sort=title&order=desc&limit=1")
+    data = response.get_json()
+    assert response.status_code == 200
+    assert data["total"] == 2
+    assert [book["title"] for book in data["results"]] == ["Animal Farm"]
+    assert data["query"]["author"] == "orwell"
+
+
+def test_api_query_combines_q_with_filters(client, catalog):
+    data = client.get("/api/search?q=great&type=title&available_only=1").get_json()
+    assert [book["title"] for book in data["results"]] == ["The Great Gatsby"]
+
+
+def test_api_query_validation(client, catalog):
+    assert client.get("/api/search?sort=nope").status_code == 400
+    assert client.get("/api/search?limit=abc").status_code == 400
+    assert client.get("/api/search?title=a&offset=18446744073709551616").status_code == 400
+    assert client.get("/api/search?q=x&type=fuzzy&limit=5").status_code == 400
+
+
+def test_plain_search_still_works(client, catalog):
+    data = client.get("/api/search?q=orwell&type=author").get_json()
+    assert data["count"] == 2
@@ -0,0 +1,95 @@
+import pytest
+
+import database
+from app import create_app
+from services import catalog_replica as replica_module
+from services.catalog_replica import _TextColumn, catalog_replica
+from services.library_service import (
+    _scan_catalog, add_book_to_catalog, borrow_book_by_patron, list_catalog, search_books_in_catalog
+)
+
+
+@pytest.fixture
+def replica(temp_db):
+    app = create_app({"CATALOG_REPLICA": True})
+    app.config["TESTING"] = True
+    yield app.test_client()
+    catalog_replica.unload()
+
+
+def from_sqlite(term, search_type):
+    """What the search returns without the replica."""
+    books = database.get_all_books()
+    key = {"title": "title", "author": "author", "isbn": "isbn"}[search_type]
+    if search_type == "isbn":
+        return [book for book in books if book[key] == term]
+    return [book for book in books if term in book[key].lower()]
+
+
+def execute(sql, params=()):
+    conn = database.get_db_connection()
+    conn.execute(sql, params)
+    conn.commit()
+    conn.close()
+
+
+def test_replica_answers_like_sqlite(replica):
+    for n in range(20):
+        add_book_to_catalog(f"Replica Title {n:02d}", f"Author {n % 3}", f"{n:013d}", 2)
+
+    for term, search_type in (("replica", "title"), ("the", "title"), ("author 1", "author"),
+                              ("0000000000007", "isbn"), ("missing", "title")):
+        assert _scan_catalog(term, search_type) == from_sqlite(term, search_type)
+    assert list_catalog() == database.get_all_books()
+
+
+def test_empty_term_matches_like_sqlite(replica):
+    assert list(_TextColumn(["abc", "def"]).find_rows("")) == [0, 1]
+    add_book_to_catalog("Overlay Book", "Author", "1234567890123", 1)
+
+    assert search_books_in_catalog("  ", "title") == database.get_all_books()
+    assert _scan_catalog("", "author") == from_sqlite("", "author")
+    assert _scan_catalog("", "isbn") == []
+    # The replica is still usable afterwards
+    assert _scan_catalog("gatsby", "title") == from_sqlite("gatsby", "title")
+
+
+def test_replica_follows_writes(replica):
+    assert borrow_book_by_patron("111111", 1)[0]
+    add_book_to_catalog("Another Gatsby", "Someone", "1111111111111", 1)
+    execute("UPDATE books SET title = 'Mockingbird, Retitled' WHERE id = 2")
+    execute("DELETE FROM books WHERE id = 3")
+
+    assert _scan_catalog("gatsby", "title") == from_sqlite("gatsby", "title")
+    assert _scan_catalog("gatsby", "title")[1]["available_copies"] == 2
+    assert _scan_catalog("mockingbird", "title")[0]["title"] == "Mockingbird, Retitled"
+    assert _scan_catalog("orwell", "author") == []
+    assert list_catalog() == database.get_all_books()
+    assert catalog_replica.stats()["loads"] == 1
+
+
+def test_overlay_is_compacted(replica, monkeypatch):
+    monkeypatch.setattr(replica_module, "COMPACT_AFTER", 2)
+    for n in range(3):
+        add_book_to_catalog(f"Compacted {n}", "Author", f"{n:013d}", 1)
+
+    assert len(_scan_catalog("compacted", "title")) == 3
+    assert catalog_replica.stats()["overlay"] == 0
+    assert list_catalog() == database.get_all_books()
+
+
+def test_pruned_change_log_reloads(replica):
+    add_book_to_catalog("Before Prune", "Author", "1234567890123", 1)
+    database.prune_change_log("9999")
+
+    assert _scan_catalog("before prune", "title")[0]["isbn"] == "1234567890123"
+    assert catalog_replica.stats()["loads"] == 2
+
+
+def test_catalog_page_and_other_databases(replica, tmp_path, monkeypatch):
+    assert b"The Great Gatsby" in replica.get("/catalog").data
+
+    monkeypatch.setattr(database, "DATABASE", str(tmp_path / "other.db"))
+    database.init_database()
+    assert not catalog_replica.serves_current_database()
+    assert list_catalog() == []
@@ -0,0 +1,87 @@
+from datetime import datetime, timedelta
+
+import database
+from app import create_app
+from services.change_feed import read_changes
+from services.library_service import add_book_to_catalog, borrow_book_by_patron, return_book_by_patron
+
+
+def latest_cursor():
+    return database.get_change_log_bounds()[1]
+
+
+def test_sample_data_is_logged(temp_db):
+    success, _, page = read_changes(0, 100)
+    assert success
+    # Three books, the sample loan, and the availability update for 1984
+    assert [(c["table_name"], c["operation"]) for c in page["changes"]] == [
+        ("books", "insert"), ("books", "insert"), ("books", "insert"),
+        ("borrow_records", "insert"), ("books", "update")
+    ]
+    assert page["changes"][0]["data"]["title"] == "The Great Gatsby"
+
+
+def test_circulation_changes_are_logged_with_their_transaction(temp_db):
+    since = latest_cursor()
+    assert borrow_book_by_patron("111111", 1)[0]
+    assert return_book_by_patron("111111", 1)[0]
+    assert not borrow_book_by_patron("111111", 3)[0]  # no copies left
+
+    changes = read_changes(since)[2]["changes"]
+    assert [(c["table_name"], c["operation"]) for c in changes] == [
+        ("borrow_records", "insert"), ("books", "update"),
+        ("borrow_records", "update"), ("books", "update")
+    ]
+    assert changes[1]["data"]["available_copies"] == 2
+    assert changes[2]["data"]["return_date"] is not None
+
+
+def test_changes_api_pages_with_cursor(client):
+    since = latest_cursor()
+    for n in range(3):
+        add_book_to_catalog(f"Feed Book {n}", "Author", f"{n:013d}", 1)
+
+    first = client.get(f"/api/changes?since={since}&limit=2").get_json()
+    assert [c["data"]["title"] for c in first["changes"]] == ["Feed Book 0", "Feed Book 1"]
+    assert first["has_more"]
+
+    second = client.get(f"/api/changes?since={first['next']}&limit=2").get_json()
+    assert [c["data"]["title"] for c in second["changes"]] == ["Feed Book 2"]
+    assert not second["has_more"]
+
+    empty = client.get(f"/api/changes?since={second['next']}").get_json()
+    assert empty == {"changes": [], "next": second["next"], "has_more": False}
+
+    assert client.get("/api/changes?since=abc").status_code == 400
+    assert client.get("/api/changes?limit=0").status_code == 400
+
+
+def test_pruned_cursor_must_resync(client):
+    add_book_to_catalog("Feed Book", "Author", "1234567890123", 1)
+    result = create_app().test_cli_runner().invoke(args=["prune-change-log", "--older-than-days", "1"])
+    assert result.exit_code == 0
+    database.prune_change_log((datetime.now() + timedelta(days=1)).isoformat())
+
+    response = client.get("/api/changes?since=0")
+    assert response.status_code == 410
+    latest = response.get_json()["latest"]
+
+    assert client.get(f"/api/changes?since={latest}").get_json()["changes"] == []
+    add_book_to_catalog("After Prune", "Author", "1234567890124", 1)
+    assert client.get(f"/api/changes?since={latest}").get_json()["changes"][0]["row_id"] == 5
+
+
+def test_bounds_and_page_come_from_one_snapshot(temp_db, monkeypatch):
+    from services import change_feed
+
+    def bounds_then_prune(conn=None):
+        bounds = database.get_change_log_bounds(conn=conn)
+        database.prune_change_log((datetime.now() + timedelta(days=1)).isoformat())
+        return bounds
+
+    # A prune committed after the bounds check does not hide changes from the page
+    monkeypatch.setattr(change_feed, "get_change_log_bounds", bounds_then_prune)
+    success, _, page = read_changes(0, 100)
+    assert success
+    assert [c["id"] for c in page["changes"]] == [1, 2, 3, 4, 5]
+    assert read_changes(0)[1] == "Cursor expired"
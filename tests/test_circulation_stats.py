@@ -0,0 +1,83 @@
+from datetime import datetime, timedelta
+
+import database
+from app import create_app
+from services.circulation_stats import get_circulation_stats
+from services.library_service import borrow_book_by_patron, return_book_by_patron
+
+TODAY = datetime.now().strftime("%Y-%m-%d")
+
+
+def rollups():
+    conn = database.get_db_connection()
+    daily = [tuple(row) for row in conn.execute("SELECT * FROM daily_circulation ORDER BY day")]
+    books = [tuple(row) for row in conn.execute("SELECT * FROM book_circulation ORDER BY book_id")]
+    conn.close()
+    return daily, books, database.get_circulation_totals()
+
+
+def test_borrow_and_return_update_rollups(lend):
+    assert borrow_book_by_patron("111111", 1)[0]
+    assert borrow_book_by_patron("222222", 1)[0]
+    assert return_book_by_patron("111111", 1)[0]
+    lend("333333", 2, 3, returned_days_ago=0)  # returned late
+
+    success, _, stats = get_circulation_stats(days=30)
+    assert success
+    today = stats["daily"][-1]
+    assert (today["day"], today["loans"], today["returns"], today["late_returns"]) == (TODAY, 2, 2, 1)
+    assert stats["window"]["late_return_rate"] == 0.5
+    assert stats["top_books"][0]["book_id"] == 1
+    assert stats["top_books"][0]["loans"] == 2
+    # The sample loan, plus the three here
+    assert database.get_circulation_totals() == {"loans": 4, "returns": 2, "late_returns": 1}
+
+
+def test_failed_borrow_is_not_counted(temp_db):
+    before = rollups()
+    assert not borrow_book_by_patron("111111", 3)[0]  # 1984 has no copies left
+    assert rollups() == before
+
+
+def test_backfill_matches_incremental_rollups(lend):
+    assert borrow_book_by_patron("111111", 1)[0]
+    assert return_book_by_patron("111111", 1)[0]
+    lend("222222", 2, 5, returned_days_ago=0)
+    incremental = rollups()
+
+    # A database upgraded from before the rollups existed has history but no rollups
+    conn = database.get_db_connection()
+    conn.execute("DELETE FROM daily_circulation")
+    conn.execute("DELETE FROM book_circulation")
+    conn.execute("UPDATE circulation_totals SET loans = 0, returns = 0, late_returns = 0")
+    conn.commit()
+    conn.close()
+
+    result = create_app().test_cli_runner().invoke(args=["backfill-circulation-stats"])
+    assert result.exit_code == 0
+    assert "books" in result.output
+    assert rollups() == incremental
+
+
+def test_totals_row_added_to_older_databases(temp_db):
+    assert borrow_book_by_patron("111111", 1)[0]
+    expected = database.get_circulation_totals()
+    conn = database.get_db_connection()
+    conn.execute("DROP TABLE circulation_totals")
+    conn.commit()
+    conn.close()
+
+    database.init_database()
+    assert database.get_circulation_totals() == expected
+    assert borrow_book_by_patron("222222", 1)[0]
+    assert database.get_circulation_totals()["loans"] == expected["loans"] + 1
+
+
+def test_stats_api(client):
+    body = client.get("/api/stats?days=7&top=2").get_json()
+    assert len(body["top_books"]) <= 2
+    assert body["window"]["since"] == (datetime.now() - timedelta(days=6)).strftime("%Y-%m-%d")
+    assert body["overdue_now"] == 0
+
+    assert client.get("/api/stats?days=0").status_code == 400
+    assert client.get("/api/stats?top=abc").status_code == 400
@@ -0,0 +1,78 @@
+import gzip
+import zlib
+
+import pytest
+
+from app import create_app
+from routes.compression import compressed_cache
+from services.library_service import borrow_book_by_patron
+
+GZIP = {"Accept-Encoding": "gzip, deflate"}
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    compressed_cache.clear()
+
+
+def test_catalog_is_gzipped_when_accepted(client):
+    plain = client.get("/catalog")
+    assert "Content-Encoding" not in plain.headers
+    assert "Accept-Encoding" in plain.vary
+
+    compressed = client.get("/catalog", headers=GZIP)
+    assert compressed.headers["Content-Encoding"] == "gzip"
+    assert gzip.decompress(compressed.get_data()) == plain.get_data()
+    assert len(compressed.get_data()) < len(plain.get_data())
+    assert compressed.get_etag()[0] == plain.get_etag()[0] + "-gzip"
+
+    refused = client.get("/catalog", headers={"Accept-Encoding": "gzip;q=0, identity"})
+    assert "Content-Encoding" not in refused.headers
+
+
+def test_small_responses_are_left_alone(client):
+    response = client.get("/api/search/cache", headers=GZIP)
+    assert "Content-Encoding" not in response.headers
+    # Pages outside the catalog, search and API are never compressed
+    assert "Content-Encoding" not in client.get("/add_book", headers=GZIP).headers
+
+
+def test_cached_gzip_responses_are_reused(client):
+    first = client.get("/catalog", headers=GZIP)
+    assert compressed_cache.stats()["entries"] == 1
+
+    again = client.get("/catalog", headers=GZIP)
+    assert again.get_data() == first.get_data()
+    assert compressed_cache.stats()["hits"] == 1
+    assert client.get("/catalog", headers={**GZIP, "If-None-Match": first.get_etag()[0]}).status_code == 304
+
+    # A borrow changes the catalog; the cached body is not served for it
+    assert borrow_book_by_patron("111111", 1)[0]
+    changed = client.get("/catalog", headers={**GZIP, "If-None-Match": first.get_etag()[0]})
+    assert changed.status_code == 200
+    assert changed.get_data() != first.get_data()
+
+
+def test_streamed_responses_are_compressed_per_chunk(client):
+    for patron in ("111111", "222222"):
+        assert borrow_book_by_patron(patron, 1)[0]
+    response = client.get("/api/search?q=the&type=title", headers=GZIP, buffered=False)
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert "Content-Length" not in response.headers
+
+    # Each part decodes as soon as it arrives
+    decoder = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    parts = [decoder.decompress(chunk) for chunk in response.response]
+    assert parts[0].startswith(b'{"count":')
+    assert b"".join(parts).endswith(b"]}\n")
+    response.close()
+
+
+def test_event_streams_and_disabled_compression(temp_db):
+    client = create_app({"GZIP_RESPONSES": False}).test_client()
+    response = client.get("/catalog", headers=GZIP)
+    assert "Content-Encoding" not in response.headers
+
+    stream = create_app().test_client().get("/api/availability/stream", headers=GZIP, buffered=False)
+    assert "Content-Encoding" not in stream.headers
+    stream.close()
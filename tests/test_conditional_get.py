@@ -0,0 +1,57 @@
+from services.library_service import add_book_to_catalog, borrow_book_by_patron, return_book_by_patron
+
+
+def test_catalog_returns_strong_etag(client):
+    response = client.get("/catalog")
+    assert response.status_code == 200
+    etag, weak = response.get_etag()
+    assert etag and not weak
+
+
+def test_catalog_not_modified_when_unchanged(client):
+    etag = client.get("/catalog").get_etag()[0]
+    response = client.get("/catalog", headers={"If-None-Match": f'"{etag}"'})
+    assert response.status_code == 304
+    assert response.data == b""
+    assert response.get_etag()[0] == etag
+
+
+def test_not_modified_skips_database(client, mocker):
+    etag = client.get("/catalog").get_etag()[0]
+    get_all_books = mocker.patch("routes.catalog_routes.get_all_books")
+    response = client.get("/catalog", headers={"If-None-Match": f'"{etag}"'})
+    assert response.status_code == 304
+    get_all_books.assert_not_called()
+
+
+def test_etag_changes_after_catalog_writes(client):
+    first = client.get("/catalog").get_etag()[0]
+    add_book_to_catalog("Dune", "Frank Herbert", "9780441172719", 2)
+    second = client.get("/catalog").get_etag()[0]
+    assert second != first
+
+    borrow_book_by_patron("222222", 1)
+    third = client.get("/catalog").get_etag()[0]
+    assert third != second
+
+    return_book_by_patron("222222", 1)
+    response = client.get("/catalog", headers={"If-None-Match": f'"{third}"'})
+    assert response.status_code == 200
+
+
+def test_search_etag_depends_on_query(client):
+    title = client.get("/search?q=gatsby&type=title").get_etag()[0]
+    author = client.get("/search?q=gatsby&type=author").get_etag()[0]
+    assert title != author
+
+    response = client.get("/api/search?q=gatsby", headers={"If-None-Match": f'"{title}"'})
+    assert response.status_code == 200
+    api_etag = response.get_etag()[0]
+    response = client.get("/api/search?q=gatsby", headers={"If-None-Match": f'"{api_etag}"'})
+    assert response.status_code == 304
+
+
+def test_error_responses_carry_no_etag(client):
+    response = client.get("/api/search")
+    assert response.status_code == 400
+    assert response.get_etag() == (None, None)
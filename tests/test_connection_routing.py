@@ -0,0 +1,63 @@
+import sqlite3
+import threading
+
+import pytest
+
+import database
+
+
+def test_read_connections_are_read_only_and_pooled(temp_db):
+    conn = database.get_read_connection()
+    with pytest.raises(sqlite3.OperationalError):
+        conn.execute("UPDATE books SET available_copies = 0")
+    conn.close()
+    assert database.get_read_connection() is conn
+    conn.close()
+
+
+def test_failed_reads_hand_their_connection_back(temp_db):
+    for _ in range(database.READ_POOL_SIZE + 1):
+        with pytest.raises(OverflowError):
+            database.query_books(title="a", offset=2 ** 64)
+    assert database.get_book_by_id(1)["available_copies"] == 3
+
+    pool = database.ReadConnectionPool(database.get_database_path(), size=1, timeout=0.05)
+    conn = pool.acquire()
+    with pytest.raises(sqlite3.OperationalError):
+        pool.acquire()
+    conn.close()
+    assert pool.acquire() is conn
+    pool.release(conn)
+    pool.close()
+
+
+def test_reads_do_not_wait_for_an_open_write(temp_db):
+    with database.transaction() as conn:
+        database.update_book_availability(1, -1, conn=conn)
+        # The uncommitted change is invisible to readers, who are not blocked
+        assert database.get_book_by_id(1)["available_copies"] == 3
+    assert database.get_book_by_id(1)["available_copies"] == 2
+
+
+def test_writers_share_one_connection_in_turn(temp_db):
+    acquired = []
+
+    def write():
+        conn = database.get_write_connection()
+        acquired.append(conn)
+        conn.close()
+
+    first = database.get_write_connection()
+    thread = threading.Thread(target=write)
+    thread.start()
+    thread.join(0.2)
+    assert not acquired
+    first.close()
+    thread.join()
+    assert acquired == [first]
+
+
+def test_failed_write_is_rolled_back_and_releases_writer(temp_db):
+    assert not database.insert_book("Dup", "Author", "9780743273565", 1, 1)
+    assert database.insert_book("New", "Author", "9990000000001", 1, 1)
+    assert database.get_book_by_isbn("9990000000001")["title"] == "New"
@@ -0,0 +1,111 @@
+import sqlite3
+
+import database
+from app import create_app
+from services.library_service import (
+    add_book_to_catalog, borrow_book_by_patron, place_hold, return_book_by_barcode, return_book_by_patron
+)
+
+GATSBY = "9780743273565"
+
+
+def on_loan(book_id):
+    return {copy["barcode"]: copy["patron_id"] for copy in database.get_book_copies(book_id) if copy["on_loan"]}
+
+
+def test_books_get_barcoded_copies(temp_db):
+    assert [copy["barcode"] for copy in database.get_book_copies(1)] == [f"{GATSBY}-1", f"{GATSBY}-2", f"{GATSBY}-3"]
+    # The sample loan of 1984 holds its only copy
+    assert on_loan(3) == {"9780451524935-1": "123456"}
+
+    assert add_book_to_catalog("Dune", "Frank Herbert", "9780441172719", 2)[0]
+    assert len(database.get_book_copies(4)) == 2
+
+
+def test_scan_to_return(temp_db):
+    assert borrow_book_by_patron("111111", 1)[0]
+    assert borrow_book_by_patron("222222", 1)[0]
+    assert on_loan(1) == {f"{GATSBY}-1": "111111", f"{GATSBY}-2": "222222"}
+
+    success, message = return_book_by_barcode(f"{GATSBY}-2")
+    assert success and "successfully returned" in message
+    assert on_loan(1) == {f"{GATSBY}-1": "111111"}
+    assert database.get_book_by_id(1)["available_copies"] == 2
+    assert database.get_patron_borrow_count("222222") == 0
+
+    assert return_book_by_barcode(f"{GATSBY}-2") == (False, "No open loan found for this barcode.")
+    assert return_book_by_barcode("  ") == (False, "Barcode is required.")
+
+    # Returning by patron and book frees the copy too
+    assert return_book_by_patron("111111", 1)[0]
+    assert on_loan(1) == {}
+
+
+def test_return_needs_the_patrons_open_loan(temp_db):
+    # 123456 has 1984 out, not Gatsby
+    for _ in range(2):
+        assert return_book_by_patron("123456", 1) == (False, "No open loan found for this patron and book.")
+    assert database.get_book_by_id(1)["available_copies"] == 3
+
+    assert return_book_by_patron("123456", 3)[0]
+    assert return_book_by_patron("123456", 3) == (False, "No open loan found for this patron and book.")
+    assert database.get_book_by_id(3)["available_copies"] == 1
+
+
+def test_scanned_copy_goes_to_hold_queue(temp_db):
+    assert place_hold("222222", 3)[0]
+    success, message = return_book_by_barcode("9780451524935-1")
+    assert success and "hold queue" in message
+    assert on_loan(3) == {"9780451524935-1": "222222"}
+    assert database.get_book_by_id(3)["available_copies"] == 0
+
+
+def test_scan_lookup_is_indexed(temp_db):
+    conn = database.get_db_connection()
+    plan = " ".join(row["detail"] for row in conn.execute(
+        "EXPLAIN QUERY PLAN SELECT br.id FROM copies c "
+        "JOIN borrow_records br ON br.copy_id = c.id AND br.return_date IS NULL WHERE c.barcode = ?", ("x",)))
+    conn.close()
+    assert "sqlite_autoindex_copies" in plan
+    assert "idx_borrow_records_open_copy" in plan
+
+
+def test_databases_without_copies_are_migrated(tmp_path, monkeypatch):
+    path = str(tmp_path / "legacy.db")
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE books (id INTEGER PRIMARY KEY AUTOINCREMENT, title TEXT NOT NULL, author TEXT NOT NULL,
+                            isbn TEXT UNIQUE NOT NULL, total_copies INTEGER NOT NULL,
+                            available_copies INTEGER NOT NULL);
+        CREATE TABLE borrow_records (id INTEGER PRIMARY KEY AUTOINCREMENT, patron_id TEXT NOT NULL,
+                                     book_id INTEGER NOT NULL, borrow_date TEXT NOT NULL,
+                                     due_date TEXT NOT NULL, return_date TEXT);
+        INSERT INTO books (title, author, isbn, total_copies, available_copies)
+            VALUES ('Old Book', 'Author', '1111111111111', 2, 1);
+        INSERT INTO borrow_records (patron_id, book_id, borrow_date, due_date)
+            VALUES ('333333', 1, '2024-01-01T00:00:00', '2024-01-15T00:00:00');
+    """)
+    conn.close()
+
+    monkeypatch.setattr(database, "DATABASE", path)
+    database.init_database()
+    assert on_loan(1) == {"1111111111111-1": "333333"}
+    assert return_book_by_barcode("1111111111111-1")[0]
+    assert database.get_book_by_id(1)["available_copies"] == 2
+
+
+def test_scan_api_and_backfill_command(client):
+    conn = database.get_db_connection()
+    conn.execute("INSERT INTO books (title, author, isbn, total_copies, available_copies) "
+                 "VALUES ('Bulk', 'Loaded', '2222222222222', 2, 2)")
+    conn.commit()
+    conn.close()
+    result = create_app().test_cli_runner().invoke(args=["backfill-copies"])
+    assert "Created 2 copies." in result.output
+    assert client.get("/api/books/4/copies").get_json()["count"] == 2
+
+    assert borrow_book_by_patron("111111", 4)[0]
+    response = client.post("/api/returns/scan", json={"barcode": "2222222222222-1"})
+    assert response.status_code == 200
+    assert client.post("/api/returns/scan", json={"barcode": "2222222222222-1"}).status_code == 404
+    assert client.post("/api/returns/scan", json={}).status_code == 400
@@ -0,0 +1,123 @@
+from datetime import datetime, timedelta
+from unittest.mock import Mock
+
+import database
+from app import create_app
+from services.fee_ledger import accrue_overdue_fees
+from services.library_service import (
+    borrow_book_by_patron, get_patron_status_report, pay_late_fees, refund_late_fee_payment, return_book_by_patron
+)
+from services.payment_service import PaymentGateway
+
+NOW = datetime.now()
+
+
+def balance(patron_id):
+    return database.get_patron_balance(patron_id) / 100
+
+
+def test_return_posts_the_final_fee(lend):
+    lend("111111", 1, 6)  # $3.00
+    assert return_book_by_patron("111111", 1)[0]
+
+    assert balance("111111") == 3.0
+    [entry] = database.get_fee_ledger("111111")
+    assert (entry["entry_type"], entry["amount_cents"]) == ("accrual", 300)
+
+
+def test_nightly_accrual_posts_only_growth(lend):
+    lend("111111", 1, 6)
+    lend("222222", 2, -4)  # not overdue yet
+
+    success, _, result = accrue_overdue_fees(NOW)
+    assert success and result == {"loans": 1, "entries": 1, "amount": 3.0}
+    assert accrue_overdue_fees(NOW)[2]["entries"] == 0
+    assert accrue_overdue_fees(NOW + timedelta(days=2))[2]["amount"] == 1.5
+
+    # The return adds nothing the nightly job has already posted
+    assert return_book_by_patron("111111", 1)[0]
+    assert balance("111111") == 4.5
+    assert balance("222222") == 0
+
+
+def test_payments_and_refunds_are_posted(mocker, lend):
+    lend("111111", 1, 6)
+    accrue_overdue_fees(NOW)
+    mocker.patch("services.library_service.calculate_late_fee_for_book",
+                 return_value={"fee_amount": 3.0, "days_overdue": 6, "status": "Overdue"})
+    gateway = Mock(spec=PaymentGateway)
+    gateway.process_payment.return_value = (True, "txn_111111_1", "Paid")
+    gateway.refund_payment.return_value = (True, "Refunded")
+
+    assert pay_late_fees("111111", 1, gateway)[0]
+    assert balance("111111") == 0
+    assert refund_late_fee_payment("txn_111111_1", 3.0, gateway)[0]
+    assert balance("111111") == 3.0
+
+    entries = database.get_fee_ledger("111111")
+    assert [(e["entry_type"], e["amount_cents"]) for e in entries] == [
+        ("refund", 300), ("payment", -300), ("accrual", 300)
+    ]
+    assert len({e["loan_id"] for e in entries}) == 1
+
+
+def test_unposted_money_is_reported(mocker, caplog, lend):
+    lend("111111", 1, 6)
+    gateway = Mock(spec=PaymentGateway)
+    gateway.process_payment.return_value = (True, "txn_111111_1", "Paid")
+    gateway.refund_payment.return_value = (True, "Refunded")
+
+    # Charged, but the ledger write fails
+    mocker.patch("services.library_service.insert_fee_entries", return_value=False)
+    success, message, transaction_id = pay_late_fees("111111", 1, gateway)
+    assert success and transaction_id == "txn_111111_1"
+    assert "could not be applied to your balance" in message
+    assert "txn_111111_1 of $3.00 by patron 111111 for book 1 was charged but not posted" in caplog.text
+    mocker.stopall()
+
+    # Refunded, but there is no payment to reverse
+    success, message = refund_late_fee_payment("txn_999999_1", 3.0, gateway)
+    assert success and "needs reconciling" in message
+    assert "No payment recorded for this transaction." in caplog.text
+    assert database.get_fee_ledger("111111") == []
+
+
+def test_fees_on_a_returned_loan_can_be_paid(lend):
+    lend("111111", 1, 46)  # capped at $15
+    assert return_book_by_patron("111111", 1)[0]
+    assert balance("111111") == 15.0
+    assert not borrow_book_by_patron("111111", 2)[0]
+
+    gateway = Mock(spec=PaymentGateway)
+    gateway.process_payment.return_value = (True, "txn_111111_1", "Paid")
+    assert pay_late_fees("111111", 1, gateway)[0]
+    assert gateway.process_payment.call_args.kwargs["amount"] == 15.0
+    assert balance("111111") == 0
+    assert pay_late_fees("111111", 1, gateway)[1] == "No late fees to pay for this book."
+
+    assert borrow_book_by_patron("111111", 2)[0]
+
+
+def test_borrowing_blocked_over_threshold(client, lend):
+    lend("111111", 1, 50)
+    lend("111111", 2, 50)
+    accrue_overdue_fees(NOW)
+
+    success, message = borrow_book_by_patron("111111", 1)
+    assert not success and "$30.00 in late fees" in message
+    assert get_patron_status_report("111111")["outstanding_fees"] == 30.0
+
+    fees = client.get("/api/patrons/111111/fees").get_json()
+    assert (fees["balance"], fees["borrowing_blocked"]) == (30.0, True)
+    assert len(fees["entries"]) == 2
+    assert client.get("/api/patrons/abc/fees").status_code == 400
+
+
+def test_status_report_includes_unposted_fees(lend):
+    lend("111111", 1, 6)
+    accrue_overdue_fees(NOW - timedelta(days=2))  # posted $2.00 two days ago
+    assert get_patron_status_report("111111")["outstanding_fees"] == 3.0
+
+    result = create_app().test_cli_runner().invoke(args=["accrue-late-fees"])
+    assert "posted 1 accruals totalling $1.00" in result.output
+    assert balance("111111") == 3.0
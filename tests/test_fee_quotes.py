@@ -0,0 +1,62 @@
+from datetime import datetime, timedelta
+from unittest.mock import Mock
+
+import database
+from services.library_service import calculate_late_fee_for_book, get_patron_late_fee_quotes, pay_late_fees
+from services.payment_service import PaymentGateway
+
+NOW = datetime.now()
+
+
+def test_quote_prices_the_open_loan(lend):
+    lend("111111", 1, 6)
+
+    quote = calculate_late_fee_for_book("111111", 1)
+    assert (quote["fee_amount"], quote["amount_due"], quote["days_overdue"]) == (3.0, 3.0, 6)
+    assert quote["status"] == "Overdue" and quote["title"] == "The Great Gatsby"
+
+    assert calculate_late_fee_for_book("111111", 2) == {"fee_amount": 0.0, "days_overdue": 0, "status": "No loan"}
+    # A borrow date given explicitly is still priced as before
+    assert calculate_late_fee_for_book("111111", 1, NOW - timedelta(days=16))["fee_amount"] == 1.0
+
+
+def test_payment_charges_only_what_is_due(lend):
+    lend("111111", 1, 6)
+    gateway = Mock(spec=PaymentGateway)
+    gateway.process_payment.return_value = (True, "txn_111111_1", "Paid")
+
+    assert pay_late_fees("111111", 1, gateway)[0]
+    assert gateway.process_payment.call_args.kwargs["amount"] == 3.0
+    assert calculate_late_fee_for_book("111111", 1)["amount_due"] == 0
+
+    success, message, _ = pay_late_fees("111111", 1, gateway)
+    assert not success and message == "No late fees to pay for this book."
+    assert gateway.process_payment.call_count == 1
+
+
+def test_patron_wide_quote(client, lend):
+    lend("111111", 1, 6)
+    lend("111111", 2, 50)  # capped at $15
+    lend("111111", 3, -9)
+    lend("222222", 1, 50)
+
+    success, _, quote = get_patron_late_fee_quotes("111111")
+    assert success
+    assert [loan["book_id"] for loan in quote["loans"]] == [2, 1, 3]
+    assert (quote["total_fees"], quote["total_due"]) == (18.0, 18.0)
+
+    response = client.get("/api/late_fees/111111")
+    assert response.get_json()["total_due"] == 18.0
+    assert client.get("/api/late_fees/abc").status_code == 400
+    assert client.get("/api/late_fee/111111/1").get_json()["fee_amount"] == 3.0
+    assert client.get("/api/late_fee/333333/1").status_code == 404
+
+
+def test_quote_lookups_are_indexed(temp_db):
+    conn = database.get_db_connection()
+    for book_filter, params in (("AND br.book_id = ?", ("x", 1)), ("", ("x",))):
+        sql = database.OPEN_LOANS_WITH_PAYMENTS_SQL.format(book_filter=book_filter)
+        plan = " ".join(row["detail"] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params))
+        assert "idx_borrow_records_open_patron" in plan
+        assert "idx_fee_ledger_loan" in plan
+    conn.close()
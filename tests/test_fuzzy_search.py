@@ -0,0 +1,71 @@
+from services.library_service import add_book_to_catalog, search_books_in_catalog
+from services.trigram_index import TrigramIndex, edit_similarity, trigrams
+
+
+BOOKS = [
+    {"id": 1, "title": "The Great Gatsby", "author": "F. Scott Fitzgerald"},
+    {"id": 2, "title": "Great Expectations", "author": "Charles Dickens"},
+    {"id": 3, "title": "1984", "author": "George Orwell"},
+]
+
+
+def build_index():
+    index = TrigramIndex()
+    index.build(BOOKS)
+    return index
+
+
+def test_trigrams_are_padded():
+    assert trigrams("gatsby") == {"  g", " ga", "gat", "ats", "tsb", "sby", "by "}
+
+
+def test_edit_similarity_counts_transpositions_once():
+    assert edit_similarity("gatbsy", "gatsby") == 1 - 1 / 6
+    assert edit_similarity("orwell", "orwell") == 1.0
+    assert edit_similarity("abc", "xyz") == 0.0
+
+
+def test_transposed_letters_still_match():
+    assert [book_id for book_id, _ in build_index().search("Gatbsy")] == [1]
+
+
+def test_misspelled_author_matches():
+    assert build_index().search("Orwel")[0][0] == 3
+    assert build_index().search("dikens")[0][0] == 2
+
+
+def test_best_match_ranks_first():
+    results = build_index().search("great gatsbi")
+    assert [book_id for book_id, _ in results] == [1]
+    results = build_index().search("great")
+    assert [book_id for book_id, _ in results] == [1, 2]
+
+
+def test_query_can_span_title_and_author():
+    assert build_index().search("gatsby fitzgerlad")[0] == (1, 0.95)
+
+
+def test_unrelated_query_finds_nothing():
+    assert build_index().search("zzzz qqqq") == []
+    assert build_index().search("") == []
+
+
+def test_added_books_are_searchable():
+    index = build_index()
+    index.add({"id": 4, "title": "Moby Dick", "author": "Herman Melville"})
+    assert index.search("Mobby")[0][0] == 4
+
+
+def test_fuzzy_search_type(temp_db):
+    from services.library_service import init_search_indexes
+    init_search_indexes()
+    results = search_books_in_catalog("Gatbsy", "fuzzy")
+    assert [book["title"] for book in results] == ["The Great Gatsby"]
+    assert results[0]["available_copies"] == 3
+
+
+def test_fuzzy_search_endpoints(client):
+    add_book_to_catalog("Moby Dick", "Herman Melville", "9781503280786", 1)
+    data = client.get("/api/search?q=Mobby%20Dik&type=fuzzy").get_json()
+    assert data["results"][0]["title"] == "Moby Dick"
+    assert b"The Great Gatsby" in client.get("/search?q=gatbsy&type=fuzzy").data
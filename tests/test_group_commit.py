@@ -0,0 +1,73 @@
+import threading
+import time
+
+import pytest
+
+import database
+from services import write_queue
+from services.library_service import borrow_book_by_patron, return_book_by_patron
+
+
+@pytest.fixture
+def group_commit(temp_db):
+    writer = write_queue.start_group_commit(batch_size=16, linger=0.05)
+    yield writer
+    write_queue.stop_group_commit()
+
+
+def test_concurrent_borrows_share_batches(group_commit):
+    results = {}
+    running, release = threading.Event(), threading.Event()
+
+    def hold_writer(conn):
+        running.set()
+        release.wait(5)
+        return True, "held"
+
+    def borrow(patron_id):
+        results[patron_id] = borrow_book_by_patron(patron_id, 1)
+
+    # Keep the writer busy until all five borrows are queued behind it
+    held = group_commit.submit(hold_writer)
+    assert running.wait(5)
+    threads = [threading.Thread(target=borrow, args=(f"{100000 + n}",)) for n in range(5)]
+    for thread in threads:
+        thread.start()
+    while group_commit._queue.qsize() < 5:
+        time.sleep(0.001)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    # Book 1 has 3 copies: each caller gets its own answer
+    assert held.result() == (True, "held")
+    assert sorted(success for success, _ in results.values()) == [False, False, True, True, True]
+    assert database.get_book_by_id(1)["available_copies"] == 0
+    assert (group_commit.operations, group_commit.batches) == (6, 2)
+
+
+def test_failed_operation_only_rolls_back_itself(group_commit):
+    def insert_then_fail(conn):
+        database.insert_borrow_record("222222", 2, *[database.datetime.now()] * 2, conn=conn)
+        return False, "failed"
+
+    def boom(conn):
+        database.update_book_availability(2, -1, conn=conn)
+        raise RuntimeError("boom")
+
+    failing = group_commit.submit(insert_then_fail)
+    raising = group_commit.submit(boom)
+    assert borrow_book_by_patron("111111", 2)[0]
+
+    assert failing.result() == (False, "failed")
+    with pytest.raises(RuntimeError):
+        raising.result()
+    assert [b["book_id"] for b in database.get_patron_borrowed_books("222222")] == []
+    assert database.get_book_by_id(2)["available_copies"] == 1
+    assert return_book_by_patron("111111", 2)[0]
+
+
+def test_without_group_commit_each_call_commits(temp_db):
+    assert write_queue._group_commit_writer is None
+    assert borrow_book_by_patron("111111", 1)[0]
+    assert database.get_book_by_id(1)["available_copies"] == 2
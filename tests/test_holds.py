@@ -0,0 +1,110 @@
+import database
+from services.library_service import (
+    borrow_book_by_patron, cancel_hold, place_hold, return_book_by_patron
+)
+
+# Sample data: book 3 ("1984") has its only copy lent to patron 123456
+
+
+def test_place_hold_on_unavailable_book(temp_db):
+    success, message, hold = place_hold("111111", 3)
+    assert success
+    assert "number 1" in message
+    assert hold["queue_position"] == 1
+
+
+def test_cannot_hold_available_book_or_hold_twice(temp_db):
+    assert not place_hold("111111", 1)[0]
+    assert place_hold("111111", 3)[0]
+    success, message, _ = place_hold("111111", 3)
+    assert not success
+    assert "already" in message
+
+
+def test_queue_is_fifo(temp_db):
+    place_hold("111111", 3)
+    place_hold("222222", 3)
+    _, _, third = place_hold("333333", 3)
+    assert third["queue_position"] == 3
+    assert [h["patron_id"] for h in database.get_hold_queue(3)] == ["111111", "222222", "333333"]
+
+
+def test_cancel_hold_moves_queue_up(temp_db):
+    _, _, first = place_hold("111111", 3)
+    place_hold("222222", 3)
+    assert not cancel_hold("999999", first["id"])[0]
+    assert cancel_hold("111111", first["id"])[0]
+    assert not cancel_hold("111111", first["id"])[0]
+    assert database.get_patron_holds("222222")[0]["queue_position"] == 1
+
+
+def test_return_allocates_copy_to_head_of_queue(temp_db):
+    place_hold("111111", 3)
+    place_hold("222222", 3)
+
+    success, message = return_book_by_patron("123456", 3)
+    assert success
+    assert "hold queue" in message
+
+    assert database.get_book_by_id(3)["available_copies"] == 0
+    assert [b["book_id"] for b in database.get_patron_borrowed_books("111111")] == [3]
+    assert [h["patron_id"] for h in database.get_hold_queue(3)] == ["222222"]
+    assert database.get_patron_holds("222222")[0]["queue_position"] == 1
+
+
+def test_return_skips_patrons_at_borrowing_limit(temp_db):
+    for n in range(5):
+        database.insert_book(f"Filler {n}", "Author", f"99900000000{n:02d}", 1, 1)
+        borrow_book_by_patron("111111", 4 + n)
+    place_hold("111111", 3)
+    place_hold("222222", 3)
+
+    return_book_by_patron("123456", 3)
+    assert [b["book_id"] for b in database.get_patron_borrowed_books("222222")] == [3]
+    assert [h["patron_id"] for h in database.get_hold_queue(3)] == ["111111"]
+
+
+def test_return_without_holds_restores_availability(temp_db):
+    return_book_by_patron("123456", 3)
+    assert database.get_book_by_id(3)["available_copies"] == 1
+
+
+def test_failed_allocation_rolls_back_return(temp_db, mocker):
+    place_hold("111111", 3)
+    mocker.patch("services.library_service.close_hold", return_value=False)
+    success, _ = return_book_by_patron("123456", 3)
+    assert not success
+    assert database.get_patron_borrow_count("123456") == 1
+    assert database.get_book_by_id(3)["available_copies"] == 0
+    assert len(database.get_hold_queue(3)) == 1
+
+
+def test_hold_queue_uses_index(temp_db):
+    conn = database.get_db_connection()
+    plan = conn.execute(
+        "EXPLAIN QUERY PLAN SELECT * FROM holds WHERE book_id = 3 AND status = 'active' "
+        "ORDER BY position LIMIT 1"
+    ).fetchall()
+    assert "idx_holds_active_queue" in " ".join(row["detail"] for row in plan)
+
+    # Listings number each queue in one pass, with no per-hold count
+    patron_books = "SELECT book_id FROM holds WHERE patron_id = ? AND status = 'active'"
+    plan = " ".join(row["detail"] for row in conn.execute(
+        "EXPLAIN QUERY PLAN " + database.HOLD_QUEUE_SQL.format(books=patron_books), ("111111",)))
+    conn.close()
+    assert "idx_holds_active_patron" in plan and "idx_holds_active_queue" in plan
+    assert "CORRELATED" not in plan
+
+
+def test_holds_api(client):
+    response = client.post("/api/holds", json={"patron_id": "111111", "book_id": 3})
+    assert response.status_code == 201
+    hold_id = response.get_json()["hold"]["id"]
+
+    assert client.post("/api/holds", json={"patron_id": "111111", "book_id": 99}).status_code == 404
+    assert client.get("/api/holds/book/3").get_json()["count"] == 1
+    assert client.get("/api/holds/patron/111111").get_json()["holds"][0]["title"] == "1984"
+
+    assert client.delete(f"/api/holds/{hold_id}?patron_id=111111").status_code == 200
+    assert client.delete(f"/api/holds/{hold_id}?patron_id=111111").status_code == 404
+    assert client.get("/api/holds/book/3").get_json()["count"] == 0
@@ -0,0 +1,83 @@
+import json
+import sqlite3
+from dataclasses import dataclass
+from datetime import date, datetime
+
+import pytest
+
+import database
+from app import create_app
+from services.library_service import rebuild_search_indexes
+
+
+@dataclass
+class Loan:
+    book_id: int
+    due_date: date
+
+
+def payload():
+    conn = sqlite3.connect(":memory:")
+    conn.row_factory = sqlite3.Row
+    row = conn.execute("SELECT 1 AS id, 'Dune' AS title").fetchone()
+    conn.close()
+    return {"borrowed": datetime(2024, 1, 2, 3, 4, 5, 6), "row": row, "loan": Loan(7, date(2024, 1, 16)),
+            "text": "Les Misérables", "values": [1.5, None, True]}
+
+
+@pytest.mark.parametrize("fast", [True, False])
+def test_both_encoders_agree(temp_db, fast):
+    if fast:
+        pytest.importorskip("orjson")
+    app = create_app({"FAST_JSON": fast})
+    assert app.json.use_orjson is fast
+    with app.app_context():
+        body = app.json.response(payload()).get_data()
+        assert app.json.loads(body) == {
+            "borrowed": "2024-01-02T03:04:05.000006",
+            "loan": {"book_id": 7, "due_date": "2024-01-16"},
+            "row": {"id": 1, "title": "Dune"},
+            "text": "Les Misérables",
+            "values": [1.5, None, True]
+        }
+        assert "Les Misérables".encode() in body
+        assert json.loads(app.json.dumps(payload())) == json.loads(body)
+
+
+@pytest.mark.parametrize("count", [0, 1, 1000, 2500])
+def test_streamed_arrays(temp_db, count):
+    app = create_app()
+    items = [{"id": n, "added": date(2024, 1, 1)} for n in range(count)]
+    with app.app_context():
+        response = app.json.stream_response({"count": count, "results": iter(items)}, "results")
+        chunks = list(response.response)
+    assert len(chunks) == -(-count // 1000) + 4
+    assert json.loads(b"".join(chunks)) == {"count": count, "results": [{"id": n, "added": "2024-01-01"}
+                                                                         for n in range(count)]}
+
+
+def test_search_is_streamed(client):
+    conn = database.get_db_connection()
+    conn.executemany("INSERT INTO books (title, author, isbn, total_copies, available_copies) VALUES (?, ?, ?, ?, ?)",
+                     ((f"Stream Book {n}", "Author", f"{n:013d}", 1, 1) for n in range(1500)))
+    conn.commit()
+    conn.close()
+    database.bump_catalog_generation()
+    rebuild_search_indexes()
+
+    response = client.get("/api/search?q=stream&type=title")
+    assert response.is_streamed
+    assert response.get_json()["count"] == 1500
+    assert len(response.get_json()["results"]) == 1500
+
+
+@pytest.mark.parametrize("fast", [True, False])
+def test_malformed_json_is_a_bad_request(temp_db, fast):
+    if fast:
+        pytest.importorskip("orjson")
+    app = create_app({"FAST_JSON": fast})
+    with app.app_context():
+        with pytest.raises(ValueError):
+            app.json.loads("{")
+    response = app.test_client().post("/api/returns/scan", data="{", content_type="application/json")
+    assert response.status_code == 400
@@ -0,0 +1,70 @@
+from datetime import datetime, timedelta
+
+import database
+from app import create_app
+from services.library_service import get_patron_status_report
+from services.loan_archive import archive_old_loans
+
+NOW = datetime.now()
+
+
+def test_archive_moves_only_old_returned_loans(lend):
+    for n in range(5):
+        lend(f"1000{n:02d}", 1, 406, returned_days_ago=400)
+    lend("222222", 2, 6, returned_days_ago=10)
+    lend("333333", 2, 486)  # never returned
+
+    result = archive_old_loans(older_than_days=365, batch_size=2)
+
+    assert (result["archived"], result["batches"]) == (5, 3)
+    # The sample data's open loan, the recent return and the unreturned loan stay live
+    assert (result["live"], result["archive"]) == (3, 5)
+    assert database.get_patron_borrow_count("333333") == 1
+    assert archive_old_loans(older_than_days=365)["archived"] == 0
+
+
+def test_patron_report_spans_live_and_archived_loans(lend):
+    lend("444444", 1, 406, returned_days_ago=400)
+    lend("444444", 2, 16, returned_days_ago=5)
+    archive_old_loans(older_than_days=365)
+    lend("444444", 1, 6)
+
+    report = get_patron_status_report("444444")
+
+    assert report["total_borrowed"] == 1
+    assert report["borrowed_books"][0]["status"] == "Overdue"
+    assert report["outstanding_fees"] == 3.0
+    history = report["borrowing_history"]
+    assert [loan["book_id"] for loan in history] == [2, 1]
+    assert history[1]["returned_date"] == (NOW - timedelta(days=400)).strftime("%Y-%m-%d")
+
+
+def test_patron_report_for_unknown_or_invalid_patron(temp_db):
+    for patron_id in ("999999", {"John": {"fees_due": 0}}):
+        report = get_patron_status_report(patron_id)
+        assert report["borrowed_books"] == [] and report["borrowing_history"] == []
+        assert report["total_borrowed"] == 0
+        assert isinstance(report["outstanding_fees"], float)
+
+
+def test_rollup_backfill_includes_archived_loans(lend):
+    lend("555555", 1, 406, returned_days_ago=400)
+    lend("555555", 2, 16, returned_days_ago=5)
+    conn = database.get_db_connection()
+    before = [tuple(row) for row in conn.execute("SELECT * FROM book_circulation ORDER BY book_id")]
+    conn.close()
+
+    archive_old_loans(older_than_days=365)
+    database.rebuild_circulation_rollups()
+
+    conn = database.get_db_connection()
+    after = [tuple(row) for row in conn.execute("SELECT * FROM book_circulation ORDER BY book_id")]
+    conn.close()
+    assert after == before
+
+
+def test_archive_loans_command(lend):
+    lend("666666", 1, 406, returned_days_ago=400)
+    result = create_app().test_cli_runner().invoke(args=["archive-loans", "--older-than-days", "365"])
+    assert result.exit_code == 0
+    assert "Archived 1 loans" in result.output
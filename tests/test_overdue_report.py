@@ -0,0 +1,50 @@
+import csv
+import io
+import json
+
+from app import create_app
+from services.overdue_report import generate_overdue_report, min_days_for_fee
+
+
+def test_report_lists_overdue_loans_longest_first(lend):
+    lend("111111", 1, 3)
+    lend("222222", 2, 20)
+    rows = list(generate_overdue_report(batch_size=1))
+    assert [(r["patron_id"], r["days_overdue"], r["fee_amount"]) for r in rows] == [
+        ("222222", 20, 15.0), ("111111", 3, 1.5)
+    ]
+    assert rows[0]["title"] == "To Kill a Mockingbird"
+
+
+def test_report_filters(lend):
+    lend("111111", 1, 3)
+    lend("222222", 2, 10)
+    assert [r["days_overdue"] for r in generate_overdue_report(min_days_overdue=5)] == [10]
+    assert [r["days_overdue"] for r in generate_overdue_report(min_fee=2.0)] == [10]
+    assert list(generate_overdue_report(min_fee=15.5)) == []
+    assert min_days_for_fee(0) == 1
+    assert min_days_for_fee(4.5) == 8
+
+
+def test_overdue_api_streams_ndjson_and_csv(client, lend):
+    lend("111111", 1, 3)
+    response = client.get("/api/overdue")
+    assert response.mimetype == "application/x-ndjson"
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert [line["book_id"] for line in lines] == [1]
+
+    response = client.get("/api/overdue?format=csv&min_days=2")
+    assert response.mimetype == "text/csv"
+    rows = list(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+    assert rows[0]["fee_amount"] == "1.5"
+
+    assert client.get("/api/overdue?format=xml").status_code == 400
+    assert client.get("/api/overdue?min_days=abc").status_code == 400
+
+
+def test_overdue_report_command(lend):
+    lend("111111", 1, 3)
+    result = create_app().test_cli_runner().invoke(args=["overdue-report", "--format", "csv"])
+    assert result.exit_code == 0
+    assert result.output.splitlines()[0].startswith("record_id,patron_id")
+    assert len(result.output.splitlines()) == 2
@@ -19,8 +19,8 @@ from services.library_service import (
 
 # ---------- pay_late_fees TESTS ----------
 
-def test_pay_late_fees_success(mocker):
-    """Successful payment with valid patron, book, and late fee"""
+def test_pay_late_fees_success(mocker, temp_db):
+    """Successful payment with valid patron, book, and late fee (posted to a temporary ledger)"""
     mocker.patch("services.library_service.calculate_late_fee_for_book",
                  return_value={"fee_amount": 5.0})
     mocker.patch("services.library_service.get_book_by_id",
@@ -105,8 +105,8 @@ def test_pay_late_fees_network_error(mocker):
 
 # ---------- refund_late_fee_payment TESTS ----------
 
-def test_refund_success():
-    """Successful refund"""
+def test_refund_success(temp_db):
+    """Successful refund (posted to a temporary ledger)"""
     mock_gateway = Mock(spec=PaymentGateway)
     mock_gateway.refund_payment.return_value = (True, "Refund successful")
 
@@ -249,10 +249,10 @@ def test_return_book_not_found(mocker):
 
 def test_return_book_no_borrow_record(mocker):
     mocker.patch("services.library_service.get_book_by_id", return_value={"title": "Mock"})
-    mocker.patch("services.library_service.get_patron_borrow_count", return_value=0)
+    mocker.patch("services.library_service.get_latest_loan", return_value=None)
     success, msg = return_book_by_patron("123456", 1)
     assert not success
-    assert "No record found" in msg
+    assert "No open loan" in msg
 
 
 
@@ -289,6 +289,7 @@ def test_add_book_to_catalog_db_error(mocker):
 def test_borrow_book_db_error(mocker):
     mocker.patch("services.library_service.get_book_by_id", return_value={"available_copies": 5, "title": "Mock"})
     mocker.patch("services.library_service.get_patron_borrow_count", return_value=0)
+    mocker.patch("services.library_service.get_patron_balance", return_value=0)
     mocker.patch("services.library_service.insert_borrow_record", return_value=False)
     success, msg = borrow_book_by_patron("123456", 1)
     assert not success
@@ -298,7 +299,8 @@ def test_borrow_book_db_error(mocker):
 
 def test_return_book_db_error(mocker):
     mocker.patch("services.library_service.get_book_by_id", return_value={"title": "Mock"})
-    mocker.patch("services.library_service.get_patron_borrow_count", return_value=1)
+    mocker.patch("services.library_service.get_latest_loan", return_value={"id": 1, "return_date": None})
+    mocker.patch("services.library_service.close_borrow_record", return_value=True)
     mocker.patch("services.library_service.update_book_availability", return_value=False)
     success, msg = return_book_by_patron("123456", 1)
     assert not success
@@ -0,0 +1,80 @@
+import threading
+
+from app import create_app
+from routes.rate_limit import TokenBucketLimiter, WriteAdmission
+
+
+def test_token_bucket_refills_at_its_rate():
+    limiter = TokenBucketLimiter(rate=2.0, burst=3)
+    assert [limiter.take("a", now=0) for _ in range(3)] == [0, 0, 0]
+    assert limiter.take("a", now=0) == 0.5
+    assert limiter.take("b", now=0) == 0
+    assert limiter.take("a", now=0.5) == 0
+    assert limiter.limited == 1
+
+
+def test_buckets_expire_and_stay_bounded():
+    limiter = TokenBucketLimiter(rate=1.0, burst=5, max_buckets=1000)
+    for n in range(10000):
+        limiter.take(n, now=n / 100)
+    # Only buckets used in the last burst / rate seconds are kept
+    assert len(limiter) == 500
+
+    crowded = TokenBucketLimiter(rate=1.0, burst=5, max_buckets=1000)
+    for n in range(5000):
+        crowded.take(n, now=0)
+    assert len(crowded) == 1000
+
+
+def test_patron_and_client_limits(temp_db):
+    client = create_app({"RATE_LIMIT_PATRON_BURST": 2, "RATE_LIMIT_PATRON_PER_SECOND": 0.01,
+                         "RATE_LIMIT_IP_BURST": 5}).test_client()
+    assert client.get("/api/late_fee/123456/3").status_code == 200
+    assert client.get("/api/late_fee/123456/3").status_code == 200
+    limited = client.get("/api/late_fee/123456/3")
+    assert limited.status_code == 429
+    assert int(limited.headers["Retry-After"]) == 100
+
+    # Another patron from the same address has a bucket of their own
+    assert client.post("/borrow", data={"patron_id": "222222", "book_id": "1"}).status_code == 302
+    assert client.post("/api/returns/scan", json={"patron_id": "222222", "barcode": "x"}).status_code == 404
+    # ...until the address runs out
+    assert client.get("/api/late_fee/333333/3").status_code == 429
+    assert client.get("/api/late_fee/333333/3", environ_base={"REMOTE_ADDR": "10.0.0.2"}).status_code == 404
+    # Catalog and search are not rate limited
+    assert all(client.get("/api/search?q=the").status_code == 200 for _ in range(10))
+
+
+def test_write_queue_admits_then_sheds():
+    admission = WriteAdmission(max_concurrent=1, max_queued=1, timeout=5)
+    assert admission.acquire()
+    waiter = threading.Thread(target=lambda: admission.acquire() and admission.release())
+    waiter.start()
+    while admission.stats()["queued"] == 0:
+        pass
+    assert not admission.acquire()  # the queue is full
+    admission.release()
+    waiter.join(timeout=5)
+    assert admission.stats() == {"active": 0, "queued": 0, "shed": 1}
+
+    impatient = WriteAdmission(max_concurrent=1, max_queued=1, timeout=0.01)
+    assert impatient.acquire()
+    assert not impatient.acquire()  # waited, and gave up
+    assert impatient.stats() == {"active": 1, "queued": 0, "shed": 1}
+
+
+def test_writes_over_the_cap_get_503(temp_db):
+    app = create_app({"MAX_CONCURRENT_WRITES": 1, "WRITE_QUEUE_SIZE": 1, "WRITE_QUEUE_TIMEOUT_MS": 10})
+    client = app.test_client()
+    admission = app.extensions["write_admission"]
+    assert admission.acquire()
+
+    response = client.post("/api/returns/scan", json={"barcode": "x"})
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+    # Reads do not need a write slot
+    assert client.get("/api/late_fee/123456/3").status_code == 200
+
+    admission.release()
+    assert client.post("/api/returns/scan", json={"barcode": "x"}).status_code == 404
+    assert admission.stats() == {"active": 0, "queued": 0, "shed": 1}
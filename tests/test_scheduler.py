@@ -0,0 +1,63 @@
+from datetime import datetime, timedelta
+
+import database
+from services.scheduler import DueDateScheduler, OVERDUE, REMINDER
+
+# Sample data: patron 123456 has book 3 out, due in 9 days
+
+NOW = datetime.now()
+
+
+def make_scheduler(events, **kwargs):
+    return DueDateScheduler(handler=lambda event, loans: events.append(
+        (event, [loan['book_id'] for loan in loans])), **kwargs)
+
+
+def test_fires_reminder_then_overdue(temp_db):
+    events = []
+    scheduler = make_scheduler(events, reminder_days=2)
+
+    assert scheduler.run_pending(NOW) == {}
+    assert scheduler.next_fire_time() < NOW + timedelta(days=7, minutes=1)
+
+    scheduler.run_pending(NOW + timedelta(days=8))
+    assert events == [(REMINDER, [3])]
+
+    scheduler.run_pending(NOW + timedelta(days=10))
+    assert events == [(REMINDER, [3]), (OVERDUE, [3])]
+    assert scheduler.run_pending(NOW + timedelta(days=30)) == {}
+
+
+def test_events_fire_in_batches_across_load_batches(lend):
+    for n in range(7):
+        lend("111111", 1, 1 + n)
+    events = []
+    scheduler = make_scheduler(events, batch_size=2)
+
+    assert scheduler.run_pending(NOW) == {OVERDUE: 7}
+    assert events == [(OVERDUE, [1] * 7)]
+
+
+def test_skips_returned_loans_and_stale_reminders(lend):
+    lend("111111", 1, 3)
+    events = []
+    scheduler = make_scheduler(events)
+    scheduler.next_fire_time()
+    database.update_borrow_record_return_date("123456", 3, NOW)
+
+    scheduler.run_pending(NOW + timedelta(days=30))
+    assert events == [(OVERDUE, [1])]
+
+
+def test_restart_resumes_from_watermark(lend):
+    events = []
+    make_scheduler(events).run_pending(NOW + timedelta(days=8))
+    assert events == [(REMINDER, [3])]
+
+    restarted = make_scheduler(events)
+    restarted.run_pending(NOW + timedelta(days=10))
+    assert events == [(REMINDER, [3]), (OVERDUE, [3])]
+
+    lend("111111", 1, -20)
+    assert make_scheduler(events).run_pending(NOW + timedelta(days=19)) == {REMINDER: 1}
+    assert events[-1] == (REMINDER, [1])
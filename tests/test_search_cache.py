@@ -0,0 +1,81 @@
+from services.library_service import (
+    SEARCH_PAGE_SIZE, add_book_to_catalog, borrow_book_by_patron, search_books_in_catalog
+)
+from services.search_cache import SearchResultCache, normalize_search_term, search_cache
+
+
+def test_normalize_search_term():
+    assert normalize_search_term("  The   GREAT gatsby ") == "the great gatsby"
+
+
+def test_lru_evicts_least_recently_used():
+    cache = SearchResultCache(max_entries=2)
+    cache.put("a", [{"id": 1}], 0)
+    cache.put("b", [{"id": 2}], 0)
+    assert cache.get("a", 0) == [{"id": 1}]
+    cache.put("c", [{"id": 3}], 0)
+    assert cache.get("b", 0) is None
+    assert cache.get("a", 0) is not None
+    assert cache.stats()["evictions"] == 1
+
+
+def test_byte_budget_is_enforced():
+    big = [{"title": "x" * 1000}]
+    cache = SearchResultCache(max_bytes=2000)
+    cache.put("a", big, 0)
+    cache.put("b", big, 0)
+    assert cache.stats()["entries"] == 1
+    assert cache.stats()["bytes"] <= 2000
+
+
+def test_new_version_drops_all_entries():
+    cache = SearchResultCache()
+    cache.put("a", [], 1)
+    cache.put("a", [{"id": 1}], 0)  # computed at a stale version, ignored
+    assert cache.get("a", 1) == []
+    assert cache.get("a", 2) is None
+    assert cache.stats()["invalidations"] == 1
+
+
+def test_results_are_copied_in_and_out():
+    cache = SearchResultCache()
+    results = [{"id": 1, "available_copies": 2}]
+    cache.put("a", results, 0)
+    results[0]["available_copies"] = 0
+    hit = cache.get("a", 0)
+    hit[0]["available_copies"] = 1
+    hit.append({"id": 2})
+    assert cache.get("a", 0) == [{"id": 1, "available_copies": 2}]
+
+
+def test_repeated_search_is_served_from_cache(temp_db, mocker):
+    first = search_books_in_catalog("Gatsby", "title")
+    spy = mocker.patch("services.library_service.get_all_books")
+    second = search_books_in_catalog("  gatsby ", "title")
+    spy.assert_not_called()
+    assert second == first
+    assert search_cache.stats()["hits"] == 1
+
+
+def test_writes_invalidate_cached_results(temp_db):
+    before = search_books_in_catalog("gatsby", "title")[0]["available_copies"]
+    borrow_book_by_patron("222222", 1)
+    after = search_books_in_catalog("gatsby", "title")[0]["available_copies"]
+    assert after == before - 1
+
+
+def test_pages_are_cached_separately(temp_db):
+    for n in range(SEARCH_PAGE_SIZE + 5):
+        add_book_to_catalog(f"Volume {n}", "Serial Author", f"{9990000000000 + n}", 1)
+    assert len(search_books_in_catalog("volume", "title", 1)) == SEARCH_PAGE_SIZE
+    assert len(search_books_in_catalog("volume", "title", 2)) == 5
+    assert len(search_books_in_catalog("volume", "title")) == SEARCH_PAGE_SIZE + 5
+
+
+def test_web_and_api_share_the_cache(client):
+    client.get("/search?q=orwell&type=author")
+    response = client.get("/api/search?q=ORWELL&type=author")
+    assert response.get_json()["count"] == 1
+    stats = client.get("/api/search/cache").get_json()
+    assert stats["hits"] == 1
+    assert stats["hit_rate"] == 0.5
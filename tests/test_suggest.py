@@ -0,0 +1,72 @@
+from services.library_service import add_book_to_catalog
+from services.suggest_index import PrefixIndex, normalize_text
+
+
+BOOKS = [
+    {"id": 1, "title": "The Great Gatsby", "author": "F. Scott Fitzgerald"},
+    {"id": 2, "title": "Great Expectations", "author": "Charles Dickens"},
+    {"id": 3, "title": "A Tale of Two Cities", "author": "Charles Dickens"},
+]
+
+
+def build_index(**kwargs):
+    index = PrefixIndex(**kwargs)
+    index.build(BOOKS)
+    return index
+
+
+def test_normalize_text():
+    assert normalize_text("  Café, Society! ") == "cafe society"
+
+
+def test_prefix_matches_title_start_and_inner_words():
+    index = build_index()
+    assert [s["book_id"] for s in index.suggest("the gr")] == [1]
+    titles = {s["text"] for s in index.suggest("great") if s["type"] == "title"}
+    assert titles == {"The Great Gatsby", "Great Expectations"}
+    assert index.suggest("gats")[0]["text"] == "The Great Gatsby"
+
+
+def test_stopwords_are_not_indexed_on_their_own():
+    index = build_index()
+    assert index.suggest("of two") == []
+    assert index.suggest("tale")[0]["book_id"] == 3
+
+
+def test_authors_are_suggested_once():
+    index = build_index()
+    authors = [s for s in index.suggest("dick") if s["type"] == "author"]
+    assert authors == [{"text": "Charles Dickens", "type": "author"}]
+    assert index.suggest("fitzg")[0]["text"] == "F. Scott Fitzgerald"
+
+
+def test_result_count_is_bounded():
+    index = PrefixIndex(max_results=2)
+    index.build({"id": n, "title": f"Volume {n}", "author": "Anon"} for n in range(20))
+    assert len(index.suggest("vol")) == 2
+    assert len(index.suggest("vol", limit=50)) == 2
+    assert len(index.suggest("vol", limit=1)) == 1
+
+
+def test_add_keeps_index_sorted():
+    index = build_index()
+    index.add({"id": 4, "title": "Bleak House", "author": "Charles Dickens"})
+    assert index.suggest("bleak") == [{"text": "Bleak House", "type": "title", "book_id": 4}]
+    assert len([s for s in index.suggest("charles") if s["type"] == "author"]) == 1
+
+
+def test_suggest_endpoint(client):
+    response = client.get("/api/suggest?q=mock")
+    assert response.status_code == 200
+    assert response.get_json()["suggestions"][0]["text"] == "To Kill a Mockingbird"
+
+
+def test_inserted_books_are_suggested(client):
+    add_book_to_catalog("Dune", "Frank Herbert", "9780441172719", 2)
+    data = client.get("/api/suggest?q=dun").get_json()
+    assert data["suggestions"][0]["text"] == "Dune"
+
+
+def test_empty_query_returns_no_suggestions(client):
+    assert client.get("/api/suggest?q=").get_json()["count"] == 0
+    assert client.get("/api/suggest?q=a&limit=0").status_code == 400